@@ -1,6 +1,7 @@
-import requests
 import os
 
+from corona_analytics_client.session import get_session
+
 
 class CompanyParamsMixin(object):
     """
@@ -14,7 +15,7 @@ class CompanyParamsMixin(object):
         Following fields which can be queried for companies:
         company name
 
-        Note that company_id doesn't use the params kwarg in requests.get()
+        Note that company_id doesn't use the params kwarg in get_json()
         but adds in the company id directly into the url.
         """
         if self.name:
@@ -57,20 +58,21 @@ class Company(CompanyParamsMixin):
         url = self.corona_client._get_url('companies')
         if self.company_id:
             url = os.path.join(url, str(self.company_id))
-            return requests.get(url).json()
+            return get_session(self.corona_client).get_json(url)
         if self.name:
-            return requests.get(url, params=self.params).json()[0]
+            return get_session(self.corona_client).get_json(
+                url, params=self.params)[0]
 
     def get_billing_response(self):
         url = self.corona_client._get_url('billing-info')
         query_string = "?company={}".format(str(self.company_id))
         billing_url = os.path.join(url, query_string)
-        return requests.get(billing_url).json()
+        return get_session(self.corona_client).get_json(billing_url)
 
     def get_site_response(self):
         url = self.corona_client._get_url('sites')
         site_url = os.path.join(url, str(self.company_id))
-        return requests.get(site_url).json()
+        return get_session(self.corona_client).get_json(site_url)
 
     def set_sites(self):
         pass
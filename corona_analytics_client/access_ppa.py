@@ -1,7 +1,101 @@
-import requests
 import datetime
 import os
-from dateutil.relativedelta import relativedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from corona_analytics_client.dates import parse_date_columns, parse_iso_date
+from corona_analytics_client.intervals import get_period_containing, merge_intervals
+from corona_analytics_client.quote_table import QuoteTable, get_quote_meter_type
+from corona_analytics_client.session import get_session
+from corona_analytics_client.timeline import get_daily_timeline
+
+# Query filters taking a comma separated list of values, by endpoint
+IN_FILTERS = {
+    'ppa/quotes': 'mpan__in',
+    'ppa/product-quotes': 'quote_id__in',
+    'sites': 'id__in',
+    'billing-info': 'company__in',
+    'assets': 'asset_id__in',
+    'ppa/registrations': 'mpan__in',
+}
+
+# Parts of an MPAN set_all_info can fetch, and the parts each one needs first
+HYDRATION_PARTS = {
+    'contracts': (),
+    'product_quotes': ('contracts',),
+    'site': ('contracts',),
+    'billing': ('site',),
+    'assets': ('site',),
+    'registrations': (),
+}
+
+# Part of an MPAN each attribute is set by
+FIELD_PARTS = {
+    'ppa_contracts': 'contracts',
+    'live_ppa_contract': 'contracts',
+    'meter_type': 'contracts',
+    'start_live_date': 'contracts',
+    'end_live_date': 'contracts',
+    'site_info': 'site',
+    'site_name': 'site',
+    'company_id': 'site',
+    'site_postcode': 'site',
+    'billing_details': 'billing',
+    'assets': 'assets',
+    'registration_details': 'registrations',
+}
+
+
+def get_hydration_parts(include=None, fields=None):
+    """
+    Parts of an MPAN to fetch for the parts in include and the attributes in
+    fields, with the parts they depend on. Everything if both are None.
+    :param iterable include: parts, keys of HYDRATION_PARTS
+    :param iterable fields: MPAN attributes, keys of FIELD_PARTS
+    :return: set of parts
+    """
+    if include is None and fields is None:
+        return set(HYDRATION_PARTS)
+    parts = set(include or ())
+    for field in fields or ():
+        if field not in FIELD_PARTS:
+            raise ValueError('Unknown MPAN field {}'.format(field))
+        parts.add(FIELD_PARTS[field])
+    unknown = parts - set(HYDRATION_PARTS)
+    if unknown:
+        raise ValueError('Unknown MPAN parts {}'.format(', '.join(sorted(unknown))))
+    required = set()
+    while parts:
+        part = parts.pop()
+        if part not in required:
+            required.add(part)
+            parts.update(HYDRATION_PARTS[part])
+    return required
+
+
+def get_list_url(corona_client, endpoint):
+    """
+    Url of the list of endpoint, whose url template may have a {} placeholder
+    for an id, as ppa/quotes does.
+    """
+    return corona_client._get_url(endpoint).format('')
+
+
+def _get_in(corona_client, endpoint, filter_name, values, params=None,
+            chunk_size=100):
+    """
+    Request endpoint filtering on a list of values, chunk_size values at a
+    time to keep urls to a reasonable length.
+    :return: list of all response items
+    """
+    url = get_list_url(corona_client, endpoint)
+    values = sorted({str(value) for value in values})
+    resp = []
+    for index in range(0, len(values), chunk_size):
+        chunk_params = dict(params or {})
+        chunk_params[filter_name] = ','.join(values[index:index + chunk_size])
+        resp.extend(get_session(corona_client).get_json(
+            url, params=chunk_params))
+    return resp
 
 
 class CoronaPPAParamsMixin(object):
@@ -78,6 +172,11 @@ class AllPPAMPANs(CoronaPPAParamsMixin):
     :param boolean contracted_ppa: whether quote/ contract is signed
     :param boolean remove_cancelled_contracts: if you want to remove cancelled contracts from results. If False then cancelled contracts are returned.
     """
+    # Parts of each MPAN get_all_full_mpans_by_meter_type needs
+    full_mpan_info_parts = ('contracts', 'site')
+    # Filters of get_all_ppa_mpans sent to Corona as ppa/quotes params
+    query_filters = ('quote_type', 'meter_type')
+
     def __init__(self, corona_client, start_date, end_date, contracted_ppa=True,
                  remove_cancelled_contracts=True):
         self.corona_client = corona_client
@@ -86,81 +185,255 @@ class AllPPAMPANs(CoronaPPAParamsMixin):
         self.contracted_ppa = contracted_ppa
         self.remove_cancelled_contracts = remove_cancelled_contracts
         self.params = {}
+        self.errors = {}
 
-    def get_corona_response(self):
+    def get_corona_response(self, fields=None, params=None):
         """
         Build request for ppa quotes
+        :param tuple fields: only decode these fields of each quote
+        :param dict params: defaults to self.params
+        """
+        url = self.corona_client._get_url('ppa/quotes')
+        url = url.format('')
+        if params is None:
+            params = self.params
+        return get_session(self.corona_client).get_json(
+            url, params=params, fields=fields)
+
+    def iter_quotes(self, page_size=None, params=None):
+        """
+        Yield quotes one at a time rather than loading the whole response,
+        so memory use doesn't grow with the number of quotes.
+
+        With page_size, quotes are requested page_size at a time; if Corona
+        doesn't paginate the endpoint, or without page_size, the response is
+        decoded as it is received.
+
+        :param int page_size: number of quotes per request
+        :param dict params: defaults to self.params
         """
         url = self.corona_client._get_url('ppa/quotes')
         url = url.format('')
-        return requests.get(url, params=self.params).json()
+        params = dict(self.params if params is None else params)
+        if page_size:
+            params['page_size'] = page_size
+        return get_session(self.corona_client).iter_items(url, params=params)
 
-    def get_all_ppa_mpans(self, quote_type=None):
+    def get_quote_table(self, page_size=None):
+        """
+        Columnar QuoteTable of the quotes matching params, for vectorised
+        filtering and grouping.
+        :param int page_size: stream quotes page_size at a time
+        """
         self._add_params()
-        resp = self.get_corona_response()
+        return QuoteTable.from_quotes(self._get_quotes(page_size))
+
+    def get_daily_timeline(self, by=('technology', 'meter_type'), page_size=None):
+        """
+        Daily live MPAN counts and capacity_kw between start_date and
+        end_date, by technology and meter_type, from a single ppa/quotes
+        request. See timeline.get_daily_timeline.
+        """
+        return get_daily_timeline(self.get_quote_table(page_size),
+                                  self.start_date, self.end_date, by=by)
+
+    def _get_quotes(self, page_size=None, fields=None, params=None):
+        if page_size:
+            return self.iter_quotes(page_size, params=params)
+        return self.get_corona_response(fields=fields, params=params)
+
+    def get_all_ppa_mpans(self, quote_type=None, page_size=None,
+                          meter_type=None):
+        """
+        :param str quote_type: only return MPANs with quotes of this type
+        :param int page_size: stream quotes with iter_quotes, page_size at a
+            time, rather than requesting them all at once
+        :param str meter_type: only return MPANs with quotes of this meter
+            type, 'export' or 'import'
+        """
+        self._add_params()
+        fields = ('mpan', 'quote_type')
+        if meter_type:
+            fields += ('meter_type',)
+        resp = self._get_quotes(
+            page_size, fields=fields,
+            params=self._get_filter_params(quote_type=quote_type,
+                                           meter_type=meter_type))
+        return self._get_mpans(resp, quote_type, meter_type)
+
+    def _get_filter_params(self, **filters):
+        """
+        :return: self.params with the filters of query_filters which are set
+        """
+        params = dict(self.params)
+        for name, value in filters.items():
+            if value and name in self.query_filters:
+                params[name] = value.lower() if name == 'meter_type' else value
+        return params
+
+    def _get_mpans(self, resp, quote_type=None, meter_type=None):
+        # Corona ignores params it doesn't filter on, so the filters are
+        # checked here too. Quotes without a meter type are kept, for the
+        # meter type of their MPAN to be checked once hydrated.
+        if quote_type:
+            resp = (quote for quote in resp
+                    if quote['quote_type'] == quote_type)
+        if meter_type:
+            resp = (quote for quote in resp if get_quote_meter_type(quote)
+                    in ('', meter_type.lower()))
         if self.corona_client._version == '1.0':
-            if quote_type:
-                return {quote['mpan'] for quote in resp if quote['quote_type'] == quote_type}
-            else:
-                return {quote['mpan'] for quote in resp}
+            return {quote['mpan'] for quote in resp}
         else:
-            if quote_type:
-                return {quote['mpan']['long_value'] for quote in resp if quote['quote_type'] == quote_type}
-            else:
-                return {quote['mpan']['long_value'] for quote in resp}
+            return {quote['mpan']['long_value'] for quote in resp}
 
-    def get_all_ppa_mpans_with_no_params(self):
-        resp = self.get_corona_response()
+    def get_all_ppa_mpans_with_no_params(self, page_size=None):
+        resp = self._get_quotes(page_size, fields=('mpan',))
         return {quote['mpan'] for quote in resp}
 
-    def get_all_ppa_quote_ids(self):
+    def get_all_ppa_quote_ids(self, page_size=None):
         self._add_params()
-        resp = self.get_corona_response()
+        resp = self._get_quotes(page_size, fields=('quote_id',))
         return {quote['quote_id'] for quote in resp}
 
-    def get_all_ppa_quote_ids_created_after(self, created_time):
+    def get_all_ppa_quote_ids_created_after(self, created_time, page_size=None):
         self._add_params()
         self.params['created_time_gte'] = created_time
-        resp = self.get_corona_response()
+        resp = self._get_quotes(page_size, fields=('quote_id',))
         return {quote['quote_id'] for quote in resp}
 
-    def get_all_ppa_mpans_created_after(self, created_time):
+    def get_all_ppa_mpans_created_after(self, created_time, page_size=None):
         self._add_params()
         self.params['created_time_gte'] = created_time
-        resp = self.get_corona_response()
+        resp = self._get_quotes(page_size, fields=('mpan',))
         return {quote['mpan'] for quote in resp}
 
-    def get_all_full_mpans_by_meter_type(self, meter_type=None):
+    def get_all_full_mpans_by_meter_type(self, meter_type=None, batch=False,
+                                         max_workers=None):
         """
         Get all mpans in a dict with the full mpan the key and the value a dict of
         technology, site name, meter type and kw
+
+        MPANs are filtered on meter_type by their quotes before they are
+        hydrated, then on their own meter type where it is known.
+
+        An MPAN which fails once its requests have been retried (see
+        retry.RetryPolicy) is left out of the result, with its exception kept
+        in self.errors, rather than stopping the whole run; see
+        get_error_report and retry_failed_mpans. With batch, MPANs are
+        hydrated together so any failure still raises.
+
         :param str meter_type:
+        :param boolean batch: hydrate all MPANs together with MPANBatch rather
+            than one at a time
+        :param int max_workers: number of threads to hydrate MPANs with
         :return: dict with MPAN as key
         """
+        mpan_list_long = self.get_all_ppa_mpans(meter_type=meter_type)
+        return self._get_full_mpans(mpan_list_long, meter_type, batch,
+                                    max_workers)
+
+    def retry_failed_mpans(self, meter_type=None, max_workers=None):
+        """
+        Hydrate again only the MPANs in self.errors, e.g. once Corona has
+        recovered, rather than re-running get_all_full_mpans_by_meter_type
+        for the whole portfolio:
 
-        mpan_list_long = self.get_all_ppa_mpans()
+        result = all_mpans.get_all_full_mpans_by_meter_type('export')
+        result.update(all_mpans.retry_failed_mpans('export'))
+
+        :param str meter_type: meter type the MPANs were filtered on
+        :param int max_workers: see get_all_full_mpans_by_meter_type
+        :return: dict with MPAN as key of the MPANs which succeeded, those
+            still failing are left in self.errors
+        """
+        return self._get_full_mpans(list(self.errors), meter_type,
+                                    max_workers=max_workers)
+
+    def get_error_report(self):
+        """
+        Summary of the MPANs which failed the last run, to log or save with
+        its results.
+        :return: dict of the number of failed MPANs, the error of each MPAN
+            and the MPANs failed by each type of error
+        """
+        by_type = {}
+        for mpan_long, error in sorted(self.errors.items()):
+            by_type.setdefault(type(error).__name__, []).append(mpan_long)
+        return {'failed': len(self.errors),
+                'mpans': {mpan_long: '{}: {}'.format(type(error).__name__,
+                                                      error)
+                          for mpan_long, error in self.errors.items()},
+                'errors': by_type}
+
+    def _get_full_mpans(self, mpan_list_long, meter_type=None, batch=False,
+                        max_workers=None):
+        if batch:
+            self.errors = {}
+            mpans = MPANBatch(self.corona_client, mpan_list_long,
+                              self.start_date, self.end_date).set_all_info()
+            mpans = ((m, self._get_full_mpan_info(m)) for m in mpans.values())
+        else:
+            mpans = self._map_full_mpans(mpan_list_long, max_workers)
         dict_out = {}
-        for mpan_long in mpan_list_long:
-            m = MPAN(self.corona_client, mpan_long, self.start_date, self.end_date)
-            m.set_all_info()
-            info = {'technology': m.ppa_contracts[0].details['technology'],
-                    'site_name': m.site_name,
-                    'meter_type': m.meter_type,
-                    'kW': m.ppa_contracts[0].details['capacity_kw']}
+        for m, info in mpans:
             if meter_type is None:
                 dict_out[m.full_mpan] = info
             else:
-                if m.meter_type.lower() == meter_type.lower():
+                # Corona 1.0 MPANs have no meter type, only their quotes
+                if (m.meter_type is None or
+                        m.meter_type.lower() == meter_type.lower()):
                     dict_out[m.full_mpan] = info
 
         return dict_out
 
+    def _get_full_mpan(self, mpan_long):
+        m = MPAN(self.corona_client, mpan_long, self.start_date, self.end_date)
+        m.set_all_info(include=self.full_mpan_info_parts)
+        return m, self._get_full_mpan_info(m)
+
+    def _map_full_mpans(self, mpan_list_long, max_workers=None):
+        """
+        Hydrate MPANs one at a time, or in a thread pool with max_workers, in
+        order of full MPAN so results are the same whichever thread finishes
+        first.
+        :return: list of (MPAN, info) for the MPANs which didn't fail
+        """
+        self.errors = {}
+        mpan_list_long = sorted(mpan_list_long)
+        if not max_workers:
+            mpans = []
+            for mpan_long in mpan_list_long:
+                try:
+                    mpans.append(self._get_full_mpan(mpan_long))
+                except Exception as error:
+                    self.errors[mpan_long] = error
+            return mpans
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._get_full_mpan, mpan_long)
+                       for mpan_long in mpan_list_long]
+        mpans = []
+        for mpan_long, future in zip(mpan_list_long, futures):
+            if future.exception() is not None:
+                self.errors[mpan_long] = future.exception()
+            else:
+                mpans.append(future.result())
+        return mpans
+
+    @staticmethod
+    def _get_full_mpan_info(m):
+        return {'technology': m.ppa_contracts[0].details['technology'],
+                'site_name': m.site_name,
+                'meter_type': m.meter_type,
+                'kW': m.ppa_contracts[0].details['capacity_kw']}
+
 
 class PPAContract(object):
     """
     PPA Contract Class
     """
-    def __init__(self, corona_client, **kwargs):
+    date_fields = ('contract_start_date', 'contract_end_date')
+
+    def __init__(self, corona_client, product_quotes=None, **kwargs):
 
         self.corona_client = corona_client
         self.details = kwargs
@@ -168,8 +441,8 @@ class PPAContract(object):
         self.pass_throughs = {}
         self.contract_types = {}
 
-        # Reformat quote info
-        self.set_quote_info()
+        # Reformat quote info, only requesting product quotes if not given
+        self.set_quote_info(product_quotes)
         self.set_dates()
         self.set_spill_dates()
 
@@ -178,27 +451,101 @@ class PPAContract(object):
         Function to reformat contract date information
         :return:
         """
-        if 'contract_start_date' in self.details:
-            if isinstance(self.details['contract_start_date'], str):
-                start_date = datetime.datetime.strptime(
-                    self.details['contract_start_date'], '%Y-%m-%d')
-                self.details['contract_start_date'] = start_date.date()
-        if 'contract_end_date' in self.details:
-            if isinstance(self.details['contract_end_date'], str):
-                end_date = datetime.datetime.strptime(
-                    self.details['contract_end_date'], '%Y-%m-%d')
-                self.details['contract_end_date'] = end_date.date()
+        for field in self.date_fields:
+            if isinstance(self.details.get(field), str):
+                self.details[field] = parse_iso_date(self.details[field])
 
     def get_quote_info(self):
         """
         Return request for quote id in contract details
         """
         if 'quote_id' in self.details:
-            quote_id = self.details['quote_id']
-            return self.corona_client.get_base_request('ppa/product-quotes', quote_id=quote_id).json()
+            return self._get_quote_product_quotes(
+                self.corona_client, self.details['quote_id'])
+
+    @staticmethod
+    def _get_quote_product_quotes(corona_client, quote_id):
+        url = get_list_url(corona_client, 'ppa/product-quotes')
+        return get_session(corona_client).get_json(
+            url, params={'quote_id': quote_id})
+
+    @classmethod
+    def get_product_quotes(cls, corona_client, quote_ids, chunk_size=100,
+                           bulk=False):
+        """
+        Request the product quotes of many quotes, one request per quote id.
+
+        With bulk, they are requested chunk_size quote ids at a time with
+        quote_id__in instead. Bulk results are only used if every item
+        carries one of the quote ids requested; otherwise, e.g. if Corona
+        ignored the filter, each quote id is requested on its own.
 
-    def set_quote_info(self):
-        quote = self.get_quote_info()
+        :param iterable quote_ids:
+        :param int chunk_size: maximum number of quote ids per bulk request
+        :param boolean bulk: request many quote ids at once
+        :return: dict of product quotes responses with the quote id as key
+        """
+        quote_ids = set(quote_ids)
+        if bulk and len(quote_ids) > 1:
+            product_quotes = cls._get_product_quotes_in(
+                corona_client, quote_ids, chunk_size)
+            if product_quotes is not None:
+                return product_quotes
+        return {quote_id: cls._get_quote_product_quotes(
+                    corona_client, quote_id) or []
+                for quote_id in quote_ids}
+
+    @staticmethod
+    def _get_product_quotes_in(corona_client, quote_ids, chunk_size):
+        """
+        :return: dict of product quotes with the quote id as key, None if an
+            item has no quote id or one which wasn't requested
+        """
+        resp = _get_in(corona_client, 'ppa/product-quotes',
+                       IN_FILTERS['ppa/product-quotes'], quote_ids,
+                       chunk_size=chunk_size)
+        requested = {str(quote_id): quote_id for quote_id in quote_ids}
+        product_quotes = {quote_id: [] for quote_id in quote_ids}
+        for item in resp:
+            quote_id = item.get('quote_id', item.get('quote'))
+            if quote_id is None or str(quote_id) not in requested:
+                return None
+            product_quotes[requested[str(quote_id)]].append(item)
+        return product_quotes
+
+    @classmethod
+    def from_quotes(cls, corona_client, quotes, product_quotes=None,
+                    bulk=False):
+        """
+        Build a PPAContract per quote, requesting the product quotes of all
+        of them first, or none if product_quotes are already known. Contract
+        dates are parsed a column at a time.
+        :param list quotes: ppa/quotes response
+        :param dict product_quotes: product quotes responses with the quote
+            id as key, requested from Corona if None
+        :param boolean bulk: see get_product_quotes
+        :return: list of PPAContract
+        """
+        if product_quotes is None:
+            product_quotes = cls.get_product_quotes(
+                corona_client,
+                [quote['quote_id'] for quote in quotes if quote.get('quote_id')],
+                bulk=bulk)
+        dates = parse_date_columns(quotes, cls.date_fields)
+        return [cls(corona_client,
+                    product_quotes=product_quotes.get(quote.get('quote_id'), []),
+                    **dict(quote, **quote_dates))
+                for quote, quote_dates in zip(quotes, dates)]
+
+    def set_quote_info(self, quote=None):
+        """
+        Set values, pass throughs and contract types from the product quotes
+        of the contract.
+        :param list quote: product quotes response, requested from Corona if
+            None
+        """
+        if quote is None:
+            quote = self.get_quote_info()
         if quote:
             for item in quote:
                 self.values[item['price_type']] = item['value']
@@ -221,7 +568,7 @@ class PPAContract(object):
                     'contract_start_date']
                 self.details['spill_end'] = (
                     self.details['contract_start_date'] +
-                    relativedelta(days=self.details['spill_period']-1))
+                    datetime.timedelta(days=self.details['spill_period']-1))
 
 
 class MPAN(CoronaPPAParamsMixin):
@@ -262,6 +609,20 @@ class MPAN(CoronaPPAParamsMixin):
         # For Corona querying
         self.params = {}
 
+    def _get_site_url(self, site_id):
+        site_url = self.corona_client._get_url('sites')
+        return os.path.join(site_url, str(site_id))
+
+    def _get_billing_url(self, company_id):
+        billing_url = self.corona_client._get_url('billing-info')
+        query_string = "?company={}".format(str(company_id))
+        return os.path.join(billing_url, query_string)
+
+    def _get_registration_url(self):
+        registration_url = self.corona_client._get_url('ppa/registrations')
+        query_string = "?mpan={}".format(self.full_mpan)
+        return os.path.join(registration_url, query_string)
+
     def get_site_info(self):
         """
         Corona is set up that each Company can have many sites, which
@@ -276,9 +637,8 @@ class MPAN(CoronaPPAParamsMixin):
         if self.live_ppa_contract:
             if self.corona_client._version == '1.0':
                 site_id = self.live_ppa_contract.details['site']
-                site_url = self.corona_client._get_url('sites')
-                site_url = os.path.join(site_url, str(site_id))
-                self.site_info = requests.get(site_url).json()
+                site_url = self._get_site_url(site_id)
+                self.site_info = get_session(self.corona_client).get_json(site_url)
             else:
                 self.site_info = self.live_ppa_contract.details['site']
             return self.site_info
@@ -292,13 +652,13 @@ class MPAN(CoronaPPAParamsMixin):
         should exist, so set the first in list as billing_details.
         """
         if site_resp and 'company' in site_resp:
-            company_id = site_resp['company']
-            billing_url = self.corona_client._get_url('billing-info')
-            query_string = "?company={}".format(str(company_id))
-            billing_url = os.path.join(billing_url, query_string)
-            resp = requests.get(billing_url).json()
-            if resp:
-                self.billing_details = resp[0]
+            billing_url = self._get_billing_url(site_resp['company'])
+            resp = get_session(self.corona_client).get_json(billing_url)
+            self._set_billing_details(resp)
+
+    def _set_billing_details(self, resp):
+        if resp:
+            self.billing_details = resp[0]
 
     def set_registration_details(self):
         """
@@ -306,10 +666,11 @@ class MPAN(CoronaPPAParamsMixin):
         DC/DA
         :return:
         """
-        registration_url = self.corona_client._get_url('ppa/registrations')
-        query_string = "?mpan={}".format(self.full_mpan)
-        registration_url = os.path.join(registration_url, query_string)
-        resp = requests.get(registration_url).json()
+        registration_url = self._get_registration_url()
+        resp = get_session(self.corona_client).get_json(registration_url)
+        self._set_registration_details(resp)
+
+    def _set_registration_details(self, resp):
         if resp:
             if self.corona_client._version == 1.0:
                 self.registration_details = resp[0]
@@ -344,11 +705,19 @@ class MPAN(CoronaPPAParamsMixin):
             else:
                 self.meter_type = 'import'
 
-    def set_ppa_contracts(self):
+    def set_ppa_contracts(self, product_quotes=True, bulk=True):
+        """
+        :param boolean product_quotes: if False, the product quotes of the
+            contracts aren't requested and their values are left empty
+        :param boolean bulk: request the product quotes of all contracts at
+            once, see PPAContract.get_product_quotes
+        """
         url = self.corona_client._get_url('ppa/quotes')
         url = url.format('')
-        resp = requests.get(url, params=self.params).json()
-        self.ppa_contracts = [PPAContract(self.corona_client, **contract) for contract in resp]
+        resp = get_session(self.corona_client).get_json(url, params=self.params)
+        self.ppa_contracts = PPAContract.from_quotes(
+            self.corona_client, resp, None if product_quotes else {},
+            bulk=bulk)
 
     def set_live_ppa_contract(self):
         """
@@ -374,27 +743,20 @@ class MPAN(CoronaPPAParamsMixin):
                     latest_contract = contract
             self.live_ppa_contract = latest_contract
 
+    @staticmethod
+    def _get_contract_intervals(contracts):
+        return [(contract.details['contract_start_date'],
+                 contract.details['contract_end_date'])
+                for contract in contracts]
+
     def get_start_live_end_live(self, contracts):
         """
-        Get total start and end date of all contracts
+        Get total start and end date of all contracts: the first continuous
+        period of contracts, from the earliest start date
         :param contracts:
         """
-
-        start_dates = []
-        end_dates = []
-
-        for contract in contracts:
-            start_dates.append(contract.details['contract_start_date'])
-            end_dates.append(contract.details['contract_end_date'])
-
-        self.start_live_date = min(start_dates)
-        self.end_live_date = min(end_dates)
-
-        # Finding the end of the contract, to ensure continuity
-        for index, contract in enumerate(contracts):
-            if contract.details['contract_start_date'] <= self.end_live_date + datetime.timedelta(days=1) and \
-                    index != 0:
-                self.end_live_date = contract.details['contract_end_date']
+        periods = merge_intervals(self._get_contract_intervals(contracts))
+        self.start_live_date, self.end_live_date = periods[0]
 
     def get_continuous_start_end_live(self, contracts):
         """
@@ -407,6 +769,9 @@ class MPAN(CoronaPPAParamsMixin):
         contract 3 (current live contract): 01/09/2017 - 31/12/2017
         so it will give 01/05/2017 as start_live_date and 31/12/2017 as end_live_date because of the gap between
         contract 1 and 2
+
+        Contracts are merged in date order (see intervals.merge_intervals), so
+        the result doesn't depend on the order Corona returns them in.
         :param contracts:
         :return:
         """
@@ -414,11 +779,10 @@ class MPAN(CoronaPPAParamsMixin):
             self.start_live_date = self.live_ppa_contract.details['contract_start_date']
             self.end_live_date = self.live_ppa_contract.details['contract_end_date']
             if len(contracts):
-                for index, contract in enumerate(contracts):
-                    if contract.details['contract_start_date'] == self.end_live_date + relativedelta(days=1):
-                        self.end_live_date = contract.details['contract_end_date']
-                    if contract.details['contract_end_date'] == self.start_live_date - relativedelta(days=1):
-                        self.start_live_date = contract.details['contract_start_date']
+                intervals = self._get_contract_intervals(contracts)
+                intervals.append((self.start_live_date, self.end_live_date))
+                self.start_live_date, self.end_live_date = get_period_containing(
+                    intervals, self.start_live_date)
 
     @staticmethod
     def get_continuous_dates(contract, date_initial, date_final):
@@ -439,7 +803,8 @@ class MPAN(CoronaPPAParamsMixin):
     def set_assets(self, asset_id):
         url = self.corona_client._get_url('assets')
         url = url.format('')
-        resp = requests.get(url, params={'asset_id': asset_id}).json()
+        resp = get_session(self.corona_client).get_json(
+            url, params={'asset_id': asset_id})
         return resp[0]
 
     def get_asset_info(
@@ -459,16 +824,306 @@ class MPAN(CoronaPPAParamsMixin):
                 asset_info = self.set_assets(asset['asset_id'])
                 self.assets.append(asset_info)
 
-    def set_all_info(self):
+    def set_all_info(self, include=None, fields=None):
+        """
+        Fetch the MPAN information from Corona. By default everything is
+        fetched; include or fields limit the requests made to those needed,
+        e.g. for the site name and meter type only the quotes and site are
+        requested:
+
+        mpan.set_all_info(fields=['site_name', 'meter_type'])
+
+        :param iterable include: parts to fetch, of 'contracts',
+            'product_quotes' (contract values), 'site', 'billing', 'assets'
+            and 'registrations'
+        :param iterable fields: MPAN attributes to set, see FIELD_PARTS
+        """
+        parts = get_hydration_parts(include, fields)
         self._add_params()
-        self.set_ppa_contracts()
+        self._hydrate(parts)
+
+    def _hydrate(self, parts):
+        """
+        Fetch and set the parts of the MPAN, in dependency order.
+        :param set parts: keys of HYDRATION_PARTS
+        """
+        if 'contracts' in parts:
+            self.set_ppa_contracts(product_quotes='product_quotes' in parts)
+            self.set_live_ppa_contract()
+            self.set_meter_type()
+            self.get_continuous_start_end_live(self.ppa_contracts)
+        if 'site' in parts:
+            site_resp = self.get_site_info()
+            self.set_site_name(site_resp)
+            self.set_company_id(site_resp)
+            self.set_site_postcode(site_resp)
+        if 'billing' in parts:
+            self.set_billing_details(self.site_info)
+        if 'assets' in parts:
+            self.assets = []
+            self.get_asset_info(self.site_info)
+        if 'registrations' in parts:
+            self.set_registration_details()
+
+    def populate(self, ppa_contracts, site_resp=None, billing_resp=None,
+                 asset_resps=(), registration_resp=None):
+        """
+        Equivalent of set_all_info using responses which have already been
+        fetched (see MPANBatch), so no requests are made.
+
+        :param list ppa_contracts: PPAContract objects of the MPAN
+        :param dict site_resp: site of the live contract
+        :param list billing_resp: billing-info response for the site company
+        :param list asset_resps: one assets response item per site asset
+        :param list registration_resp: ppa/registrations response
+        """
+        self.ppa_contracts = ppa_contracts
         self.set_live_ppa_contract()
-        site_resp = self.get_site_info()
+        self.site_info = site_resp
         self.set_site_name(site_resp)
         self.set_company_id(site_resp)
         self.set_site_postcode(site_resp)
         self.set_meter_type()
-        self.set_billing_details(site_resp)
-        self.get_asset_info(site_resp)
-        self.set_registration_details()
+        self._set_billing_details(billing_resp)
+        self.assets = list(asset_resps)
+        self._set_registration_details(registration_resp)
         self.get_continuous_start_end_live(self.ppa_contracts)
+
+
+class _LazyField(object):
+    """
+    LazyMPAN attribute which fetches the part of the MPAN it belongs to on
+    first access.
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        instance._load(FIELD_PARTS[self.name])
+        return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+
+class LazyMPAN(MPAN):
+    """
+    MPAN whose attributes are fetched from Corona on first access rather than
+    all at once by set_all_info, and kept once fetched. Reading one attribute
+    only makes the requests for the part it belongs to (see FIELD_PARTS),
+    e.g. for the site_postcode the quotes and site:
+
+    m = LazyMPAN(corona_client, full_mpan, start_date, end_date)
+    m.site_postcode
+
+    prefetch() fetches parts up front, everything by default, as set_all_info
+    does.
+
+    :param boolean product_quotes: fetch the product quotes (contract values,
+        pass throughs and contract types) with the contracts
+    """
+    ppa_contracts = _LazyField()
+    live_ppa_contract = _LazyField()
+    meter_type = _LazyField()
+    start_live_date = _LazyField()
+    end_live_date = _LazyField()
+    site_info = _LazyField()
+    site_name = _LazyField()
+    company_id = _LazyField()
+    site_postcode = _LazyField()
+    billing_details = _LazyField()
+    assets = _LazyField()
+    registration_details = _LazyField()
+
+    def __init__(self, corona_client, full_mpan, start_date=None, end_date=None,
+                 contracted_ppa=True, remove_cancelled_contracts=True,
+                 product_quotes=True):
+        self.loaded_parts = set()
+        super(LazyMPAN, self).__init__(
+            corona_client, full_mpan, start_date, end_date, contracted_ppa,
+            remove_cancelled_contracts)
+        self.product_quotes = product_quotes
+
+    def _load(self, part):
+        if part in self.loaded_parts:
+            return
+        for dependency in HYDRATION_PARTS[part]:
+            self._load(dependency)
+        # Marked before fetching, as fetching reads the attributes of the part
+        self.loaded_parts.add(part)
+        parts = {part}
+        if part == 'contracts' and self.product_quotes:
+            parts.add('product_quotes')
+        try:
+            self._add_params()
+            self._hydrate(parts)
+        except Exception:
+            self.loaded_parts.discard(part)
+            raise
+
+    def prefetch(self, include=None, fields=None):
+        """
+        Fetch the parts in include and for the attributes in fields which
+        aren't already fetched, everything if both are None.
+        :return: self
+        """
+        parts = get_hydration_parts(include, fields)
+        for part in HYDRATION_PARTS:
+            if part in parts and part != 'product_quotes':
+                self._load(part)
+        return self
+
+    def set_all_info(self, include=None, fields=None):
+        self.prefetch(include, fields)
+
+    def populate(self, *args, **kwargs):
+        self.loaded_parts.update(
+            part for part in HYDRATION_PARTS if part != 'product_quotes')
+        super(LazyMPAN, self).populate(*args, **kwargs)
+
+
+class MPANBatch(CoronaPPAParamsMixin):
+    """
+    Hydrate many MPANs at once.
+
+    MPAN.set_all_info makes a request per endpoint (and per product quote and
+    asset) for every MPAN. MPANBatch requests each endpoint once for the whole
+    batch, filtering on lists of ids, and joins the responses client side
+    into the same MPAN objects:
+
+    batch = MPANBatch(corona_client, mpans, start_date, end_date)
+    mpans = batch.set_all_info()
+
+    Lists are sent comma separated with the filters in in_filters, in chunks of
+    chunk_size values to keep urls to a reasonable length.
+
+    :param corona_client:
+    :param iterable full_mpans: 21 digit MPANs
+    :param Date start_date: start date of query period
+    :param Date end_date: end date of query period
+    :param boolean contracted_ppa: whether quote/ contract is signed
+    :param boolean remove_cancelled_contracts: if you want to remove cancelled contracts. If False then cancelled contracts are returned.
+    :param int chunk_size: maximum number of ids per request
+    """
+    in_filters = IN_FILTERS
+
+    def __init__(self, corona_client, full_mpans, start_date=None,
+                 end_date=None, contracted_ppa=True,
+                 remove_cancelled_contracts=True, chunk_size=100):
+        self.corona_client = corona_client
+        self.start_date = start_date
+        self.end_date = end_date
+        self.contracted_ppa = contracted_ppa
+        self.remove_cancelled_contracts = remove_cancelled_contracts
+        self.chunk_size = chunk_size
+        self.mpans = {}
+        for full_mpan in full_mpans:
+            self.mpans[full_mpan] = MPAN(
+                corona_client, full_mpan, start_date, end_date,
+                contracted_ppa, remove_cancelled_contracts)
+
+        # For Corona querying
+        self.params = {}
+
+    @staticmethod
+    def _mpan_value(mpan):
+        """
+        Corona 1.0 returns the full MPAN as a string, later versions nest it.
+        """
+        if isinstance(mpan, dict):
+            return mpan['long_value']
+        return mpan
+
+    @staticmethod
+    def _group_by(resp, key):
+        grouped = {}
+        for item in resp:
+            grouped.setdefault(key(item), []).append(item)
+        return grouped
+
+    def _get_in(self, endpoint, values, params=None):
+        return _get_in(self.corona_client, endpoint, self.in_filters[endpoint],
+                       values, params=params, chunk_size=self.chunk_size)
+
+    def get_quotes(self):
+        """
+        :return: dict of quotes responses with the full MPAN as key
+        """
+        self._add_params()
+        resp = self._get_in('ppa/quotes', self.mpans, params=self.params)
+        return self._group_by(
+            resp, lambda quote: self._mpan_value(quote['mpan']))
+
+    def get_product_quotes(self, quote_ids):
+        """
+        :return: dict of product quotes responses with the quote id as key
+        """
+        return PPAContract.get_product_quotes(
+            self.corona_client, quote_ids, chunk_size=self.chunk_size,
+            bulk=True)
+
+    def get_sites(self, site_ids):
+        resp = self._get_in('sites', site_ids)
+        return {site['id']: site for site in resp}
+
+    def get_billing(self, company_ids):
+        resp = self._get_in('billing-info', company_ids)
+        return self._group_by(resp, lambda billing: billing['company'])
+
+    def get_assets(self, asset_ids):
+        resp = self._get_in('assets', asset_ids)
+        return self._group_by(resp, lambda asset: asset['asset_id'])
+
+    def get_registrations(self):
+        resp = self._get_in('ppa/registrations', self.mpans)
+        return self._group_by(
+            resp, lambda registration: self._mpan_value(registration['mpan']))
+
+    def set_all_info(self):
+        """
+        Fetch every endpoint once for the batch and populate each MPAN.
+        :return: dict of MPAN objects with the full MPAN as key
+        """
+        quotes = self.get_quotes()
+        quote_ids = {quote['quote_id'] for resp in quotes.values()
+                     for quote in resp if quote.get('quote_id')}
+        product_quotes = self.get_product_quotes(quote_ids)
+
+        contracts = {}
+        live_sites = {}
+        for full_mpan, mpan in self.mpans.items():
+            contracts[full_mpan] = PPAContract.from_quotes(
+                self.corona_client, quotes.get(full_mpan, []), product_quotes)
+            mpan.ppa_contracts = contracts[full_mpan]
+            mpan.set_live_ppa_contract()
+            if mpan.live_ppa_contract:
+                live_sites[full_mpan] = mpan.live_ppa_contract.details['site']
+
+        if self.corona_client._version == '1.0':
+            sites = self.get_sites(live_sites.values()) if live_sites else {}
+            live_sites = {full_mpan: sites.get(site_id)
+                          for full_mpan, site_id in live_sites.items()}
+
+        company_ids = {site['company'] for site in live_sites.values()
+                       if site and 'company' in site}
+        asset_ids = {asset['asset_id'] for site in live_sites.values()
+                     if site and site.get('assets')
+                     for asset in site['assets']}
+        billing = self.get_billing(company_ids) if company_ids else {}
+        assets = self.get_assets(asset_ids) if asset_ids else {}
+        registrations = self.get_registrations() if self.mpans else {}
+
+        for full_mpan, mpan in self.mpans.items():
+            site_resp = live_sites.get(full_mpan)
+            billing_resp = None
+            asset_resps = []
+            if site_resp:
+                billing_resp = billing.get(site_resp.get('company'))
+                asset_resps = [assets[asset['asset_id']][0]
+                               for asset in site_resp.get('assets') or []
+                               if asset['asset_id'] in assets]
+            mpan.populate(contracts[full_mpan], site_resp, billing_resp,
+                          asset_resps, registrations.get(full_mpan))
+        return self.mpans
@@ -0,0 +1,265 @@
+import asyncio
+
+from corona_analytics_client.access_ppa import (
+    AllPPAMPANs, MPAN, PPAContract, get_hydration_parts, get_list_url)
+from corona_analytics_client.quote_table import QuoteTable
+from corona_analytics_client.session import get_async_session
+from corona_analytics_client.timeline import get_daily_timeline
+
+
+class AsyncMPAN(MPAN):
+    """
+    MPAN class whose requests are made with asyncio, so it can be used from
+    an event loop without blocking it:
+
+    m = AsyncMPAN(corona_client, full_mpan, start_date, end_date)
+    await m.set_all_info()
+
+    Requests which don't depend on each other are made concurrently: product
+    quotes for all contracts, and billing details, assets and registrations
+    once the site is known. As for MPAN, include or fields limit the parts
+    requested.
+
+    :param string full_mpan: 21 digit MPAN
+    :param Date start_date: start date of query period
+    :param Date end_date: end date of query period
+    :param boolean contracted_ppa: whether quote/ contract is signed
+    :param boolean remove_cancelled_contracts: if you want to remove cancelled contracts. If False then cancelled contracts are returned.
+    :param AsyncCoronaSession session: defaults to the session of corona_client
+    """
+
+    def __init__(self, corona_client, full_mpan, start_date=None, end_date=None,
+                 contracted_ppa=True, remove_cancelled_contracts=True,
+                 session=None):
+        super(AsyncMPAN, self).__init__(
+            corona_client, full_mpan, start_date, end_date, contracted_ppa,
+            remove_cancelled_contracts)
+        self.session = session or get_async_session(corona_client)
+
+    async def get_quote_info(self, contract):
+        """
+        Return product quotes for the quote id in contract details
+        """
+        if 'quote_id' in contract:
+            url = get_list_url(self.corona_client, 'ppa/product-quotes')
+            return await self.session.get_json(
+                url, params={'quote_id': contract['quote_id']})
+
+    async def set_ppa_contracts(self, product_quotes=True):
+        """
+        :param boolean product_quotes: if False, the product quotes of the
+            contracts aren't requested and their values are left empty
+        """
+        url = self.corona_client._get_url('ppa/quotes')
+        url = url.format('')
+        resp = await self.session.get_json(url, params=self.params)
+        if product_quotes:
+            product_quotes = await asyncio.gather(
+                *[self.get_quote_info(contract) for contract in resp])
+        else:
+            product_quotes = [None] * len(resp)
+        self.ppa_contracts = [
+            PPAContract(self.corona_client, product_quotes=quote or [],
+                        **contract)
+            for contract, quote in zip(resp, product_quotes)]
+
+    async def get_site_info(self):
+        if self.live_ppa_contract:
+            if self.corona_client._version == '1.0':
+                site_id = self.live_ppa_contract.details['site']
+                self.site_info = await self.session.get_json(
+                    self._get_site_url(site_id))
+            else:
+                self.site_info = self.live_ppa_contract.details['site']
+            return self.site_info
+
+    async def set_billing_details(self, site_resp):
+        if site_resp and 'company' in site_resp:
+            billing_url = self._get_billing_url(site_resp['company'])
+            resp = await self.session.get_json(billing_url)
+            self._set_billing_details(resp)
+
+    async def set_registration_details(self):
+        resp = await self.session.get_json(self._get_registration_url())
+        self._set_registration_details(resp)
+
+    async def set_assets(self, asset_id):
+        url = self.corona_client._get_url('assets')
+        url = url.format('')
+        resp = await self.session.get_json(url, params={'asset_id': asset_id})
+        return resp[0]
+
+    async def get_asset_info(self, site_resp):
+        if site_resp.get('assets'):
+            self.assets.extend(await asyncio.gather(
+                *[self.set_assets(asset['asset_id'])
+                  for asset in site_resp['assets']]))
+
+    async def _set_site_info(self, parts):
+        if 'contracts' in parts:
+            await self.set_ppa_contracts(
+                product_quotes='product_quotes' in parts)
+            self.set_live_ppa_contract()
+            self.set_meter_type()
+            self.get_continuous_start_end_live(self.ppa_contracts)
+        if 'site' in parts:
+            site_resp = await self.get_site_info()
+            self.set_site_name(site_resp)
+            self.set_company_id(site_resp)
+            self.set_site_postcode(site_resp)
+        coroutines = []
+        if 'billing' in parts:
+            coroutines.append(self.set_billing_details(self.site_info))
+        if 'assets' in parts:
+            self.assets = []
+            coroutines.append(self.get_asset_info(self.site_info))
+        await asyncio.gather(*coroutines)
+
+    async def set_all_info(self, include=None, fields=None):
+        """
+        See MPAN.set_all_info.
+        """
+        parts = get_hydration_parts(include, fields)
+        self._add_params()
+        if 'registrations' in parts:
+            # Registrations only need the MPAN, so don't wait for the site
+            await asyncio.gather(self._set_site_info(parts),
+                                 self.set_registration_details())
+        else:
+            await self._set_site_info(parts)
+
+
+class AsyncAllPPAMPANs(AllPPAMPANs):
+    """
+    AllPPAMPANs class whose requests are made with asyncio. MPANs are
+    hydrated concurrently, with at most concurrency MPANs in flight, fetching
+    the same full_mpan_info_parts as AllPPAMPANs.
+
+    Every method of AllPPAMPANs which requests quotes is a coroutine here,
+    requesting all quotes at once whatever the page_size; only iter_quotes
+    still streams them with the blocking CoronaSession.
+
+    :param Date start_date: start date of query period
+    :param Date end_date: end date of query period
+    :param boolean contracted_ppa: whether quote/ contract is signed
+    :param boolean remove_cancelled_contracts: if you want to remove cancelled contracts from results. If False then cancelled contracts are returned.
+    :param int concurrency: maximum number of MPANs hydrated at once
+    :param AsyncCoronaSession session: defaults to the session of corona_client
+    """
+    def __init__(self, corona_client, start_date, end_date, contracted_ppa=True,
+                 remove_cancelled_contracts=True, concurrency=10, session=None):
+        super(AsyncAllPPAMPANs, self).__init__(
+            corona_client, start_date, end_date, contracted_ppa,
+            remove_cancelled_contracts)
+        self.concurrency = concurrency
+        self.session = session or get_async_session(corona_client)
+
+    async def get_corona_response(self, fields=None, params=None):
+        """
+        See AllPPAMPANs.get_corona_response.
+        """
+        url = get_list_url(self.corona_client, 'ppa/quotes')
+        if params is None:
+            params = self.params
+        return await self.session.get_json(url, params=params, fields=fields)
+
+    async def _get_quotes(self, page_size=None, fields=None, params=None):
+        # AsyncCoronaSession doesn't stream, so quotes are requested at once
+        # whatever the page_size
+        return await self.get_corona_response(fields=fields, params=params)
+
+    async def get_quote_table(self, page_size=None):
+        """
+        See AllPPAMPANs.get_quote_table.
+        """
+        self._add_params()
+        return QuoteTable.from_quotes(await self._get_quotes(page_size))
+
+    async def get_daily_timeline(self, by=('technology', 'meter_type'),
+                                 page_size=None):
+        """
+        See AllPPAMPANs.get_daily_timeline.
+        """
+        return get_daily_timeline(await self.get_quote_table(page_size),
+                                  self.start_date, self.end_date, by=by)
+
+    async def get_all_ppa_mpans(self, quote_type=None, page_size=None,
+                                meter_type=None):
+        """
+        See AllPPAMPANs.get_all_ppa_mpans.
+        """
+        self._add_params()
+        fields = ('mpan', 'quote_type')
+        if meter_type:
+            fields += ('meter_type',)
+        resp = await self._get_quotes(
+            page_size, fields=fields,
+            params=self._get_filter_params(quote_type=quote_type,
+                                           meter_type=meter_type))
+        return self._get_mpans(resp, quote_type, meter_type)
+
+    async def get_all_ppa_mpans_with_no_params(self, page_size=None):
+        resp = await self._get_quotes(page_size, fields=('mpan',))
+        return {quote['mpan'] for quote in resp}
+
+    async def get_all_ppa_quote_ids(self, page_size=None):
+        self._add_params()
+        resp = await self._get_quotes(page_size, fields=('quote_id',))
+        return {quote['quote_id'] for quote in resp}
+
+    async def get_all_ppa_quote_ids_created_after(self, created_time,
+                                                  page_size=None):
+        self._add_params()
+        self.params['created_time_gte'] = created_time
+        resp = await self._get_quotes(page_size, fields=('quote_id',))
+        return {quote['quote_id'] for quote in resp}
+
+    async def get_all_ppa_mpans_created_after(self, created_time,
+                                              page_size=None):
+        self._add_params()
+        self.params['created_time_gte'] = created_time
+        resp = await self._get_quotes(page_size, fields=('mpan',))
+        return {quote['mpan'] for quote in resp}
+
+    async def get_all_full_mpans_by_meter_type(self, meter_type=None):
+        """
+        Get all mpans in a dict with the full mpan the key and the value a dict of
+        technology, site name, meter type and kw. MPANs which fail are kept
+        in self.errors, as by AllPPAMPANs.
+        :param str meter_type:
+        :return: dict with MPAN as key
+        """
+        mpan_list_long = await self.get_all_ppa_mpans(meter_type=meter_type)
+        return await self._get_full_mpans(mpan_list_long, meter_type)
+
+    async def retry_failed_mpans(self, meter_type=None):
+        """
+        See AllPPAMPANs.retry_failed_mpans.
+        """
+        return await self._get_full_mpans(list(self.errors), meter_type)
+
+    async def _get_full_mpans(self, mpan_list_long, meter_type=None):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def hydrate(mpan_long):
+            async with semaphore:
+                m = AsyncMPAN(self.corona_client, mpan_long, self.start_date,
+                              self.end_date, session=self.session)
+                await m.set_all_info(include=self.full_mpan_info_parts)
+                return m, self._get_full_mpan_info(m)
+
+        mpan_list_long = sorted(mpan_list_long)
+        mpans = await asyncio.gather(
+            *[hydrate(mpan_long) for mpan_long in mpan_list_long],
+            return_exceptions=True)
+        self.errors = {}
+        dict_out = {}
+        for mpan_long, result in zip(mpan_list_long, mpans):
+            if isinstance(result, Exception):
+                self.errors[mpan_long] = result
+                continue
+            m, info = result
+            if (meter_type is None or m.meter_type is None or
+                    m.meter_type.lower() == meter_type.lower()):
+                dict_out[m.full_mpan] = info
+        return dict_out
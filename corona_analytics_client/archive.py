@@ -0,0 +1,157 @@
+import gzip
+import json
+import threading
+from urllib.parse import urlsplit
+
+from corona_analytics_client.cache import request_key
+
+RECORD = 'record'
+REPLAY = 'replay'
+# Response headers kept in the archive, for DiskCache revalidation
+ARCHIVED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class ArchiveMissError(LookupError):
+    """
+    Raised when replaying a request which isn't in the archive.
+    """
+
+
+def archive_key(url, params=None):
+    """
+    Key of a request in a ResponseArchive: its request_key without the
+    scheme and host, so an archive recorded against one Corona can be
+    replayed with a client for another, e.g. a local stub.
+    """
+    base_url, query = request_key(url, params)
+    return urlsplit(base_url).path, query
+
+
+class ArchivedResponse(object):
+    """
+    Response replayed from a ResponseArchive, with the attributes of
+    requests.Response that CoronaSession uses.
+    """
+    encoding = 'utf-8'
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = dict(headers or {})
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ResponseArchive(object):
+    """
+    Gzipped JSON lines archive of Corona responses. In record mode every
+    response CoronaSession receives is added to it; in replay mode
+    CoronaSession serves requests from it, without any network access:
+
+    configure_session(corona_client,
+                      archive=ResponseArchive('portfolio.jsonl.gz', RECORD))
+    AllPPAMPANs(corona_client, start, end).get_all_full_mpans_by_meter_type()
+    get_session(corona_client).close()
+
+    configure_session(corona_client,
+                      archive=ResponseArchive('portfolio.jsonl.gz', REPLAY))
+
+    Requests are matched on their path and sorted query parameters (see
+    archive_key); if a request was recorded more than once the last response
+    is replayed. 304 Not Modified responses aren't recorded, as they only
+    make sense to the cache which sent the conditional request.
+
+    The archive is complete once closed. It is flushed every flush_every
+    responses, so a crashed recording can still be replayed up to the last
+    flush.
+
+    :param str path: archive file
+    :param str mode: RECORD, replacing any archive at path, or REPLAY
+    :param int flush_every: responses recorded between flushes
+    """
+    def __init__(self, path, mode=REPLAY, flush_every=100):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError('Unknown archive mode {}'.format(mode))
+        self.path = path
+        self.mode = mode
+        self.flush_every = flush_every
+        self.responses = {}
+        self.recorded = 0
+        self.replayed = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if mode == RECORD:
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            self.load()
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as fp:
+            try:
+                for line in fp:
+                    if not line.endswith('\n'):
+                        # Last line of an archive which wasn't closed
+                        break
+                    entry = json.loads(line)
+                    key = (entry['url'], tuple(map(tuple, entry['params'])))
+                    self.responses[key] = entry
+            except EOFError:
+                # Archive which wasn't closed
+                pass
+
+    def record(self, url, params, status_code, content, headers=None):
+        """
+        :param bytes content: response body
+        """
+        if status_code == 304:
+            return
+        path, query = archive_key(url, params)
+        headers = headers or {}
+        entry = {'url': path, 'params': query, 'status': status_code,
+                 'headers': {name: headers[name] for name in ARCHIVED_HEADERS
+                             if name in headers},
+                 'body': content.decode('utf-8', 'replace')}
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None:
+                raise ValueError('Archive {} is closed'.format(self.path))
+            self._file.write(line)
+            self.recorded += 1
+            if self.flush_every and self.recorded % self.flush_every == 0:
+                self._file.flush()
+
+    def replay(self, url, params=None):
+        """
+        :return: ArchivedResponse of the request
+        :raise ArchiveMissError: if the request isn't in the archive
+        """
+        key = archive_key(url, params)
+        entry = self.responses.get(key)
+        if entry is None:
+            raise ArchiveMissError(
+                '{} {} is not in archive {}'.format(key[0], key[1], self.path))
+        with self._lock:
+            self.replayed += 1
+        return ArchivedResponse(entry['status'], entry['body'].encode('utf-8'),
+                                entry['headers'])
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,145 @@
+"""
+Time the main access paths of the package against a local StubCorona:
+
+    $ python -m corona_analytics_client.benchmarks.run --sizes 10 1000 10000 \
+        --latency 0.005 --output benchmark_results.json
+
+Each benchmark starts with a new session, so responses cached by a previous
+benchmark aren't reused.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+from lj_clients.clients import CoronaClient
+
+from corona_analytics_client.access_company import Company
+from corona_analytics_client.access_ppa import AllPPAMPANs, MPAN
+from corona_analytics_client.benchmarks.stub_server import StubCorona
+from corona_analytics_client.session import configure_session
+
+DEFAULT_SIZES = (10, 1000, 10000)
+START_DATE = datetime.date(2016, 1, 1)
+END_DATE = datetime.date(2017, 12, 31)
+
+
+def set_all_info_mpans(corona_client, full_mpans):
+    for full_mpan in full_mpans:
+        MPAN(corona_client, full_mpan, START_DATE, END_DATE).set_all_info()
+
+
+def get_all_full_mpans_by_meter_type(corona_client, **kwargs):
+    all_mpans = AllPPAMPANs(corona_client, START_DATE, END_DATE)
+    return all_mpans.get_all_full_mpans_by_meter_type(**kwargs)
+
+
+def set_company_info(corona_client, company_ids):
+    for company_id in company_ids:
+        Company(corona_client, company_id=company_id).set_company_info()
+
+
+def get_benchmarks(corona, sample=None, max_workers=8):
+    """
+    :return: list of (name, number of MPANs or companies, function, kwargs)
+    """
+    full_mpans = [corona.data.get_full_mpan(index)
+                  for index in range(len(corona.data.sites))][:sample]
+    company_ids = sorted(corona.data.companies)[:sample]
+    return [
+        ('MPAN.set_all_info', len(full_mpans), set_all_info_mpans,
+         {'full_mpans': full_mpans}),
+        ('AllPPAMPANs.get_all_full_mpans_by_meter_type',
+         len(corona.data.sites), get_all_full_mpans_by_meter_type, {}),
+        ('AllPPAMPANs.get_all_full_mpans_by_meter_type(max_workers={})'.format(
+            max_workers), len(corona.data.sites),
+         get_all_full_mpans_by_meter_type, {'max_workers': max_workers}),
+        ('AllPPAMPANs.get_all_full_mpans_by_meter_type(batch=True)',
+         len(corona.data.sites), get_all_full_mpans_by_meter_type,
+         {'batch': True}),
+        ('Company.set_company_info', len(company_ids), set_company_info,
+         {'company_ids': company_ids}),
+    ]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, latency=0.0, contracts_per_mpan=2,
+                   version='1.0', repeat=1, sample=None, max_workers=8):
+    """
+    :param sizes: numbers of MPANs in the stub portfolio to benchmark
+    :param float latency: seconds the stub adds to each request
+    :param int contracts_per_mpan: contracts of each MPAN
+    :param str version: Corona version of the stub responses
+    :param int repeat: times each benchmark is run, the fastest is kept
+    :param int sample: maximum number of MPANs and companies hydrated one
+        at a time by the MPAN and Company benchmarks, all if None
+    :param int max_workers: threads of the thread pool benchmark
+    :return: list of dicts of the results of each benchmark and size
+    """
+    results = []
+    for size in sizes:
+        with StubCorona(mpans=size, latency=latency,
+                        contracts_per_mpan=contracts_per_mpan,
+                        version=version) as corona:
+            corona_client = CoronaClient(base_url=corona.url, headers={},
+                                         version=version)
+            for name, count, function, kwargs in get_benchmarks(
+                    corona, sample=sample, max_workers=max_workers):
+                timings = []
+                for _ in range(repeat):
+                    session = configure_session(corona_client)
+                    corona.reset_request_count()
+                    start = time.perf_counter()
+                    function(corona_client, **kwargs)
+                    timings.append(time.perf_counter() - start)
+                seconds = min(timings)
+                results.append({
+                    'benchmark': name,
+                    'mpans': size,
+                    'count': count,
+                    'seconds': seconds,
+                    'ms_per_item': 1000.0 * seconds / count if count else None,
+                    'requests': corona.request_count,
+                    'endpoints': session.metrics.snapshot(),
+                    'limiter': (session.limiter.snapshot()
+                                if session.limiter is not None else None),
+                    'circuits': (session.circuit_breaker.snapshot()
+                                 if session.circuit_breaker is not None
+                                 else None),
+                })
+                print('{:<70} {:>6} {:>10.3f}s {:>8} requests'.format(
+                    name, size, seconds, corona.request_count))
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    arg_parser.add_argument('--sizes', type=int, nargs='+',
+                            default=list(DEFAULT_SIZES))
+    arg_parser.add_argument('--latency', type=float, default=0.0,
+                            help='seconds added to each stub request')
+    arg_parser.add_argument('--contracts-per-mpan', type=int, default=2)
+    arg_parser.add_argument('--version', default='1.0',
+                            help='Corona version of the stub responses')
+    arg_parser.add_argument('--repeat', type=int, default=1)
+    arg_parser.add_argument('--sample', type=int, default=None,
+                            help='maximum MPANs and companies hydrated one '
+                                 'at a time')
+    arg_parser.add_argument('--max-workers', type=int, default=8)
+    arg_parser.add_argument('--output', default='benchmark_results.json')
+    args = arg_parser.parse_args(argv)
+
+    results = run_benchmarks(
+        sizes=args.sizes, latency=args.latency,
+        contracts_per_mpan=args.contracts_per_mpan, version=args.version,
+        repeat=args.repeat, sample=args.sample, max_workers=args.max_workers)
+    with open(args.output, 'w') as fp:
+        json.dump({'config': vars(args),
+                   'python': sys.version,
+                   'platform': platform.platform(),
+                   'results': results}, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlsplit
+
+TECHNOLOGIES = ('Solar', 'Wind', 'Hydro', 'AD')
+PRICE_TYPES = ('power', 'roc', 'rego')
+
+# Filters taking a comma separated list, and the field they filter on
+IN_FILTERS = {
+    'mpan__in': 'mpan',
+    'quote_id__in': 'quote_id',
+    'id__in': 'id',
+    'company__in': 'company',
+    'asset_id__in': 'asset_id',
+}
+
+
+class StubCoronaData(object):
+    """
+    Generated Corona responses for a portfolio of MPANs: a site, asset and
+    registration per MPAN, a company per sites_per_company sites, and
+    contracts_per_mpan back to back yearly contracts per MPAN each with a
+    product quote per price type.
+
+    :param int mpans: number of MPANs
+    :param int contracts_per_mpan: number of ppa/quotes per MPAN
+    :param int sites_per_company:
+    :param str version: Corona version the responses are shaped for, '1.0'
+        returns MPANs as strings and sites as ids, later versions nest them
+    """
+    def __init__(self, mpans=1000, contracts_per_mpan=2, sites_per_company=10,
+                 version='1.0'):
+        self.version = str(version)
+        self.quotes = []
+        self.product_quotes = []
+        self.sites = {}
+        self.billing = []
+        self.assets = []
+        self.registrations = []
+        self.companies = {}
+        self._indexes = {}
+        for index in range(mpans):
+            self._add_mpan(index, contracts_per_mpan, sites_per_company)
+
+    @staticmethod
+    def get_full_mpan(index):
+        return '0084500620{:011d}'.format(index)
+
+    def _add_mpan(self, index, contracts_per_mpan, sites_per_company):
+        full_mpan = self.get_full_mpan(index)
+        mpan_type = 'I' if index % 4 == 3 else 'E'
+        site_id = index + 1
+        company_id = index // sites_per_company + 1
+        technology = TECHNOLOGIES[index % len(TECHNOLOGIES)]
+
+        if company_id not in self.companies:
+            self.companies[company_id] = {
+                'id': company_id, 'name': 'Company {}'.format(company_id)}
+            self.billing.append({
+                'company': company_id,
+                'billing_name': 'Company {} Ltd'.format(company_id),
+                'billing_email': 'billing{}@example.com'.format(company_id)})
+        site = {'id': site_id, 'company': company_id,
+                'name': 'Site {}'.format(site_id),
+                'assets': [{'asset_id': site_id}]}
+        if self.version == '1.0':
+            site['addresses'] = [{'postcode': 'AB{} 1CD'.format(index % 100)}]
+        else:
+            site['address'] = {'postcode': 'AB{} 1CD'.format(index % 100)}
+        self.sites[site_id] = site
+        self.assets.append({'asset_id': site_id, 'technology': technology,
+                            'capacity_kw': 100.0 + index % 900})
+        mpan = full_mpan
+        if self.version != '1.0':
+            mpan = {'long_value': full_mpan, 'mpan_type': mpan_type}
+        self.registrations.append({'mpan': mpan, 'new_install': index % 2 == 0,
+                                   'go_live_date': '2016-01-01'})
+
+        for contract in range(contracts_per_mpan):
+            quote_id = index * contracts_per_mpan + contract + 1
+            start_date = datetime.date(2016 + contract, 1, 1)
+            self.quotes.append({
+                'mpan': mpan,
+                'quote_id': quote_id,
+                'quote_type': 'Fixed' if contract % 2 == 0 else 'Flexible',
+                'meter_type': 'export' if mpan_type == 'E' else 'import',
+                'technology': technology,
+                'capacity_kw': 100.0 + index % 900,
+                'site': site_id if self.version == '1.0' else site,
+                'contract_start_date': start_date.isoformat(),
+                'contract_end_date': datetime.date(
+                    start_date.year, 12, 31).isoformat(),
+                'spill_period': 0,
+                'created_time': '{}T09:00:00Z'.format(
+                    datetime.date(start_date.year - 1, 12, 1).isoformat()),
+            })
+            for price_type in PRICE_TYPES:
+                self.product_quotes.append({
+                    'quote_id': quote_id, 'price_type': price_type,
+                    'value': 50.0, 'pass_through_percent': 95.0,
+                    'product_quote_type': 'Fixed'})
+
+    @staticmethod
+    def _get_value(item, field):
+        value = item.get(field)
+        if isinstance(value, dict):
+            value = value.get('long_value', value.get('id'))
+        return str(value)
+
+    def _get_index(self, name, field):
+        """
+        Items of the name attribute by the string value of field, built on
+        first use so large portfolios aren't scanned on every request.
+        """
+        key = (name, field)
+        if key not in self._indexes:
+            index = {}
+            for item in self._get_items(name):
+                index.setdefault(self._get_value(item, field), []).append(item)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _get_items(self, name):
+        items = getattr(self, name)
+        return list(items.values()) if isinstance(items, dict) else items
+
+    def filter(self, name, params, fields):
+        """
+        Items of the name attribute matching params on fields, or on the
+        lists of IN_FILTERS. Other params, e.g. date filters, are ignored.
+        """
+        items = None
+        for param, value in params.items():
+            if param in IN_FILTERS:
+                index = self._get_index(name, IN_FILTERS[param])
+                matches = [item for value in value.split(',')
+                           for item in index.get(value, [])]
+            elif param in fields:
+                matches = self._get_index(name, param).get(value, [])
+            else:
+                continue
+            if items is None:
+                items = matches
+            else:
+                ids = {id(item) for item in matches}
+                items = [item for item in items if id(item) in ids]
+        return self._get_items(name) if items is None else items
+
+    def get(self, endpoint, object_id, params):
+        """
+        :return: response body for the endpoint, or None if not found
+        """
+        if endpoint == 'ppa/quotes':
+            return self.filter('quotes', params,
+                               ('mpan', 'quote_type', 'meter_type',
+                                'technology'))
+        if endpoint == 'ppa/product-quotes':
+            return self.filter('product_quotes', params, ('quote_id',))
+        if endpoint == 'ppa/registrations':
+            return self.filter('registrations', params, ('mpan',))
+        if endpoint == 'sites':
+            if object_id is not None:
+                return self.sites.get(object_id)
+            return self.filter('sites', params, ('id',))
+        if endpoint == 'billing-info':
+            return self.filter('billing', params, ('company',))
+        if endpoint == 'assets':
+            return self.filter('assets', params, ('asset_id',))
+        if endpoint == 'companies':
+            if object_id is not None:
+                return self.companies.get(object_id)
+            return self.filter('companies', params, ('name',))
+        return None
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Thread pool benchmarks open many connections at once
+    request_queue_size = 128
+
+
+class _StubCoronaHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, as Corona does for pooled sessions
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, which would otherwise wait on
+    # delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.count_request()
+        if server.latency:
+            time.sleep(server.latency)
+        split_url = urlsplit(self.path)
+        parts = [part for part in split_url.path.split('/') if part]
+        if parts[:1] == ['api']:
+            parts = parts[1:]
+        object_id = None
+        if parts and parts[-1].isdigit():
+            object_id = int(parts.pop())
+        endpoint = '/'.join(parts)
+        if not endpoint:
+            body = server.get_index()
+        else:
+            body = server.data.get(endpoint, object_id,
+                                   dict(parse_qsl(split_url.query)))
+        if body is None:
+            self.send_error(404)
+            return
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubCorona(object):
+    """
+    Local HTTP server answering the Corona endpoints the package uses from
+    StubCoronaData, with an optional latency added to every request, so the
+    request patterns of the package can be timed without a Corona:
+
+    with StubCorona(mpans=1000, latency=0.005) as corona:
+        corona_client = CoronaClient(base_url=corona.url, headers={},
+                                     version=1.0)
+
+    :param int mpans: number of MPANs in the portfolio
+    :param float latency: seconds added to each request
+    :param int port: port to listen on, 0 for any free port
+    :param kwargs: passed to StubCoronaData
+    """
+    endpoints = ('ppa/quotes', 'ppa/product-quotes', 'ppa/registrations',
+                 'sites', 'billing-info', 'assets', 'companies')
+
+    def __init__(self, mpans=1000, latency=0.0, port=0, **kwargs):
+        self.data = StubCoronaData(mpans=mpans, **kwargs)
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer(('127.0.0.1', port),
+                                            _StubCoronaHandler)
+        self._server.data = self.data
+        self._server.latency = latency
+        self._server.count_request = self.count_request
+        self._server.get_index = self.get_index
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/api/'.format(self._server.server_address[1])
+
+    def get_index(self):
+        return {endpoint: '{}{}/'.format(self.url, endpoint)
+                for endpoint in self.endpoints}
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def reset_request_count(self):
+        with self._lock:
+            self.request_count = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
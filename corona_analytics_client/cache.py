@@ -0,0 +1,276 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+# Seconds a response is cached for, by endpoint. 0 disables caching.
+DEFAULT_TTLS = {
+    'ppa/quotes': 60,
+    'ppa/product-quotes': 300,
+    'ppa/registrations': 60,
+    'sites': 300,
+    'billing-info': 300,
+    'assets': 300,
+    'companies': 300,
+}
+DEFAULT_TTL = 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def get_endpoint(url):
+    """
+    Corona endpoint of url, e.g. 'sites' for .../api/sites/12 and
+    'ppa/quotes' for .../api/ppa/quotes/?mpan=...
+    """
+    path = urlsplit(url).path
+    if '/api/' in path:
+        path = path.split('/api/', 1)[1]
+    return '/'.join(part for part in path.split('/')
+                    if part and not part.isdigit())
+
+
+def request_key(url, params=None):
+    """
+    Key identifying a GET request: the url without query string, and the
+    query string merged with params, sorted and as strings. So
+    billing-info/?company=1 and billing-info/ with params={'company': 1}
+    share a key.
+    """
+    split_url = urlsplit(url)
+    query = parse_qsl(split_url.query, keep_blank_values=True)
+    query.extend((key, str(value)) for key, value in (params or {}).items())
+    base_url = '{}://{}{}'.format(split_url.scheme, split_url.netloc,
+                                  split_url.path.rstrip('/'))
+    return base_url, tuple(sorted(query))
+
+
+def copy_json(value):
+    """
+    Copy of a decoded JSON value, copying its lists and dicts. Faster than
+    copy.deepcopy as the other values are immutable.
+    """
+    if isinstance(value, dict):
+        return {key: copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_json(item) for item in value]
+    return value
+
+
+class ResponseCache(object):
+    """
+    In-memory cache of decoded Corona responses, shared by every request made
+    through a CoronaSession.
+
+    Entries expire after the TTL of their endpoint, and the least recently
+    used entries are evicted once the body sizes of the cached responses go
+    over max_bytes.
+
+    Responses are copied when cached and when returned (copy_json), so
+    callers such as MPAN can keep and modify them without changing the cache.
+
+    :param dict ttls: seconds to cache each endpoint for, added to DEFAULT_TTLS
+    :param int default_ttl: seconds to cache endpoints not in ttls for
+    :param int max_bytes: maximum total size of cached response bodies
+    """
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.endpoint_hits = {}
+        self.endpoint_misses = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key, endpoint=None):
+        """
+        :return: (True, value) if key is cached and not expired, else
+            (False, None)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                self.endpoint_misses[endpoint] = self.endpoint_misses.get(
+                    endpoint, 0) + 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.endpoint_hits[endpoint] = self.endpoint_hits.get(
+                endpoint, 0) + 1
+        # Cached values are never modified, so are copied outside the lock
+        return True, copy_json(entry[1])
+
+    def set(self, key, value, endpoint=None, size=0):
+        """
+        Cache value for the TTL of endpoint.
+        :param int size: size in bytes of the response body
+        """
+        ttl = self.get_ttl(endpoint)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        value = copy_json(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, endpoint, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry[3]
+
+    def invalidate(self, endpoint=None, key=None):
+        """
+        Remove cached responses: the response for key, all responses of
+        endpoint, or everything if neither is given.
+        """
+        with self._lock:
+            if key is not None:
+                if key in self._entries:
+                    self._remove(key)
+                return
+            for cached_key, entry in list(self._entries.items()):
+                if endpoint is None or entry[2] == endpoint:
+                    self._remove(cached_key)
+
+    def stats(self):
+        """
+        :return: dict of hit and miss counts, overall and by endpoint, and
+            the current size of the cache
+        """
+        with self._lock:
+            endpoints = set(self.endpoint_hits) | set(self.endpoint_misses)
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'endpoints': {
+                    endpoint: {'hits': self.endpoint_hits.get(endpoint, 0),
+                               'misses': self.endpoint_misses.get(endpoint, 0)}
+                    for endpoint in endpoints},
+            }
+
+
+class DiskCache(object):
+    """
+    SQLite cache of Corona response bodies which persists between processes,
+    e.g. to avoid re-requesting ppa/quotes each time a notebook restarts.
+
+    Each entry keeps the body with the time it was fetched and the ETag and
+    Last-Modified validators of the response. Within its TTL an entry is
+    returned without a request; for stale_window seconds after that it is
+    still returned as is. Once older, the request is sent with
+    If-None-Match/If-Modified-Since so Corona can answer 304 Not Modified
+    rather than send the body again.
+
+    :param str path: SQLite database file
+    :param dict ttls: seconds entries are fresh for, by endpoint
+    :param int default_ttl: seconds entries of other endpoints are fresh for
+    :param int stale_window: seconds after the TTL stale entries are served
+    """
+    def __init__(self, path, ttls=None, default_ttl=3600, stale_window=0):
+        self.path = path
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_window = stale_window
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, endpoint TEXT, body BLOB, '
+                'fetched_at REAL, etag TEXT, last_modified TEXT)')
+
+    @staticmethod
+    def _dump_key(key):
+        return json.dumps(key)
+
+    def get_ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key):
+        """
+        :return: dict of the entry for key, or None
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT endpoint, body, fetched_at, etag, last_modified '
+                'FROM responses WHERE key = ?', (self._dump_key(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'endpoint': row[0], 'body': bytes(row[1]), 'fetched_at': row[2],
+                'etag': row[3], 'last_modified': row[4]}
+
+    def get_age(self, entry):
+        return time.time() - entry['fetched_at']
+
+    def is_fresh(self, entry):
+        return self.get_age(entry) <= self.get_ttl(entry['endpoint'])
+
+    def is_servable(self, entry):
+        """
+        Whether entry is fresh or stale within the stale window.
+        """
+        return (self.get_age(entry) <=
+                self.get_ttl(entry['endpoint']) + self.stale_window)
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def set(self, key, body, endpoint=None, etag=None, last_modified=None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (self._dump_key(key), endpoint, sqlite3.Binary(body),
+                 time.time(), etag, last_modified))
+
+    def touch(self, key):
+        """
+        Mark the entry for key as fetched now, after Corona has answered
+        304 Not Modified.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE responses SET fetched_at = ? WHERE key = ?',
+                (time.time(), self._dump_key(key)))
+
+    def invalidate(self, endpoint=None, key=None):
+        """
+        Remove entries: the entry for key, all entries of endpoint, or
+        everything if neither is given.
+        """
+        with self._lock, self._connection:
+            if key is not None:
+                self._connection.execute(
+                    'DELETE FROM responses WHERE key = ?', (self._dump_key(key),))
+            elif endpoint is not None:
+                self._connection.execute(
+                    'DELETE FROM responses WHERE endpoint = ?', (endpoint,))
+            else:
+                self._connection.execute('DELETE FROM responses')
+
+    def close(self):
+        self._connection.close()
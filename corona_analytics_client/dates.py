@@ -0,0 +1,73 @@
+import datetime
+import warnings
+
+import numpy as np
+from dateutil import parser
+
+
+def parse_iso_date(value):
+    """
+    Parse a Corona YYYY-MM-DD date. Equivalent to
+    datetime.strptime(value, '%Y-%m-%d').date(), which it falls back to for
+    other formats, but several times faster for ISO dates.
+    """
+    if (len(value) == 10 and value[4] == '-' and value[7] == '-' and
+            value[:4].isdigit() and value[5:7].isdigit() and value[8:].isdigit()):
+        return datetime.date(int(value[:4]), int(value[5:7]), int(value[8:]))
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _parse_datetime(value, unit):
+    if unit == 'D':
+        return parse_iso_date(value)
+    value = parser.parse(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_datetime64(values, unit='D'):
+    """
+    Convert a list of ISO date or datetime strings (or None) to a datetime64
+    array, with NaT for None. Datetimes with a timezone are converted to UTC.
+    """
+    dtype = 'datetime64[{}]'.format(unit)
+    values = [value.rstrip('Z') if isinstance(value, str) else value
+              for value in values]
+    if unit == 'D' and any(isinstance(value, str) and len(value) != 10
+                           for value in values):
+        # numpy would truncate datetimes to dates rather than reject them
+        return np.array([
+            _parse_datetime(value, unit) if isinstance(value, str) else value
+            for value in values], dtype=dtype)
+    try:
+        with warnings.catch_warnings():
+            # numpy warns on timezone offsets, which are parsed below instead
+            warnings.simplefilter('error')
+            return np.array(values, dtype=dtype)
+    except (ValueError, UserWarning, DeprecationWarning):
+        # Not all strings are in numpy's format, e.g. 2016-1-1 or +01:00
+        return np.array([
+            _parse_datetime(value, unit) if isinstance(value, str) else value
+            for value in values], dtype=dtype)
+
+
+def parse_date_columns(items, fields):
+    """
+    Parse the YYYY-MM-DD string dates of fields of many items at once, a
+    column at a time through datetime64, rather than a strptime per value.
+    :param list items: dicts, e.g. a ppa/quotes response
+    :param tuple fields: date fields of the items
+    :return: list of dicts, one per item, of the parsed datetime.date of each
+        of fields which was a string in the item
+    """
+    parsed = [{} for _ in items]
+    for field in fields:
+        indexes = [index for index, item in enumerate(items)
+                   if isinstance(item.get(field), str)]
+        if not indexes:
+            continue
+        dates = to_datetime64([items[index][field] for index in indexes], 'D')
+        for index, date in zip(indexes, dates.tolist()):
+            parsed[index][field] = date
+    return parsed
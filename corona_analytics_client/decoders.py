@@ -0,0 +1,109 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Decoders in order of preference when none is chosen
+DECODER_PREFERENCE = ('orjson', 'simdjson', 'json')
+
+
+def _load_json(body):
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return json.loads(body)
+
+
+def _load_orjson(body):
+    return orjson.loads(body)
+
+
+def _load_simdjson(body):
+    return simdjson.loads(body)
+
+
+DECODERS = {
+    'orjson': _load_orjson,
+    'simdjson': _load_simdjson,
+    'json': _load_json,
+}
+
+_MODULES = {
+    'orjson': lambda: orjson,
+    'simdjson': lambda: simdjson,
+    'json': lambda: json,
+}
+
+
+def get_available_decoders():
+    """
+    :return: names of the decoders which are installed, in DECODER_PREFERENCE
+        order
+    """
+    return [name for name in DECODER_PREFERENCE if _MODULES[name]() is not None]
+
+
+def get_decoder(decoder=None):
+    """
+    Function decoding a UTF-8 JSON response body.
+    :param decoder: 'orjson', 'simdjson' or 'json', a function taking the
+        body bytes, or None for the fastest installed
+    """
+    if callable(decoder):
+        return decoder
+    if decoder is None:
+        decoder = get_available_decoders()[0]
+    if decoder not in DECODERS:
+        raise ValueError('Unknown JSON decoder {}'.format(decoder))
+    if _MODULES[decoder]() is None:
+        raise ImportError('{} is not installed'.format(decoder))
+    return DECODERS[decoder]
+
+
+def _to_python(value):
+    """
+    Convert a simdjson document element to dicts and lists.
+    """
+    if hasattr(value, 'as_dict'):
+        return value.as_dict()
+    if hasattr(value, 'as_list'):
+        return value.as_list()
+    return value
+
+
+def decode_fields(body, fields, decoder=None):
+    """
+    Decode a JSON array of objects keeping only fields of each object, e.g.
+    the mpan and quote_type of ppa/quotes for get_all_ppa_mpans.
+
+    simdjson (used when it is installed and decoder is None or 'simdjson')
+    parses the body without building Python objects, so only fields are
+    converted. Other decoders decode the whole body then drop the other
+    fields, which still keeps less in memory and in cache.
+
+    Bodies which aren't arrays are returned fully decoded.
+
+    :param bytes body:
+    :param tuple fields: fields to keep
+    :param decoder: see get_decoder
+    """
+    if simdjson is not None and decoder in (None, 'simdjson'):
+        document = simdjson.Parser().parse(body)
+        if isinstance(document, simdjson.Array):
+            return [{field: _to_python(item[field]) for field in fields
+                     if field in item}
+                    if isinstance(item, simdjson.Object) else _to_python(item)
+                    for item in document]
+        return _to_python(document)
+    value = get_decoder(decoder)(body)
+    if isinstance(value, list):
+        return [{field: item[field] for field in fields if field in item}
+                if isinstance(item, dict) else item
+                for item in value]
+    return value
@@ -68,7 +68,8 @@ def set_all_info_allppampans():
     mpan_dict = {}
     for mpan in mpan_list:
         m = MPAN(corona_client, mpan, start, end)
-        m.set_all_info()
+        # Only the quotes and site are needed for what is printed
+        m.set_all_info(fields=['site_name', 'site_postcode', 'live_ppa_contract'])
         mpan_dict[mpan] = m
         if m.live_ppa_contract and m.live_ppa_contract.details and m.live_ppa_contract.details['technology']:
             tech_type = m.live_ppa_contract.details['technology']
@@ -0,0 +1,92 @@
+import datetime
+
+import numpy as np
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def merge_intervals(intervals):
+    """
+    Merge date ranges into continuous periods. Ranges are sorted by start
+    date, then a range starting on or before the day after the end of the
+    current period extends it, whatever order the ranges were given in.
+    O(n log n) for n ranges.
+
+    merge_intervals([(date(2017, 9, 1), date(2017, 12, 31)),
+                     (date(2017, 1, 1), date(2017, 3, 31)),
+                     (date(2017, 5, 1), date(2017, 8, 31))])
+    [(date(2017, 1, 1), date(2017, 3, 31)), (date(2017, 5, 1), date(2017, 12, 31))]
+
+    :param iterable intervals: (start_date, end_date) tuples, inclusive
+    :return: list of (start_date, end_date) of the continuous periods, sorted
+    """
+    periods = []
+    for start_date, end_date in sorted(intervals):
+        if periods and start_date <= periods[-1][1] + ONE_DAY:
+            if end_date > periods[-1][1]:
+                periods[-1][1] = end_date
+        else:
+            periods.append([start_date, end_date])
+    return [tuple(period) for period in periods]
+
+
+def get_period_containing(intervals, date):
+    """
+    :return: (start_date, end_date) of the continuous period of intervals
+        which date is in, or (None, None)
+    """
+    for start_date, end_date in merge_intervals(intervals):
+        if start_date <= date <= end_date:
+            return start_date, end_date
+    return None, None
+
+
+def merge_intervals_by_key(keys, start_dates, end_dates):
+    """
+    Vectorised merge_intervals of many series of ranges at once, e.g. the
+    contracts of every MPAN in a portfolio from a single ppa/quotes pull:
+
+    table = QuoteTable.from_quotes(quotes)
+    mpans, starts, ends = merge_intervals_by_key(
+        table['mpan'], table['contract_start_date'], table['contract_end_date'])
+
+    Ranges are sorted by key then start date, and a running maximum of the
+    end dates within each key finds where each continuous period starts.
+    Ranges with a NaT start or end are ignored.
+
+    :param keys: array of the key of each range, e.g. the MPAN
+    :param start_dates: datetime64 array of range start dates, inclusive
+    :param end_dates: datetime64 array of range end dates, inclusive
+    :return: (keys, start_dates, end_dates) arrays with one element per
+        continuous period, sorted by key then start date
+    """
+    keys = np.asarray(keys)
+    start_days = np.asarray(start_dates, dtype='datetime64[D]')
+    end_days = np.asarray(end_dates, dtype='datetime64[D]')
+    valid = ~(np.isnat(start_days) | np.isnat(end_days))
+    keys, start_days, end_days = keys[valid], start_days[valid], end_days[valid]
+    if not len(keys):
+        return keys, start_days, end_days
+
+    key_values, key_codes = np.unique(keys, return_inverse=True)
+    key_codes = key_codes.reshape(-1)
+    order = np.lexsort((start_days, key_codes))
+    key_codes = key_codes[order]
+    starts = start_days[order].astype(np.int64)
+    ends = end_days[order].astype(np.int64)
+
+    # Offset each key's days past the previous key's, so a single running
+    # maximum over the whole array restarts at every key
+    origin = min(starts.min(), ends.min())
+    span = max(starts.max(), ends.max()) - origin + 2
+    offset = key_codes * span - origin
+    running_ends = np.maximum.accumulate(ends + offset) - offset
+
+    new_period = np.ones(len(starts), dtype=bool)
+    new_period[1:] = ((key_codes[1:] != key_codes[:-1]) |
+                      (starts[1:] > running_ends[:-1] + 1))
+    period_index = np.flatnonzero(new_period)
+    period_ends = np.maximum.reduceat(ends, period_index)
+    return (key_values[key_codes[period_index]],
+            starts[period_index].astype('datetime64[D]'),
+            period_ends.astype('datetime64[D]'))
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+
+def is_overload(status):
+    """
+    Whether a response status, or None for a failed request, means Corona
+    is overloaded: 429 Too Many Requests or a 5xx.
+    """
+    return status is None or status == 429 or status >= 500
+
+
+class AdaptiveLimiter(object):
+    """
+    Client wide limit on the number of Corona requests in flight, adjusted
+    by additive increase, multiplicative decrease (AIMD), so parallel
+    hydration goes as fast as Corona allows without flattening it:
+
+    limiter = AdaptiveLimiter(max_limit=32, latency_target=1.0,
+                              endpoint_limits={'ppa/product-quotes': 4})
+    configure_session(corona_client, limiter=limiter)
+
+    Each request that succeeds within latency_target raises the limit by
+    increase / limit, so by about increase per limit requests. A 429 or 5xx
+    response, a failed request, or one slower than latency_target multiplies
+    the limit by backoff. Only requests sent since the last decrease can
+    decrease it again, so a burst of failures from requests already in
+    flight counts once.
+
+    Threads wait in acquire, and tasks in acquire_async, until a request
+    can be sent.
+
+    :param float initial_limit: requests in flight to start with
+    :param int min_limit:
+    :param int max_limit:
+    :param float latency_target: seconds above which a response counts as
+        a sign of overload, None to only react to errors
+    :param float backoff: factor the limit is multiplied by on overload
+    :param float increase: increase of the limit per limit successes
+    :param dict endpoint_limits: fixed maximum requests in flight of
+        endpoints, on top of the overall limit
+    """
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64,
+                 latency_target=None, backoff=0.5, increase=1.0,
+                 endpoint_limits=None):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                'Limits must satisfy 1 <= min_limit <= initial_limit <= '
+                'max_limit')
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.increase = increase
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.in_flight = 0
+        self.endpoint_in_flight = {}
+        self.decreases = 0
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters = []
+
+    def _can_acquire(self, endpoint):
+        if self.in_flight >= int(self.limit):
+            return False
+        endpoint_limit = self.endpoint_limits.get(endpoint)
+        return (endpoint_limit is None or
+                self.endpoint_in_flight.get(endpoint, 0) < endpoint_limit)
+
+    def _acquire(self, endpoint):
+        self.in_flight += 1
+        self.endpoint_in_flight[endpoint] = (
+            self.endpoint_in_flight.get(endpoint, 0) + 1)
+        return time.perf_counter()
+
+    def acquire(self, endpoint):
+        """
+        Wait until a request to endpoint can be sent.
+        :return: time the request was let through, to pass to release
+        """
+        with self._condition:
+            while not self._can_acquire(endpoint):
+                self._condition.wait()
+            return self._acquire(endpoint)
+
+    async def acquire_async(self, endpoint):
+        """
+        Non-blocking equivalent of acquire for asyncio tasks.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            with self._lock:
+                if self._can_acquire(endpoint):
+                    return self._acquire(endpoint)
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, endpoint, started, status=None):
+        """
+        Record the outcome of a request and let the next one through.
+        :param float started: time returned by acquire
+        :param int status: HTTP status of the response, None if the request
+            failed
+        """
+        seconds = time.perf_counter() - started
+        with self._condition:
+            self.in_flight -= 1
+            self.endpoint_in_flight[endpoint] -= 1
+            overloaded = is_overload(status) or (
+                self.latency_target is not None and
+                seconds > self.latency_target)
+            if overloaded:
+                if started > self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = time.perf_counter()
+                    self.decreases += 1
+            else:
+                self.limit = min(self.max_limit,
+                                 self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def snapshot(self):
+        """
+        :return: dict of the current limit, requests in flight by endpoint
+            and number of decreases
+        """
+        with self._lock:
+            return {'limit': self.limit,
+                    'in_flight': self.in_flight,
+                    'endpoints': dict(self.endpoint_in_flight),
+                    'decreases': self.decreases}
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,161 @@
+import threading
+from collections import deque
+
+DEFAULT_SAMPLE_SIZE = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def get_quantile(sorted_values, quantile):
+    """
+    Nearest rank quantile of a sorted list, None if it is empty.
+    """
+    if not sorted_values:
+        return None
+    index = int(round(quantile * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class _EndpointStats(object):
+    __slots__ = ('requests', 'errors', 'retries', 'bytes', 'decodes',
+                 'decode_seconds', 'latency_seconds', 'latencies')
+
+    def __init__(self, sample_size):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.decodes = 0
+        self.decode_seconds = 0.0
+        self.latency_seconds = 0.0
+        self.latencies = deque(maxlen=sample_size)
+
+
+class RequestMetrics(object):
+    """
+    Per endpoint counts of the requests a CoronaSession sends to Corona, the
+    bytes received, the time spent decoding JSON and request latencies, to
+    find which endpoint a slow job is waiting on:
+
+    metrics = get_session(corona_client).metrics
+    metrics.snapshot()['ppa/product-quotes']['latency']['p95']
+    print(metrics.to_prometheus())
+
+    Responses served from the caches aren't requests and aren't counted.
+    Latency quantiles are over the last sample_size requests of each
+    endpoint, the sums and counts over all of them.
+
+    :param int sample_size: latencies kept per endpoint for the quantiles
+    """
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats(self.sample_size)
+        return stats
+
+    def record_request(self, endpoint, seconds, size=0, status=None):
+        """
+        :param str endpoint:
+        :param float seconds: latency of the request
+        :param int size: bytes of the response body
+        :param int status: HTTP status of the response, 400 and above count
+            as errors
+        """
+        with self._lock:
+            stats = self._get_stats(endpoint)
+            stats.requests += 1
+            stats.bytes += size
+            stats.latency_seconds += seconds
+            stats.latencies.append(seconds)
+            if status is not None and status >= 400:
+                stats.errors += 1
+
+    def record_retry(self, endpoint):
+        """
+        Count a request or decode of endpoint which is about to be retried.
+        """
+        with self._lock:
+            self._get_stats(endpoint).retries += 1
+
+    def record_decode(self, endpoint, seconds):
+        with self._lock:
+            stats = self._get_stats(endpoint)
+            stats.decodes += 1
+            stats.decode_seconds += seconds
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def snapshot(self):
+        """
+        :return: dict of the requests, errors, retries, bytes, decode time
+            and latency quantiles of each endpoint
+        """
+        with self._lock:
+            endpoints = [(endpoint, stats, sorted(stats.latencies))
+                         for endpoint, stats in self._endpoints.items()]
+        snapshot = {}
+        for endpoint, stats, latencies in endpoints:
+            latency = {'p{}'.format(int(quantile * 100)):
+                       get_quantile(latencies, quantile)
+                       for quantile in QUANTILES}
+            latency['mean'] = (stats.latency_seconds / stats.requests
+                               if stats.requests else None)
+            latency['max'] = latencies[-1] if latencies else None
+            snapshot[endpoint] = {
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'retries': stats.retries,
+                'bytes': stats.bytes,
+                'decodes': stats.decodes,
+                'decode_seconds': stats.decode_seconds,
+                'latency_seconds': stats.latency_seconds,
+                'latency': latency,
+            }
+        return snapshot
+
+    def to_prometheus(self, prefix='corona'):
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            endpoints = sorted(
+                (endpoint, stats.requests, stats.errors, stats.bytes,
+                 stats.decode_seconds, stats.latency_seconds, stats.retries,
+                 sorted(stats.latencies))
+                for endpoint, stats in self._endpoints.items())
+        counters = (
+            ('requests_total', 'Requests sent to Corona', 1),
+            ('request_errors_total', 'Requests answered with a 4xx or 5xx', 2),
+            ('response_bytes_total', 'Bytes of response bodies received', 3),
+            ('json_decode_seconds_total', 'Seconds spent decoding JSON', 4),
+            ('request_retries_total', 'Requests and decodes retried', 6),
+        )
+        lines = []
+        for name, description, index in counters:
+            lines.append('# HELP {}_{} {}'.format(prefix, name, description))
+            lines.append('# TYPE {}_{} counter'.format(prefix, name))
+            for endpoint in endpoints:
+                lines.append('{}_{}{{endpoint="{}"}} {}'.format(
+                    prefix, name, endpoint[0], endpoint[index]))
+
+        name = '{}_request_duration_seconds'.format(prefix)
+        lines.append('# HELP {} Latency of requests sent to Corona'.format(name))
+        lines.append('# TYPE {} summary'.format(name))
+        for (endpoint, requests, _, _, _, latency_seconds, _,
+             latencies) in endpoints:
+            for quantile in QUANTILES:
+                value = get_quantile(latencies, quantile)
+                lines.append('{}{{endpoint="{}",quantile="{}"}} {}'.format(
+                    name, endpoint, quantile,
+                    'NaN' if value is None else value))
+            lines.append('{}_sum{{endpoint="{}"}} {}'.format(
+                name, endpoint, latency_seconds))
+            lines.append('{}_count{{endpoint="{}"}} {}'.format(
+                name, endpoint, requests))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,201 @@
+import numpy as np
+
+from corona_analytics_client.dates import to_datetime64
+from corona_analytics_client.intervals import merge_intervals_by_key
+
+
+def _get_mpan(quote):
+    """
+    Corona 1.0 returns the full MPAN as a string, later versions nest it.
+    """
+    mpan = quote.get('mpan')
+    if isinstance(mpan, dict):
+        return mpan.get('long_value') or ''
+    return mpan or ''
+
+
+# Single letter meter types and mpan_types
+METER_TYPE_CODES = {'e': 'export', 'i': 'import'}
+
+
+def get_quote_meter_type(quote):
+    """
+    'export' or 'import' from the meter_type of the quote, else from the
+    mpan_type as in MPAN.set_meter_type, or '' if the quote has neither.
+    """
+    if quote.get('meter_type'):
+        meter_type = quote['meter_type'].lower()
+        return METER_TYPE_CODES.get(meter_type, meter_type)
+    mpan = quote.get('mpan')
+    if isinstance(mpan, dict) and 'mpan_type' in mpan:
+        return 'export' if mpan['mpan_type'] == 'E' else 'import'
+    return ''
+
+
+class QuoteTable(object):
+    """
+    Column oriented table of ppa/quotes, with a NumPy array per field, so that
+    filters, set extraction and group bys over a whole portfolio are
+    vectorised rather than loops over quote dicts:
+
+    table = QuoteTable.from_quotes(all_ppas.iter_quotes(page_size=1000))
+    solar = table.where(meter_type='export', technology='Solar')
+    solar = solar.filter(solar.live_between(start, end))
+    solar.group_by('technology', 'capacity_kw')
+
+    String columns are empty strings, quote_id -1, capacity_kw NaN and dates
+    NaT where a quote doesn't have the field.
+
+    :param dict columns: array of each field, all of the same length
+    """
+    string_fields = ('mpan', 'quote_type', 'technology', 'meter_type')
+    date_fields = ('contract_start_date', 'contract_end_date')
+    fields = ('mpan', 'quote_id', 'quote_type', 'technology', 'meter_type',
+              'capacity_kw', 'contract_start_date', 'contract_end_date',
+              'created_time')
+
+    def __init__(self, columns):
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('Columns must all be the same length')
+        self.columns = columns
+
+    @classmethod
+    def from_quotes(cls, quotes):
+        """
+        :param iterable quotes: ppa/quotes response, or AllPPAMPANs.iter_quotes
+        """
+        values = {field: [] for field in cls.fields}
+        for quote in quotes:
+            values['mpan'].append(_get_mpan(quote))
+            values['quote_id'].append(quote.get('quote_id') or -1)
+            values['quote_type'].append(quote.get('quote_type') or '')
+            values['technology'].append(quote.get('technology') or '')
+            values['meter_type'].append(get_quote_meter_type(quote))
+            capacity_kw = quote.get('capacity_kw')
+            values['capacity_kw'].append(
+                np.nan if capacity_kw is None else capacity_kw)
+            for field in cls.date_fields + ('created_time',):
+                values[field].append(quote.get(field))
+
+        columns = {field: np.array(values[field], dtype=str)
+                   for field in cls.string_fields}
+        columns['quote_id'] = np.array(values['quote_id'], dtype=np.int64)
+        columns['capacity_kw'] = np.array(values['capacity_kw'],
+                                          dtype=np.float64)
+        for field in cls.date_fields:
+            columns[field] = to_datetime64(values[field], 'D')
+        columns['created_time'] = to_datetime64(values['created_time'], 'us')
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns['quote_id'])
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def filter(self, mask):
+        """
+        :param mask: boolean array, or index array, of the rows to keep
+        :return: QuoteTable of the rows in mask
+        """
+        return QuoteTable({field: column[mask]
+                           for field, column in self.columns.items()})
+
+    def where(self, **conditions):
+        """
+        Rows where each field equals its value, or is in it if the value is a
+        list, set or tuple:
+
+        table.where(meter_type='export', quote_type=['Fixed', 'Flexible'])
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for field, value in conditions.items():
+            if isinstance(value, (list, set, tuple)):
+                mask &= np.isin(self.columns[field], list(value))
+            else:
+                mask &= self.columns[field] == value
+        return self.filter(mask)
+
+    def live_between(self, start_date, end_date):
+        """
+        :return: boolean array of contracts live at some point between
+            start_date and end_date, inclusive
+        """
+        start_date = np.datetime64(start_date, 'D')
+        end_date = np.datetime64(end_date, 'D')
+        return ((self.columns['contract_start_date'] <= end_date) &
+                (self.columns['contract_end_date'] >= start_date))
+
+    def unique(self, field):
+        """
+        :return: set of the values of field, e.g. the MPANs of the table
+        """
+        return set(np.unique(self.columns[field]).tolist())
+
+    def get_mpans(self, quote_type=None):
+        """
+        Equivalent of AllPPAMPANs.get_all_ppa_mpans on the table.
+        """
+        table = self if quote_type is None else self.where(quote_type=quote_type)
+        return table.unique('mpan')
+
+    def get_live_periods(self):
+        """
+        Continuous live periods of every MPAN in the table, merging back to
+        back and overlapping contracts.
+        :return: (mpans, start_dates, end_dates) arrays, one element per period
+        """
+        return merge_intervals_by_key(self.columns['mpan'],
+                                      self.columns['contract_start_date'],
+                                      self.columns['contract_end_date'])
+
+    def get_group_codes(self, keys):
+        """
+        Number the combinations of values of keys in the table.
+        :param keys: field or tuple of fields
+        :return: (codes, group_keys) where codes is an array of the group
+            number of each row and group_keys the list of tuples of key values
+            of each group number
+        """
+        if isinstance(keys, str):
+            keys = (keys,)
+        uniques = []
+        codes = np.zeros(len(self), dtype=np.int64)
+        for key in keys:
+            key_uniques, key_codes = np.unique(self.columns[key],
+                                               return_inverse=True)
+            uniques.append(key_uniques)
+            codes = codes * len(key_uniques) + key_codes.reshape(-1)
+        group_codes, inverse = np.unique(codes, return_inverse=True)
+
+        group_keys = []
+        for group_code in group_codes.tolist():
+            group_key = []
+            for key_uniques in reversed(uniques):
+                group_code, index = divmod(group_code, len(key_uniques))
+                group_key.append(key_uniques[index].item())
+            group_keys.append(tuple(reversed(group_key)))
+        return inverse.reshape(-1), group_keys
+
+    def group_by(self, keys, value=None):
+        """
+        Count rows, or sum value, for each combination of keys:
+
+        table.group_by(('technology', 'meter_type'), 'capacity_kw')
+        {('Solar', 'export'): 1500.0, ...}
+
+        :param keys: field or tuple of fields to group by
+        :param str value: field to sum, counts rows if None
+        :return: dict with the key value, or tuple of key values, as key
+        """
+        single_key = isinstance(keys, str)
+        inverse, group_keys = self.get_group_codes(keys)
+        if value is None:
+            totals = np.bincount(inverse, minlength=len(group_keys))
+        else:
+            totals = np.bincount(
+                inverse, weights=np.nan_to_num(self.columns[value]),
+                minlength=len(group_keys))
+        return {group_key[0] if single_key else group_key: total
+                for group_key, total in zip(group_keys, totals.tolist())}
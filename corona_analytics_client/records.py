@@ -0,0 +1,216 @@
+import sys
+
+
+class ContractRecord(object):
+    """
+    Compact, read only record of a PPAContract, keeping only the fields the
+    package reads rather than the whole ppa/quotes item and three dicts of
+    product quotes:
+
+    record = ContractRecord.from_contract(contract)
+    record.details['contract_start_date']
+
+    details, values, pass_throughs and contract_types are built on access,
+    so records can be used in place of PPAContract when reading, e.g. with
+    MPAN.get_continuous_start_end_live.
+
+    :param dict raw: full details of the contract, only kept if requested
+    """
+    __slots__ = ('quote_id', 'quote_type', 'technology', 'meter_type',
+                 'capacity_kw', 'contract_start_date', 'contract_end_date',
+                 'spill_start', 'spill_end', 'site', 'prices', 'raw')
+
+    fields = ('quote_id', 'quote_type', 'technology', 'meter_type',
+              'capacity_kw', 'contract_start_date', 'contract_end_date',
+              'spill_start', 'spill_end', 'site')
+
+    def __init__(self, quote_id=None, quote_type=None, technology=None,
+                 meter_type=None, capacity_kw=None, contract_start_date=None,
+                 contract_end_date=None, spill_start=None, spill_end=None,
+                 site=None, prices=(), raw=None):
+        self.quote_id = quote_id
+        self.quote_type = quote_type
+        self.technology = technology
+        self.meter_type = meter_type
+        self.capacity_kw = capacity_kw
+        self.contract_start_date = contract_start_date
+        self.contract_end_date = contract_end_date
+        self.spill_start = spill_start
+        self.spill_end = spill_end
+        self.site = site
+        # Tuple of (price_type, value, pass_through, contract_type)
+        self.prices = tuple(prices)
+        self.raw = raw
+
+    @classmethod
+    def from_contract(cls, contract, keep_raw=False):
+        """
+        :param PPAContract contract:
+        :param bool keep_raw: keep the full details dict of the contract
+        """
+        details = contract.details
+        site = details.get('site')
+        if isinstance(site, dict):
+            # Corona 2.0 embeds the site, of which only the id is kept
+            site = site.get('id')
+        prices = [(price_type, value, contract.pass_throughs.get(price_type),
+                   contract.contract_types.get(price_type))
+                  for price_type, value in contract.values.items()]
+        return cls(site=site, prices=prices,
+                   raw=dict(details) if keep_raw else None,
+                   **{field: details.get(field) for field in cls.fields
+                      if field != 'site'})
+
+    @property
+    def details(self):
+        if self.raw is not None:
+            return self.raw
+        return {field: getattr(self, field) for field in self.fields}
+
+    @property
+    def values(self):
+        return {price[0]: price[1] for price in self.prices}
+
+    @property
+    def pass_throughs(self):
+        return {price[0]: price[2] for price in self.prices}
+
+    @property
+    def contract_types(self):
+        return {price[0]: price[3] for price in self.prices}
+
+    def __repr__(self):
+        return 'ContractRecord(quote_id={!r}, {} - {})'.format(
+            self.quote_id, self.contract_start_date, self.contract_end_date)
+
+
+class MPANRecord(object):
+    """
+    Compact, read only record of a hydrated MPAN. The site, billing,
+    registration and asset responses are only kept, in raw, if requested.
+
+    :param tuple contracts: ContractRecord of each PPA contract
+    :param live_contract: the ContractRecord of contracts which is live
+    :param dict raw: site_info, billing_details, registration_details and
+        assets of the MPAN, only kept if requested
+    """
+    __slots__ = ('full_mpan', 'site_name', 'company_id', 'meter_type',
+                 'site_postcode', 'site_latitude', 'site_longitude',
+                 'start_live_date', 'end_live_date', 'contracts',
+                 'live_contract', 'raw')
+
+    fields = ('full_mpan', 'site_name', 'company_id', 'meter_type',
+              'site_postcode', 'site_latitude', 'site_longitude',
+              'start_live_date', 'end_live_date')
+
+    raw_fields = ('site_info', 'billing_details', 'registration_details',
+                  'assets')
+
+    def __init__(self, full_mpan, site_name=None, company_id=None,
+                 meter_type=None, site_postcode=None, site_latitude=None,
+                 site_longitude=None, start_live_date=None, end_live_date=None,
+                 contracts=(), live_contract=None, raw=None):
+        self.full_mpan = full_mpan
+        self.site_name = site_name
+        self.company_id = company_id
+        self.meter_type = meter_type
+        self.site_postcode = site_postcode
+        self.site_latitude = site_latitude
+        self.site_longitude = site_longitude
+        self.start_live_date = start_live_date
+        self.end_live_date = end_live_date
+        self.contracts = tuple(contracts)
+        self.live_contract = live_contract
+        self.raw = raw
+
+    @classmethod
+    def from_mpan(cls, mpan, keep_raw=False):
+        """
+        :param MPAN mpan: hydrated MPAN, e.g. after set_all_info
+        :param bool keep_raw: keep the raw responses of the MPAN and its
+            contracts
+        """
+        contracts = []
+        live_contract = None
+        for contract in mpan.ppa_contracts or ():
+            record = ContractRecord.from_contract(contract, keep_raw=keep_raw)
+            if contract is mpan.live_ppa_contract:
+                live_contract = record
+            contracts.append(record)
+        raw = None
+        if keep_raw:
+            raw = {field: getattr(mpan, field) for field in cls.raw_fields}
+        return cls(contracts=contracts, live_contract=live_contract, raw=raw,
+                   **{field: getattr(mpan, field) for field in cls.fields})
+
+    @property
+    def mpan(self):
+        return self.full_mpan[-13:]
+
+    @property
+    def ppa_contracts(self):
+        return list(self.contracts)
+
+    @property
+    def live_ppa_contract(self):
+        return self.live_contract
+
+    def __repr__(self):
+        return 'MPANRecord({!r})'.format(self.full_mpan)
+
+
+def to_records(mpans, keep_raw=False):
+    """
+    :param dict mpans: MPANs by full MPAN, e.g. from MPANBatch.set_all_info
+    :return: dict of MPANRecord by full MPAN
+    """
+    return {full_mpan: MPANRecord.from_mpan(mpan, keep_raw=keep_raw)
+            for full_mpan, mpan in mpans.items()}
+
+
+def get_deep_size(obj, exclude=(), seen=None):
+    """
+    Approximate bytes used by obj and everything it references, counting
+    objects referenced more than once a single time.
+    :param exclude: objects not to count, e.g. a shared CoronaClient
+    """
+    if seen is None:
+        seen = {id(item) for item in exclude}
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += get_deep_size(key, seen=seen)
+            size += get_deep_size(value, seen=seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += get_deep_size(item, seen=seen)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += get_deep_size(obj.__dict__, seen=seen)
+        for slot in getattr(type(obj), '__slots__', ()):
+            size += get_deep_size(getattr(obj, slot, None), seen=seen)
+    return size
+
+
+def measure_memory_saving(mpans, keep_raw=False):
+    """
+    Compare the memory used by hydrated MPANs and by their records.
+    :param dict mpans: MPANs by full MPAN
+    :return: dict of the bytes used by the MPANs and the records, and the
+        saving in bytes and as a percentage
+    """
+    records = to_records(mpans, keep_raw=keep_raw)
+    exclude = [mpan.corona_client for mpan in mpans.values()]
+    mpans_bytes = get_deep_size(mpans, exclude=exclude)
+    records_bytes = get_deep_size(records)
+    saving_bytes = mpans_bytes - records_bytes
+    return {
+        'mpans_bytes': mpans_bytes,
+        'records_bytes': records_bytes,
+        'saving_bytes': saving_bytes,
+        'saving_percent': (100.0 * saving_bytes / mpans_bytes
+                           if mpans_bytes else 0.0),
+    }
@@ -0,0 +1,206 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from corona_analytics_client.limiter import is_overload
+
+# Statuses of responses worth sending again. A plain 500 is usually a bug
+# Corona hits every time, so isn't retried by default.
+RETRY_STATUSES = (429, 502, 503, 504)
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout,
+                    asyncio.TimeoutError)
+if aiohttp is not None:
+    RETRY_EXCEPTIONS += (aiohttp.ClientConnectionError,
+                         aiohttp.ClientPayloadError)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to an endpoint whose circuit is open.
+    """
+
+
+class RetryPolicy(object):
+    """
+    When and after how long a CoronaSession sends a GET request again. Only
+    GETs are sent by the package, so every request is safe to repeat:
+
+    configure_session(corona_client,
+                      retry=RetryPolicy(retries=5, max_backoff=60))
+
+    A request is retried after a connection error or timeout, a response
+    with one of statuses, or a 2xx response whose body isn't valid JSON.
+    Attempt n (from 0) waits a random time between 0 and
+    min(max_backoff, backoff * 2 ** n), "full jitter", so threads which
+    failed together don't retry together.
+    A Retry-After header of a number of seconds is waited at least, up to
+    max_backoff.
+
+    :param int retries: attempts after the first one
+    :param float backoff: seconds of the first backoff
+    :param float max_backoff: maximum seconds of a backoff
+    :param tuple statuses: HTTP statuses which are retried
+    :param tuple exceptions: exceptions of the request which are retried
+    :param boolean decode_errors: whether bodies which can't be decoded are
+        retried
+    """
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30.0,
+                 statuses=RETRY_STATUSES, exceptions=RETRY_EXCEPTIONS,
+                 decode_errors=True):
+        if retries < 0:
+            raise ValueError('retries must be 0 or more')
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.decode_errors = decode_errors
+
+    def can_retry(self, attempt):
+        return attempt < self.retries
+
+    def is_retryable_status(self, status):
+        return status in self.statuses
+
+    def is_retryable_error(self, error):
+        return isinstance(error, self.exceptions)
+
+    def get_delay(self, attempt, retry_after=None):
+        """
+        :param int attempt: number of the attempt which failed, from 0
+        :param retry_after: Retry-After header of the response, if any
+        :return: seconds to wait before the next attempt
+        """
+        delay = random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            # Missing, or an HTTP date which isn't worth parsing
+            return delay
+        return max(delay, min(retry_after, self.max_backoff))
+
+
+class _Circuit(object):
+    __slots__ = ('state', 'failures', 'opened', 'opens', 'trial')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = None
+        self.opens = 0
+        self.trial = False
+
+
+class CircuitBreaker(object):
+    """
+    Per endpoint circuit breaker, so requests fail fast with
+    CircuitOpenError while Corona is unhealthy instead of each of them
+    waiting through its retries:
+
+    configure_session(corona_client,
+                      circuit_breaker=CircuitBreaker(failure_threshold=10))
+
+    After failure_threshold consecutive failed requests (see
+    limiter.is_overload) to an endpoint its circuit opens, a request counting
+    once whatever its retries. Once open for reset_timeout seconds, a single
+    trial request is let through (half open): the circuit closes if it
+    succeeds and opens again if not.
+
+    :param int failure_threshold: consecutive failures which open a circuit
+    :param float reset_timeout: seconds a circuit stays open
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        if failure_threshold < 1:
+            raise ValueError('failure_threshold must be 1 or more')
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _get_circuit(self, endpoint):
+        circuit = self._circuits.get(endpoint)
+        if circuit is None:
+            circuit = self._circuits[endpoint] = _Circuit()
+        return circuit
+
+    def get_state(self, endpoint):
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            return CLOSED if circuit is None else circuit.state
+
+    def before_request(self, endpoint):
+        """
+        :raise CircuitOpenError: if no request to endpoint may be sent
+        """
+        with self._lock:
+            circuit = self._get_circuit(endpoint)
+            if circuit.state == CLOSED:
+                return
+            if circuit.state == OPEN:
+                remaining = (circuit.opened + self.reset_timeout -
+                             time.monotonic())
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        'Circuit of {} is open for {:.1f}s after {} failures'
+                        .format(endpoint, remaining, circuit.failures))
+                circuit.state = HALF_OPEN
+            elif circuit.trial:
+                raise CircuitOpenError(
+                    'Circuit of {} is half open, waiting for a trial request'
+                    .format(endpoint))
+            circuit.trial = True
+
+    def record(self, endpoint, status=None):
+        """
+        Record the outcome of a request let through by before_request.
+        :param int status: HTTP status of the response, None if the request
+            failed
+        """
+        with self._lock:
+            circuit = self._get_circuit(endpoint)
+            circuit.trial = False
+            if not is_overload(status):
+                circuit.state = CLOSED
+                circuit.failures = 0
+                return
+            circuit.failures += 1
+            if (circuit.state == HALF_OPEN or
+                    circuit.failures >= self.failure_threshold):
+                if circuit.state != OPEN:
+                    circuit.opens += 1
+                circuit.state = OPEN
+                circuit.opened = time.monotonic()
+
+    def reset(self, endpoint=None):
+        """
+        Close the circuit of endpoint, or of every endpoint if None.
+        """
+        with self._lock:
+            if endpoint is None:
+                self._circuits = {}
+            else:
+                self._circuits.pop(endpoint, None)
+
+    def snapshot(self):
+        """
+        :return: dict of the state, consecutive failures and number of times
+            opened of each endpoint
+        """
+        with self._lock:
+            return {endpoint: {'state': circuit.state,
+                               'failures': circuit.failures,
+                               'opens': circuit.opens}
+                    for endpoint, circuit in self._circuits.items()}
@@ -0,0 +1,725 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from corona_analytics_client.cache import ResponseCache, get_endpoint, request_key
+from corona_analytics_client.decoders import decode_fields, get_decoder
+from corona_analytics_client.limiter import AdaptiveLimiter
+from corona_analytics_client.metrics import RequestMetrics
+from corona_analytics_client.retry import CircuitBreaker, RetryPolicy
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 20
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_INITIAL_LIMIT = 8
+# Seconds after which the default limiter takes a response as a sign of
+# overload. Generous, as a whole portfolio of quotes can take seconds.
+DEFAULT_LATENCY_TARGET = 5.0
+
+_session_lock = threading.Lock()
+
+
+def iter_json_array(chunks):
+    """
+    Decode a JSON array from an iterable of text chunks, yielding each item
+    as soon as it is complete so the whole array is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    chunks = iter(chunks)
+    finished = False
+    while not finished:
+        chunk = next(chunks, None)
+        if chunk is None:
+            finished = True
+        else:
+            buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Response is not a JSON array')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if finished:
+                    raise
+                break
+            # An item is only complete once followed by a separator, as a
+            # number may continue in the next chunk
+            next_position = end
+            while (next_position < len(buffer) and
+                   buffer[next_position] in ' \t\r\n'):
+                next_position += 1
+            if next_position == len(buffer) or buffer[next_position] not in ',]':
+                if finished:
+                    raise ValueError('Invalid JSON array')
+                break
+            yield item
+            position = end
+        buffer = buffer[position:]
+    if started:
+        raise ValueError('Response ended before the end of the JSON array')
+
+
+def is_success(status):
+    """
+    Whether a response status is a 2xx, whose body can be cached.
+    """
+    return 200 <= status < 300
+
+
+class SingleFlight(object):
+    """
+    Share one call between threads asking for the same key at the same time:
+    the first thread makes the call, the others wait for and get its result
+    (or exception) instead of repeating it.
+    """
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'event': threading.Event()}
+            else:
+                self.shared += 1
+        if not leader:
+            call['event'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = function(*args)
+        except Exception as error:
+            call['error'] = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+        return call['result']
+
+
+class CoronaSession(object):
+    """
+    Pooled HTTP session used for every request made to Corona.
+
+    A single requests.Session is kept per CoronaClient so that connections
+    are re-used (keep-alive) across MPAN, AllPPAMPANs and Company calls, and
+    the CoronaClient headers (authorization token) are sent with each call.
+
+    :param dict headers: headers sent with every request
+    :param int pool_connections: number of host pools to cache
+    :param int pool_maxsize: maximum connections kept open per host
+    :param boolean keep_alive: if False, connections are closed after each
+        response
+    :param timeout: requests timeout in seconds, None waits forever
+    :param cache: ResponseCache for decoded responses, True for a default
+        ResponseCache or None to disable caching
+    :param DiskCache disk_cache: persistent cache of response bodies, checked
+        when a response isn't in cache
+    :param boolean coalesce: share one request between threads making the
+        same request at the same time
+    :param metrics: RequestMetrics recording the requests made, True for a
+        new RequestMetrics or None to disable recording
+    :param decoder: JSON decoder, 'orjson', 'simdjson', 'json' or a function,
+        None for the fastest installed (see decoders.get_decoder)
+    :param ResponseArchive archive: archive responses are recorded to or
+        replayed from, None to send requests as usual
+    :param limiter: AdaptiveLimiter of the requests in flight, True for one
+        of at most pool_maxsize requests backing off above
+        DEFAULT_LATENCY_TARGET, or None for no limit
+    :param retry: RetryPolicy of failed requests, True for a default
+        RetryPolicy or None to never retry
+    :param circuit_breaker: CircuitBreaker of the endpoints, True for a
+        default CircuitBreaker or None to always send requests
+    """
+    def __init__(self, headers=None, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True,
+                 timeout=None, cache=True, disk_cache=None, coalesce=True,
+                 metrics=True, decoder=None, archive=None, limiter=True,
+                 retry=True, circuit_breaker=True):
+        self.headers = dict(headers or {})
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.cache = ResponseCache() if cache is True else cache
+        self.disk_cache = disk_cache
+        self.single_flight = SingleFlight() if coalesce else None
+        self.metrics = RequestMetrics() if metrics is True else metrics
+        self.decoder = decoder
+        self._loads = get_decoder(decoder)
+        self.archive = archive
+        if limiter is True:
+            limiter = AdaptiveLimiter(
+                initial_limit=min(DEFAULT_INITIAL_LIMIT, pool_maxsize),
+                max_limit=pool_maxsize, latency_target=DEFAULT_LATENCY_TARGET)
+        self.limiter = limiter
+        self.retry = RetryPolicy() if retry is True else retry
+        self.circuit_breaker = (CircuitBreaker() if circuit_breaker is True
+                                else circuit_breaker)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(self.headers)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def get(self, url, params=None, headers=None):
+        """
+        Send a GET request through the pooled session.
+        :return: requests.Response
+        """
+        start = time.perf_counter()
+        if self.archive is not None and self.archive.replaying:
+            resp = self.archive.replay(url, params)
+        else:
+            resp = self._send(url, params=params, headers=headers)
+            if self.archive is not None:
+                self.archive.record(url, params, resp.status_code,
+                                    resp.content, resp.headers)
+        if self.metrics is not None:
+            self.metrics.record_request(
+                get_endpoint(url), time.perf_counter() - start,
+                len(resp.content), resp.status_code)
+        return resp
+
+    def _send(self, url, params=None, headers=None, stream=False):
+        """
+        Send a GET request, failing fast if the circuit of its endpoint is
+        open and retrying it as the retry policy allows. The circuit breaker
+        records the outcome of the last attempt only.
+        :raise CircuitOpenError:
+        """
+        endpoint = get_endpoint(url)
+        if self.circuit_breaker is None:
+            return self._send_with_retries(url, params, headers, stream,
+                                           endpoint)
+        self.circuit_breaker.before_request(endpoint)
+        status = None
+        try:
+            resp = self._send_with_retries(url, params, headers, stream,
+                                           endpoint)
+            status = resp.status_code
+        finally:
+            self.circuit_breaker.record(endpoint, status)
+        return resp
+
+    def _send_with_retries(self, url, params, headers, stream, endpoint):
+        attempt = 0
+        while True:
+            try:
+                resp = self._send_once(url, params, headers, stream)
+            except Exception as error:
+                if (self.retry is None or not self.retry.can_retry(attempt) or
+                        not self.retry.is_retryable_error(error)):
+                    raise
+                delay = self.retry.get_delay(attempt)
+            else:
+                if (self.retry is None or not self.retry.can_retry(attempt) or
+                        not self.retry.is_retryable_status(resp.status_code)):
+                    return resp
+                delay = self.retry.get_delay(
+                    attempt, resp.headers.get('Retry-After'))
+                resp.close()
+            if self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            time.sleep(delay)
+            attempt += 1
+
+    def _send_once(self, url, params=None, headers=None, stream=False):
+        """
+        Send a GET request once the limiter lets it through.
+        """
+        kwargs = {'params': params, 'timeout': self.timeout}
+        if headers:
+            kwargs['headers'] = headers
+        if stream:
+            kwargs['stream'] = True
+        if self.limiter is None:
+            return self.session.get(url, **kwargs)
+        endpoint = get_endpoint(url)
+        started = self.limiter.acquire(endpoint)
+        status = None
+        try:
+            resp = self.session.get(url, **kwargs)
+            status = resp.status_code
+        finally:
+            self.limiter.release(endpoint, started, status)
+        return resp
+
+    def get_json(self, url, params=None, fields=None):
+        """
+        Send a GET request and decode the JSON body, or return the cached
+        response for the same url and params. Only 2xx responses are cached,
+        so an error is requested again next time.
+        :param tuple fields: only decode these fields of each item of a list
+            response (see decoders.decode_fields)
+        :return: decoded response
+        """
+        key = request_key(url, params)
+        if fields:
+            key = key + (tuple(fields),)
+        endpoint = get_endpoint(url)
+        if self.cache is not None:
+            hit, value = self.cache.get(key, endpoint)
+            if hit:
+                return value
+        if self.single_flight is None:
+            return self._load_json(url, params, key, endpoint, fields)
+        return self.single_flight.do(
+            key, self._load_json, url, params, key, endpoint, fields)
+
+    def _load_json(self, url, params, key, endpoint, fields=None):
+        attempt = 0
+        while True:
+            if self.disk_cache is None:
+                resp = self.get(url, params=params)
+                body, status = resp.content, resp.status_code
+            else:
+                # The disk cache keeps whole bodies, whichever fields are
+                # decoded
+                body, status = self._get_disk_cached_body(
+                    url, params, key[:2], endpoint)
+            start = time.perf_counter()
+            try:
+                value = self.decode(body, fields)
+                break
+            except ValueError:
+                if not self._can_retry_decode(attempt, status):
+                    raise
+            if self.disk_cache is not None:
+                self.disk_cache.invalidate(key=key[:2])
+            if self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            time.sleep(self.retry.get_delay(attempt))
+            attempt += 1
+        if self.metrics is not None:
+            self.metrics.record_decode(endpoint, time.perf_counter() - start)
+        if self.cache is not None and is_success(status):
+            self.cache.set(key, value, endpoint, len(body))
+        return value
+
+    def _can_retry_decode(self, attempt, status):
+        # Only a 2xx body should be JSON, e.g. a 404 or 500 page is HTML, and
+        # a replayed body is the same every time
+        return (is_success(status) and self.retry is not None and
+                self.retry.decode_errors and
+                self.retry.can_retry(attempt) and
+                not (self.archive is not None and self.archive.replaying))
+
+    def decode(self, body, fields=None):
+        """
+        Decode a response body with the session decoder.
+        :param tuple fields: see get_json
+        """
+        if fields:
+            return decode_fields(body, fields, self.decoder)
+        return self._loads(body)
+
+    def iter_items(self, url, params=None):
+        """
+        Yield the items of a list response one at a time. An unpaginated
+        response is decoded as it is received; a paginated one ({'results':
+        [...], 'next': url}) is requested a page at a time following the next
+        links. Responses are not cached, and only their latency to the
+        start of the body is recorded in metrics and the limiter. With an
+        archive, responses are recorded or replayed whole rather than
+        streamed. Requests are retried as in get, but a body found to be
+        malformed part way through isn't, as its first items have been
+        yielded.
+        """
+        while url:
+            if self.archive is not None:
+                page = self.decode(self.get(url, params=params).content)
+                if isinstance(page, list):
+                    for item in page:
+                        yield item
+                    return
+                for item in page['results']:
+                    yield item
+                url = page.get('next')
+                params = None
+                continue
+            start = time.perf_counter()
+            resp = self._send(url, params=params, stream=True)
+            # Release the connection even if the caller stops iterating
+            # part way through the body
+            try:
+                if self.metrics is not None:
+                    self.metrics.record_request(
+                        get_endpoint(url), time.perf_counter() - start,
+                        status=resp.status_code)
+                if resp.encoding is None:
+                    resp.encoding = 'utf-8'
+                chunks = resp.iter_content(chunk_size=STREAM_CHUNK_SIZE,
+                                           decode_unicode=True)
+                first_chunk = ''
+                for first_chunk in chunks:
+                    if first_chunk.strip():
+                        break
+                if first_chunk.lstrip().startswith('['):
+                    for item in iter_json_array(
+                            itertools.chain([first_chunk], chunks)):
+                        yield item
+                    return
+                page = json.loads(first_chunk + ''.join(chunks))
+            finally:
+                resp.close()
+            for item in page['results']:
+                yield item
+            url = page.get('next')
+            params = None
+
+    def _get_disk_cached_body(self, url, params, key, endpoint):
+        """
+        Return the body from disk_cache if fresh or within its stale window,
+        else request it, conditionally if there is a cached entry.
+        :return: response body and status, 200 for a cached body
+        """
+        entry = self.disk_cache.get(key)
+        if entry is not None and self.disk_cache.is_servable(entry):
+            return entry['body'], 200
+        headers = None
+        if entry is not None:
+            headers = self.disk_cache.get_conditional_headers(entry)
+        resp = self.get(url, params=params, headers=headers)
+        if entry is not None and resp.status_code == 304:
+            self.disk_cache.touch(key)
+            return entry['body'], 200
+        if resp.status_code == 200:
+            self.disk_cache.set(
+                key, resp.content, endpoint, resp.headers.get('ETag'),
+                resp.headers.get('Last-Modified'))
+        return resp.content, resp.status_code
+
+    def close(self):
+        self.session.close()
+        if self.archive is not None:
+            self.archive.close()
+
+
+class AsyncCoronaSession(object):
+    """
+    Non-blocking equivalent of CoronaSession, built on aiohttp (install with
+    the async extra). The aiohttp session is created on first request, and
+    again when used from another event loop, e.g. a second asyncio.run. Close
+    it with aclose, or use the session as an async context manager:
+
+    async with get_async_session(corona_client):
+        await AsyncAllPPAMPANs(corona_client, start, end).get_all_ppa_mpans()
+
+    :param dict headers: headers sent with every request
+    :param int limit: maximum number of open connections
+    :param boolean keep_alive: if False, connections are closed after each
+        response
+    :param timeout: total timeout in seconds per request, None waits forever
+    :param ResponseCache cache: cache for decoded responses, None to disable
+        caching
+    :param boolean coalesce: share one request between tasks making the same
+        request at the same time
+    :param RequestMetrics metrics: records the requests made, None to
+        disable recording
+    :param decoder: JSON decoder, see CoronaSession
+    :param ResponseArchive archive: see CoronaSession
+    :param AdaptiveLimiter limiter: limiter of the requests in flight, None
+        to only be limited by the number of connections
+    :param RetryPolicy retry: see CoronaSession, None to never retry
+    :param CircuitBreaker circuit_breaker: see CoronaSession, None to always
+        send requests
+    """
+    def __init__(self, headers=None, limit=DEFAULT_POOL_MAXSIZE,
+                 keep_alive=True, timeout=None, cache=None, coalesce=True,
+                 metrics=None, decoder=None, archive=None, limiter=None,
+                 retry=None, circuit_breaker=None):
+        self.headers = dict(headers or {})
+        self.limit = limit
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.cache = cache
+        self.coalesce = coalesce
+        self.metrics = metrics
+        self.decoder = decoder
+        self._loads = get_decoder(decoder)
+        self.archive = archive
+        self.limiter = limiter
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.shared = 0
+        self.session = None
+        self._session_loop = None
+        self._in_flight = {}
+
+    def _get_client_session(self):
+        if aiohttp is None:
+            raise ImportError(
+                'aiohttp is required for AsyncCoronaSession, install '
+                'corona_analytics_client[async]')
+        loop = asyncio.get_event_loop()
+        # An aiohttp session only works on the loop it was created on, e.g.
+        # not after a previous asyncio.run has closed it
+        if (self.session is None or self.session.closed or
+                self._session_loop is not loop):
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, force_close=not self.keep_alive)
+            self.session = aiohttp.ClientSession(
+                headers=self.headers, connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._session_loop = loop
+        return self.session
+
+    @staticmethod
+    def _encode_params(params):
+        """
+        aiohttp only accepts str, int and float params where requests calls
+        str() on anything else, e.g. dates.
+        """
+        if params is None:
+            return None
+        return {key: value if isinstance(value, (str, int, float)) and
+                not isinstance(value, bool) else str(value)
+                for key, value in params.items()}
+
+    async def get_json(self, url, params=None, fields=None):
+        """
+        Send a GET request and decode the JSON body, or return the cached
+        response for the same url and params.
+        :param tuple fields: see CoronaSession.get_json
+        :return: decoded response
+        """
+        key = request_key(url, params)
+        if fields:
+            key = key + (tuple(fields),)
+        endpoint = get_endpoint(url)
+        if self.cache is not None:
+            hit, value = self.cache.get(key, endpoint)
+            if hit:
+                return value
+        if not self.coalesce:
+            return await self._load_json(url, params, key, endpoint, fields)
+        # Requests are only shared within an event loop
+        flight_key = (asyncio.get_event_loop(), key)
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._load_json(url, params, key, endpoint, fields))
+            self._in_flight[flight_key] = task
+            task.add_done_callback(
+                lambda _: self._in_flight.pop(flight_key, None))
+        else:
+            self.shared += 1
+        # Cancelling one waiter mustn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _load_json(self, url, params, key, endpoint, fields=None):
+        attempt = 0
+        while True:
+            body, status = await self._get_body(url, params, endpoint)
+            start = time.perf_counter()
+            try:
+                if fields:
+                    value = decode_fields(body, fields, self.decoder)
+                else:
+                    value = self._loads(body)
+                break
+            except ValueError:
+                if not self._can_retry_decode(attempt, status):
+                    raise
+            if self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            await asyncio.sleep(self.retry.get_delay(attempt))
+            attempt += 1
+        if self.metrics is not None:
+            self.metrics.record_decode(endpoint, time.perf_counter() - start)
+        if self.cache is not None and is_success(status):
+            self.cache.set(key, value, endpoint, len(body))
+        return value
+
+    def _can_retry_decode(self, attempt, status):
+        return (is_success(status) and self.retry is not None and
+                self.retry.decode_errors and
+                self.retry.can_retry(attempt) and
+                not (self.archive is not None and self.archive.replaying))
+
+    async def _get_body(self, url, params, endpoint):
+        start = time.perf_counter()
+        if self.archive is not None and self.archive.replaying:
+            resp = self.archive.replay(url, params)
+            body, status = resp.content, resp.status_code
+        else:
+            body, status, headers = await self._send(url, params, endpoint)
+            if self.archive is not None:
+                self.archive.record(url, params, status, body, headers)
+        if self.metrics is not None:
+            self.metrics.record_request(
+                endpoint, time.perf_counter() - start, len(body), status)
+        return body, status
+
+    async def _send(self, url, params, endpoint):
+        """
+        Send a GET request with the circuit breaker and retry policy of
+        CoronaSession._send.
+        :return: body, status and headers of the response
+        """
+        if self.circuit_breaker is None:
+            return await self._send_with_retries(url, params, endpoint)
+        self.circuit_breaker.before_request(endpoint)
+        status = None
+        try:
+            body, status, headers = await self._send_with_retries(
+                url, params, endpoint)
+        finally:
+            self.circuit_breaker.record(endpoint, status)
+        return body, status, headers
+
+    async def _send_with_retries(self, url, params, endpoint):
+        attempt = 0
+        while True:
+            try:
+                body, status, headers = await self._send_once(
+                    url, params, endpoint)
+            except Exception as error:
+                if (self.retry is None or not self.retry.can_retry(attempt) or
+                        not self.retry.is_retryable_error(error)):
+                    raise
+                delay = self.retry.get_delay(attempt)
+            else:
+                if (self.retry is None or not self.retry.can_retry(attempt) or
+                        not self.retry.is_retryable_status(status)):
+                    return body, status, headers
+                delay = self.retry.get_delay(
+                    attempt, headers.get('Retry-After'))
+            if self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send_once(self, url, params, endpoint):
+        session = self._get_client_session()
+        started = None
+        if self.limiter is not None:
+            started = await self.limiter.acquire_async(endpoint)
+        status = None
+        try:
+            async with session.get(
+                    url, params=self._encode_params(params)) as resp:
+                body, status = await resp.read(), resp.status
+        finally:
+            if started is not None:
+                self.limiter.release(endpoint, started, status)
+        return body, status, resp.headers
+
+    async def close(self):
+        """
+        Close the aiohttp session, releasing its connections. A new one is
+        created if the session is used again.
+        """
+        if self.session is not None:
+            await self.session.close()
+
+    aclose = close
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def get_session(corona_client):
+    """
+    Return the CoronaSession attached to corona_client, creating one with
+    default pool settings on first use.
+    """
+    session = getattr(corona_client, '_corona_session', None)
+    if session is None:
+        with _session_lock:
+            session = getattr(corona_client, '_corona_session', None)
+            if session is None:
+                session = CoronaSession(
+                    headers=getattr(corona_client, 'headers', None))
+                corona_client._corona_session = session
+    return session
+
+
+def configure_session(corona_client, **kwargs):
+    """
+    Replace the CoronaSession attached to corona_client, e.g. to change
+    pool size or keep-alive:
+
+    configure_session(corona_client, pool_maxsize=50, keep_alive=True)
+
+    The AsyncCoronaSession of corona_client, if any, is dropped so that
+    get_async_session builds a new one sharing the new session's cache,
+    archive and limiter. Close it first (await session.close()) if it is
+    still open; AsyncMPAN and AsyncAllPPAMPANs made before keep it.
+
+    :param kwargs: CoronaSession keyword arguments
+    :return: the new CoronaSession
+    """
+    kwargs.setdefault('headers', getattr(corona_client, 'headers', None))
+    with _session_lock:
+        old_session = getattr(corona_client, '_corona_session', None)
+        session = CoronaSession(**kwargs)
+        corona_client._corona_session = session
+        corona_client._corona_async_session = None
+    if old_session is not None:
+        old_session.close()
+    return session
+
+
+def get_async_session(corona_client):
+    """
+    Return the AsyncCoronaSession attached to corona_client, configured like
+    its CoronaSession and sharing its cache and metrics.
+    """
+    session = getattr(corona_client, '_corona_async_session', None)
+    if session is None:
+        sync_session = get_session(corona_client)
+        with _session_lock:
+            session = getattr(corona_client, '_corona_async_session', None)
+            if session is None:
+                session = AsyncCoronaSession(
+                    headers=sync_session.headers,
+                    limit=sync_session.pool_maxsize,
+                    keep_alive=sync_session.keep_alive,
+                    timeout=sync_session.timeout,
+                    cache=sync_session.cache,
+                    coalesce=sync_session.single_flight is not None,
+                    metrics=sync_session.metrics,
+                    decoder=sync_session.decoder,
+                    archive=sync_session.archive,
+                    limiter=sync_session.limiter,
+                    retry=sync_session.retry,
+                    circuit_breaker=sync_session.circuit_breaker)
+                corona_client._corona_async_session = session
+    return session
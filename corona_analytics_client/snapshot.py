@@ -0,0 +1,425 @@
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from corona_analytics_client.access_ppa import MPAN, PPAContract
+from corona_analytics_client.dates import to_datetime64
+from corona_analytics_client.quote_table import QuoteTable, get_quote_meter_type
+
+SNAPSHOT_VERSION = 1
+FORMATS = ('arrow', 'parquet', 'npy')
+META_FILE = 'snapshot.json'
+
+# Columns of each table and their kind. Missing values are '' for str, -1
+# for int, NaN for float and NaT for date and datetime. json columns hold
+# the raw Corona responses.
+# start_date and end_date are kept to the microsecond, with query_date_type
+# 'date' if they were dates rather than datetimes, so MPANs get them back as
+# they were given
+MPAN_COLUMNS = (
+    ('full_mpan', 'str'), ('start_date', 'datetime'), ('end_date', 'datetime'),
+    ('site_name', 'str'), ('company_id', 'int'), ('meter_type', 'str'),
+    ('site_postcode', 'str'), ('site_latitude', 'float'),
+    ('site_longitude', 'float'), ('start_live_date', 'date'),
+    ('end_live_date', 'date'), ('live_contract', 'int'),
+    ('site_info', 'json'), ('billing_details', 'json'),
+    ('registration_details', 'json'), ('assets', 'json'),
+    ('query_date_type', 'str'),
+)
+CONTRACT_COLUMNS = (
+    ('mpan', 'str'), ('quote_id', 'int'), ('quote_type', 'str'),
+    ('technology', 'str'), ('meter_type', 'str'), ('capacity_kw', 'float'),
+    ('contract_start_date', 'date'), ('contract_end_date', 'date'),
+    ('created_time', 'datetime'), ('details', 'json'),
+)
+PRICE_COLUMNS = (
+    ('contract', 'int'), ('price_type', 'str'), ('value', 'float'),
+    ('pass_through', 'float'), ('contract_type', 'str'),
+)
+TABLES = (
+    ('mpans', MPAN_COLUMNS),
+    ('contracts', CONTRACT_COLUMNS),
+    ('prices', PRICE_COLUMNS),
+)
+DATE_UNITS = {'date': 'D', 'datetime': 'us'}
+
+
+def _to_column(values, kind):
+    """
+    Array, or list of JSON strings, of the Python values of a column.
+    """
+    if kind == 'str':
+        return np.array(['' if value is None else str(value)
+                         for value in values], dtype=str)
+    if kind == 'int':
+        return np.array([-1 if value is None else value for value in values],
+                        dtype=np.int64)
+    if kind == 'float':
+        return np.array([np.nan if value is None else value
+                         for value in values], dtype=np.float64)
+    if kind in DATE_UNITS:
+        return to_datetime64(values, DATE_UNITS[kind])
+    return [json.dumps(value, default=str) for value in values]
+
+
+def _to_values(column, kind):
+    """
+    Python values of a column, None where they are missing.
+    """
+    if kind == 'json':
+        return [json.loads(value) for value in column]
+    # tolist converts NaT to None and datetime64 to dates and datetimes
+    values = np.asarray(column).tolist()
+    if kind == 'str':
+        return [value or None for value in values]
+    if kind == 'int':
+        return [None if value == -1 else value for value in values]
+    if kind == 'float':
+        return [None if value != value else value for value in values]
+    return values
+
+
+def _get_date_type(*values):
+    """
+    'date' if the values which are set are dates rather than datetimes,
+    else None.
+    """
+    values = [value for value in values if value is not None]
+    if values and not any(isinstance(value, datetime.datetime)
+                          for value in values):
+        return 'date'
+    return None
+
+
+class EncodedStrings(object):
+    """
+    Column of strings stored as their concatenated UTF-8 bytes and the
+    offset of each, which can be memory-mapped unlike an array of objects.
+    Strings are only decoded when indexed.
+
+    :param data: uint8 array of the bytes of all the strings
+    :param offsets: int64 array of the start of each string and the end of
+        the last one
+    """
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def get_default_format():
+    """
+    'arrow' if pyarrow is installed, else 'npy'.
+    """
+    return 'arrow' if pyarrow is not None else 'npy'
+
+
+def _save_npy(directory, name, columns, kinds):
+    for column, kind in kinds:
+        path = os.path.join(directory, '{}.{}'.format(name, column))
+        values = columns[column]
+        if kind == 'json':
+            if not isinstance(values, EncodedStrings):
+                values = EncodedStrings.from_strings(values)
+            np.save(path + '.data.npy', values.data)
+            np.save(path + '.offsets.npy', values.offsets)
+        else:
+            np.save(path + '.npy', values)
+
+
+def _load_npy(directory, name, kinds, mmap):
+    mmap_mode = 'r' if mmap else None
+    columns = {}
+    for column, kind in kinds:
+        path = os.path.join(directory, '{}.{}'.format(name, column))
+        if kind == 'json':
+            columns[column] = EncodedStrings(
+                np.load(path + '.data.npy', mmap_mode=mmap_mode),
+                np.load(path + '.offsets.npy', mmap_mode=mmap_mode))
+        else:
+            columns[column] = np.load(path + '.npy', mmap_mode=mmap_mode)
+    return columns
+
+
+def _to_arrow_table(columns, kinds):
+    arrays = []
+    for column, kind in kinds:
+        values = columns[column]
+        if kind in DATE_UNITS:
+            # Kept as int64 so NaT round trips and the column can be mapped
+            arrays.append(pyarrow.array(np.asarray(values).view(np.int64)))
+        elif kind in ('int', 'float'):
+            arrays.append(pyarrow.array(np.asarray(values)))
+        else:
+            arrays.append(pyarrow.array([str(value) for value in values],
+                                        type=pyarrow.string()))
+    return pyarrow.Table.from_arrays(
+        arrays, names=[column for column, _ in kinds])
+
+
+def _from_arrow_table(table, kinds):
+    columns = {}
+    for column, kind in kinds:
+        values = table.column(column)
+        if kind == 'str':
+            columns[column] = np.array(values.to_pylist(), dtype=str)
+        elif kind == 'json':
+            columns[column] = values.to_pylist()
+        elif kind in DATE_UNITS:
+            columns[column] = values.to_numpy().view(
+                'datetime64[{}]'.format(DATE_UNITS[kind]))
+        else:
+            columns[column] = values.to_numpy()
+    return columns
+
+
+def _save_arrow(directory, name, columns, kinds, file_format):
+    table = _to_arrow_table(columns, kinds)
+    path = os.path.join(directory, '{}.{}'.format(name, file_format))
+    if file_format == 'parquet':
+        pyarrow.parquet.write_table(table, path)
+        return
+    with pyarrow.OSFile(path, 'wb') as sink:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _load_arrow(directory, name, kinds, file_format, mmap):
+    path = os.path.join(directory, '{}.{}'.format(name, file_format))
+    if file_format == 'parquet':
+        table = pyarrow.parquet.read_table(path, memory_map=mmap)
+    else:
+        source = pyarrow.memory_map(path, 'r') if mmap else pyarrow.OSFile(
+            path, 'rb')
+        with source:
+            table = pyarrow.ipc.open_file(source).read_all()
+    return _from_arrow_table(table, kinds)
+
+
+class PortfolioSnapshot(object):
+    """
+    Columnar snapshot of hydrated MPANs, their contracts and product quote
+    values, and their site, billing, registration and asset responses, which
+    can be saved and loaded back rather than hydrating the portfolio from
+    Corona again:
+
+    snapshot = PortfolioSnapshot.from_mpans(batch.set_all_info())
+    snapshot.save('portfolio')
+
+    snapshot = PortfolioSnapshot.load('portfolio')
+    table = snapshot.get_quote_table()
+    mpans = snapshot.to_mpans(corona_client)
+
+    A snapshot is a directory of Arrow IPC or Parquet files if pyarrow is
+    installed, else of NumPy .npy files. Arrow and .npy files are memory-mapped
+    when loaded, so only the columns used are read from disk.
+
+    :param dict tables: columns of the mpans, contracts and prices tables,
+        see TABLES
+    :param str created_time: ISO time the MPANs were hydrated
+    """
+    tables = TABLES
+
+    def __init__(self, tables, created_time=None):
+        self.columns = tables
+        self.created_time = created_time
+
+    @classmethod
+    def from_mpans(cls, mpans):
+        """
+        :param dict mpans: hydrated MPANs by full MPAN, e.g. from
+            MPANBatch.set_all_info
+        """
+        rows = {'mpans': [], 'contracts': [], 'prices': []}
+        for mpan in mpans.values():
+            live_contract = None
+            for contract in mpan.ppa_contracts or ():
+                if contract is mpan.live_ppa_contract:
+                    live_contract = len(rows['contracts'])
+                for price_type, value in contract.values.items():
+                    rows['prices'].append({
+                        'contract': len(rows['contracts']),
+                        'price_type': price_type,
+                        'value': value,
+                        'pass_through': contract.pass_throughs.get(price_type),
+                        'contract_type': contract.contract_types.get(
+                            price_type),
+                    })
+                details = contract.details
+                rows['contracts'].append(dict(
+                    {field: details.get(field) for field, _ in CONTRACT_COLUMNS},
+                    mpan=mpan.full_mpan,
+                    meter_type=get_quote_meter_type(details) or None,
+                    details=details))
+            row = {field: getattr(mpan, field, None)
+                   for field, _ in MPAN_COLUMNS}
+            row['live_contract'] = live_contract
+            row['query_date_type'] = _get_date_type(mpan.start_date,
+                                                    mpan.end_date)
+            rows['mpans'].append(row)
+        tables = {
+            name: {field: _to_column([row[field] for row in rows[name]], kind)
+                   for field, kind in kinds}
+            for name, kinds in cls.tables}
+        return cls(tables,
+                   created_time=datetime.datetime.utcnow().isoformat() + 'Z')
+
+    def __len__(self):
+        return len(self.columns['mpans']['full_mpan'])
+
+    def save(self, path, file_format=None):
+        """
+        Write the snapshot to the directory path, replacing a previous
+        snapshot only once it is completely written.
+        :param str file_format: 'arrow', 'parquet' or 'npy', see
+            get_default_format
+        """
+        file_format = file_format or get_default_format()
+        if file_format not in FORMATS:
+            raise ValueError('Unknown snapshot format {}'.format(file_format))
+        if file_format != 'npy' and pyarrow is None:
+            raise ImportError('pyarrow is required for {} snapshots'.format(
+                file_format))
+        tmp_path = '{}.tmp'.format(path)
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for name, kinds in self.tables:
+            if file_format == 'npy':
+                _save_npy(tmp_path, name, self.columns[name], kinds)
+            else:
+                _save_arrow(tmp_path, name, self.columns[name], kinds,
+                            file_format)
+        meta = {'version': SNAPSHOT_VERSION,
+                'format': file_format,
+                'created_time': self.created_time,
+                'rows': {name: len(self.columns[name][kinds[0][0]])
+                         for name, kinds in self.tables}}
+        with open(os.path.join(tmp_path, META_FILE), 'w') as fp:
+            json.dump(meta, fp)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        :param str path: directory the snapshot was saved to
+        :param bool mmap: memory-map the files rather than reading them,
+            ignored for Parquet columns which have to be decoded
+        """
+        with open(os.path.join(path, META_FILE), 'r') as fp:
+            meta = json.load(fp)
+        if meta['version'] != SNAPSHOT_VERSION:
+            raise ValueError('Snapshot {} is version {}, not {}'.format(
+                path, meta['version'], SNAPSHOT_VERSION))
+        file_format = meta['format']
+        if file_format != 'npy' and pyarrow is None:
+            raise ImportError('pyarrow is required for {} snapshots'.format(
+                file_format))
+        tables = {}
+        for name, kinds in cls.tables:
+            if file_format == 'npy':
+                tables[name] = _load_npy(path, name, kinds, mmap)
+            else:
+                tables[name] = _load_arrow(path, name, kinds, file_format,
+                                           mmap)
+        return cls(tables, created_time=meta['created_time'])
+
+    def get_quote_table(self):
+        """
+        QuoteTable of the contracts, sharing their columns.
+        """
+        return QuoteTable({field: self.columns['contracts'][field]
+                           for field in QuoteTable.fields})
+
+    def _get_rows(self, name):
+        kinds = dict(self.tables)[name]
+        fields = [field for field, _ in kinds]
+        values = [_to_values(self.columns[name][field], kind)
+                  for field, kind in kinds]
+        for row in zip(*values):
+            yield dict(zip(fields, row))
+
+    def to_mpans(self, corona_client=None):
+        """
+        Rebuild the MPANs, without requesting anything from Corona.
+        :param corona_client: client of the MPANs and their contracts, for
+            any further requests
+        :return: dict of MPAN by full MPAN
+        """
+        prices = {}
+        for row in self._get_rows('prices'):
+            prices.setdefault(row['contract'], []).append(row)
+        contracts = []
+        mpan_contracts = {}
+        for index, row in enumerate(self._get_rows('contracts')):
+            contract = PPAContract(corona_client, product_quotes=[],
+                                   **row['details'])
+            for price in prices.get(index, ()):
+                contract.values[price['price_type']] = price['value']
+                contract.pass_throughs[price['price_type']] = price[
+                    'pass_through']
+                contract.contract_types[price['price_type']] = price[
+                    'contract_type']
+            contracts.append(contract)
+            mpan_contracts.setdefault(row['mpan'], []).append(contract)
+
+        mpans = {}
+        for row in self._get_rows('mpans'):
+            start_date, end_date = row['start_date'], row['end_date']
+            if row['query_date_type'] == 'date':
+                start_date = start_date and start_date.date()
+                end_date = end_date and end_date.date()
+            mpan = MPAN(corona_client, row['full_mpan'], start_date, end_date)
+            for field, _ in MPAN_COLUMNS[3:]:
+                if field not in ('live_contract', 'query_date_type'):
+                    setattr(mpan, field, row[field])
+            mpan.assets = mpan.assets or []
+            mpan.ppa_contracts = mpan_contracts.get(row['full_mpan'], [])
+            if row['live_contract'] is not None:
+                mpan.live_ppa_contract = contracts[row['live_contract']]
+            mpans[mpan.full_mpan] = mpan
+        return mpans
+
+
+def save_snapshot(mpans, path, file_format=None):
+    """
+    Save hydrated MPANs to a PortfolioSnapshot at path.
+    :param dict mpans: MPANs by full MPAN
+    :return: the PortfolioSnapshot
+    """
+    snapshot = PortfolioSnapshot.from_mpans(mpans)
+    snapshot.save(path, file_format=file_format)
+    return snapshot
+
+
+def load_snapshot(path, mmap=True):
+    return PortfolioSnapshot.load(path, mmap=mmap)
@@ -0,0 +1,103 @@
+import json
+import os
+
+from corona_analytics_client.access_ppa import AllPPAMPANs
+
+
+class QuoteSync(object):
+    """
+    Keep a local snapshot of ppa/quotes up to date by only requesting quotes
+    at or after the high-water mark of the last sync:
+
+    quote_sync = QuoteSync(corona_client, path='quotes.json')
+    quote_sync.sync()
+    quotes = quote_sync.quotes
+
+    The watermark is the latest watermark_field seen, and is queried with
+    the <watermark_field>_gte filter. Quotes are merged into the snapshot by
+    quote_id, so quotes fetched again on the watermark boundary replace
+    rather than duplicate. created_time only picks up new quotes; use a
+    modified time field, if Corona has one, to pick up changed quotes too.
+
+    :param corona_client:
+    :param str path: JSON file the snapshot is kept in between runs, None to
+        keep it in memory only
+    :param str watermark_field: quote field used as the high-water mark
+    :param dict params: other ppa/quotes filters, e.g. {'meter_type': 'export'}
+    :param int page_size: stream quotes page_size at a time
+    """
+    def __init__(self, corona_client, path=None, watermark_field='created_time',
+                 params=None, page_size=None):
+        self.corona_client = corona_client
+        self.path = path
+        self.watermark_field = watermark_field
+        self.params = dict(params or {})
+        self.page_size = page_size
+        self.watermark = None
+        self.quotes = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, 'r') as fp:
+            snapshot = json.load(fp)
+        if snapshot['watermark_field'] != self.watermark_field:
+            raise ValueError(
+                'Snapshot {} was synced on {}, not {}'.format(
+                    self.path, snapshot['watermark_field'],
+                    self.watermark_field))
+        self.watermark = snapshot['watermark']
+        self.quotes = {quote['quote_id']: quote for quote in snapshot['quotes']}
+
+    def save(self):
+        """
+        Write the snapshot to path, replacing the previous one only once it is
+        completely written.
+        """
+        snapshot = {'watermark_field': self.watermark_field,
+                    'watermark': self.watermark,
+                    'quotes': list(self.quotes.values())}
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as fp:
+            json.dump(snapshot, fp)
+        os.replace(tmp_path, self.path)
+
+    def get_new_quotes(self):
+        """
+        Request quotes at or after the watermark, or all quotes on the first
+        sync.
+        """
+        all_ppas = AllPPAMPANs(self.corona_client, None, None,
+                               contracted_ppa=False,
+                               remove_cancelled_contracts=False)
+        all_ppas.params.update(self.params)
+        if self.watermark is not None:
+            all_ppas.params['{}_gte'.format(self.watermark_field)] = \
+                self.watermark
+        return all_ppas._get_quotes(self.page_size)
+
+    def sync(self):
+        """
+        Merge new and changed quotes into the snapshot, move the watermark
+        on and save the snapshot if there is a path.
+        :return: dict of the number of quotes fetched, added and updated, and
+            the new watermark
+        """
+        fetched = added = updated = 0
+        watermark = self.watermark
+        for quote in self.get_new_quotes():
+            fetched += 1
+            previous = self.quotes.get(quote['quote_id'])
+            if previous is None:
+                added += 1
+            elif previous != quote:
+                updated += 1
+            self.quotes[quote['quote_id']] = quote
+            value = quote.get(self.watermark_field)
+            if value is not None and (watermark is None or value > watermark):
+                watermark = value
+        self.watermark = watermark
+        if self.path:
+            self.save()
+        return {'fetched': fetched, 'added': added, 'updated': updated,
+                'watermark': self.watermark}
@@ -58,12 +58,12 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, name, resp", [
         (10, None, test_companies_url),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_companies_response_company_id(
             self, mock_url, mock_get, company, company_id, name, resp):
         mock_url.return_value = resp
-        mock_get.return_value = self.create_reponse(resp+str(company_id))
+        mock_get.return_value = resp+str(company_id)
         company.company_id = company_id
         company.name = name
         company._add_params()
@@ -73,10 +73,10 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, name, resp", [
         (None, 'Awesome AD Limited', test_companies_url,),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_companies_response_company_name(
             self, mock_get, company, company_id, name, resp):
-        mock_get.return_value = self.create_reponse(resp)
+        mock_get.return_value = resp
         company.company_id = company_id
         company.name = name
         company._add_params()
@@ -87,10 +87,10 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, name, resp", [
         (None, None, None,),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_companies_response_none(
             self, mock_get, company, company_id, name, resp):
-        mock_get.return_value = self.create_reponse(resp)
+        mock_get.return_value = resp
         company.company_id = company_id
         company.name = name
         company._add_params()
@@ -100,9 +100,9 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, resp", [
         (10, test_billing_url,),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_billing_response(self, mock_get, company, company_id, resp):
-        mock_get.return_value = self.create_reponse(resp)
+        mock_get.return_value = resp
         company.company_id = company_id
         company._add_params()
         company.get_billing_response()
@@ -111,10 +111,10 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, resp", [
         (None, None,),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_billing_response_none(
             self, mock_get, company, company_id, resp):
-        mock_get.return_value = self.create_reponse(resp)
+        mock_get.return_value = resp
         company.company_id = company_id
         company._add_params()
         result = company.get_billing_response()
@@ -123,9 +123,9 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, resp", [
         (10, test_site_url,),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_site_response(self, mock_get, company, company_id, resp):
-        mock_get.return_value = self.create_reponse(resp+str(company_id))
+        mock_get.return_value = resp+str(company_id)
         company.company_id = company_id
         company._add_params()
         company.get_site_response()
@@ -134,9 +134,9 @@ class TestCompany:
     @pytest.mark.parametrize("company_id, resp", [
         (None, None,),
     ])
-    @mock.patch('corona_analytics_client.access_company.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_site_response_none(self, mock_get, company, company_id, resp):
-        mock_get.return_value = self.create_reponse(resp)
+        mock_get.return_value = resp
         company.company_id = company_id
         company._add_params()
         result = company.get_site_response()
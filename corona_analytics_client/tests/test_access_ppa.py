@@ -4,7 +4,9 @@ from unittest.mock import patch
 
 import pytest
 
-from corona_analytics_client.access_ppa import (PPAContract, MPAN, CoronaPPAParamsMixin, AllPPAMPANs)
+from corona_analytics_client.access_ppa import (PPAContract, MPAN, CoronaPPAParamsMixin, AllPPAMPANs,
+                                                MPANBatch, LazyMPAN, get_hydration_parts)
+from corona_analytics_client.retry import CircuitOpenError
 from corona_analytics_client.settings import corona_config
 from lj_clients.clients import CoronaClient
 
@@ -177,11 +179,11 @@ class TestAllPPAMPANs:
             (test_resp, test_url_quotes, datetime.date(2015, 1, 1),
              datetime.date(2015, 1, 31), True, True),
         ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_corona_response_both(
             self, mock_get, corona_client, resp, url, start_date, end_date, contracted_ppa,
             remove_cancelled):
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         all_ppas = AllPPAMPANs(
             corona_client, start_date, end_date, contracted_ppa, remove_cancelled)
         all_ppas._add_params()
@@ -191,18 +193,18 @@ class TestAllPPAMPANs:
                          'contract_end_date_gte': start_date,
                          'contracted_ppa': 'true',
                          'remove_cancelled_contracts': 'true',
-                         })
+                         }, fields=None)
 
     @pytest.mark.parametrize(
         "resp, url, start_date, end_date, contracted_ppa, remove_cancelled", [
             (test_resp_start_only, test_url_quotes,
              datetime.date(2015, 1, 1), None, True, True),
         ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_corona_response_one(
             self, mock_get, corona_client, resp, url, start_date, end_date, contracted_ppa,
             remove_cancelled):
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         all_ppas = AllPPAMPANs(
             corona_client, start_date, end_date, contracted_ppa, remove_cancelled)
         all_ppas._add_params()
@@ -211,7 +213,7 @@ class TestAllPPAMPANs:
             'contract_start_date_gte': start_date,
             'contracted_ppa': 'true',
             'remove_cancelled_contracts': 'true',
-             })
+             }, fields=None)
 
     @pytest.mark.parametrize(
         "resp, url, start_date, end_date, contracted_ppa, remove_cancelled,"
@@ -220,11 +222,11 @@ class TestAllPPAMPANs:
              datetime.date(2015, 1, 1), datetime.date(2015, 1, 31), True,
              False, {'008450062012345678910', '008450062012345678911'},),
         ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_all_mpans(
             self, mock_get, corona_client, resp, url, start_date, end_date, contracted_ppa,
             remove_cancelled, result_expected):
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         all_ppas = AllPPAMPANs(
             corona_client, start_date, end_date, contracted_ppa, remove_cancelled)
         result = all_ppas.get_all_ppa_mpans()
@@ -232,7 +234,7 @@ class TestAllPPAMPANs:
             'contract_start_date_lte': end_date,
             'contract_end_date_gte': start_date,
             'contracted_ppa': 'true',
-            })
+            }, fields=('mpan', 'quote_type'))
         assert result == result_expected
 
     @pytest.mark.parametrize(
@@ -242,11 +244,11 @@ class TestAllPPAMPANs:
              datetime.date(2015, 1, 1), datetime.date(2015, 1, 31), True,
              False, {1001, 1009},),
         ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_all_quotes(
             self, mock_get, corona_client, resp, url, start_date, end_date, contracted_ppa,
             remove_cancelled, result_expected):
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         all_ppas = AllPPAMPANs(
             corona_client, start_date, end_date, contracted_ppa, remove_cancelled)
         result = all_ppas.get_all_ppa_quote_ids()
@@ -254,9 +256,157 @@ class TestAllPPAMPANs:
             'contract_start_date_lte': end_date,
             'contract_end_date_gte': start_date,
             'contracted_ppa': 'true',
-            })
+            }, fields=('quote_id',))
         assert result == result_expected
 
+    @pytest.mark.parametrize("page_size, params_expected", [
+        (100, {'contract_start_date_lte': datetime.date(2015, 1, 31),
+               'contract_end_date_gte': datetime.date(2015, 1, 1),
+               'contracted_ppa': 'true',
+               'remove_cancelled_contracts': 'true',
+               'page_size': 100}),
+        (None, {'contract_start_date_lte': datetime.date(2015, 1, 31),
+                'contract_end_date_gte': datetime.date(2015, 1, 1),
+                'contracted_ppa': 'true',
+                'remove_cancelled_contracts': 'true'}),
+    ])
+    @mock.patch('corona_analytics_client.session.CoronaSession.iter_items')
+    def test_iter_quotes(self, mock_iter, corona_client, page_size, params_expected):
+        mock_iter.return_value = iter(self.test_resp)
+        all_ppas = AllPPAMPANs(
+            corona_client, datetime.date(2015, 1, 1), datetime.date(2015, 1, 31))
+        all_ppas._add_params()
+        result = list(all_ppas.iter_quotes(page_size))
+        mock_iter.assert_called_once_with(self.test_url_quotes, params=params_expected)
+        assert result == self.test_resp
+
+    @pytest.mark.parametrize("query_filters, quote_type, meter_type, params_expected, result_expected", [
+        (('quote_type', 'meter_type'), 'Fixed', 'Export',
+         {'quote_type': 'Fixed', 'meter_type': 'export'},
+         {'008450062012345678910', '008450062012345678913'}),
+        (('quote_type',), None, 'import', {},
+         {'008450062012345678911', '008450062012345678912',
+          '008450062012345678913'}),
+        ((), 'Flexible', None, {}, {'008450062012345678911'}),
+    ])
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_get_all_mpans_filters(
+            self, mock_get, corona_client, query_filters, quote_type, meter_type,
+            params_expected, result_expected):
+        # Filters are checked on the quotes whether or not Corona applied them
+        mock_get.return_value = [
+            {'mpan': '008450062012345678910', 'quote_type': 'Fixed',
+             'meter_type': 'E'},
+            {'mpan': '008450062012345678911', 'quote_type': 'Flexible',
+             'meter_type': 'import'},
+            {'mpan': '008450062012345678912', 'quote_type': 'Fixed',
+             'meter_type': 'import'},
+            {'mpan': '008450062012345678913', 'quote_type': 'Fixed'},
+        ]
+        all_ppas = AllPPAMPANs(
+            corona_client, datetime.date(2015, 1, 1), datetime.date(2015, 1, 31))
+        all_ppas.query_filters = query_filters
+        result = all_ppas.get_all_ppa_mpans(quote_type, meter_type=meter_type)
+        params_expected.update({
+            'contract_start_date_lte': datetime.date(2015, 1, 31),
+            'contract_end_date_gte': datetime.date(2015, 1, 1),
+            'contracted_ppa': 'true', 'remove_cancelled_contracts': 'true'})
+        assert mock_get.call_args[1]['params'] == params_expected
+        assert result == result_expected
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    @mock.patch('corona_analytics_client.session.CoronaSession.iter_items')
+    def test_get_all_mpans_page_size(self, mock_iter, mock_get, corona_client):
+        mock_iter.return_value = iter(self.test_resp)
+        all_ppas = AllPPAMPANs(
+            corona_client, datetime.date(2015, 1, 1), datetime.date(2015, 1, 31))
+        result = all_ppas.get_all_ppa_mpans(page_size=1000)
+        mock_get.assert_not_called()
+        assert result == {'008450062012345678910', '008450062012345678911'}
+
+    @pytest.mark.parametrize("max_workers, meter_type, result_expected", [
+        (None, None, ['008450062012345678910', '008450062012345678912']),
+        (2, None, ['008450062012345678910', '008450062012345678912']),
+        (4, 'Export', ['008450062012345678910']),
+    ])
+    @mock.patch('corona_analytics_client.access_ppa.MPAN.set_all_info', autospec=True)
+    @mock.patch('corona_analytics_client.access_ppa.AllPPAMPANs.get_all_ppa_mpans')
+    def test_get_all_full_mpans_by_meter_type(
+            self, mock_mpans, mock_info, corona_client, max_workers, meter_type,
+            result_expected):
+        def set_all_info(m, include=None, fields=None):
+            assert include == ('contracts', 'site')
+            if m.full_mpan == '008450062012345678911':
+                raise ValueError('Corona returned a malformed response')
+            m.site_name = 'test_name'
+            m.meter_type = 'export' if m.full_mpan.endswith('10') else 'import'
+            m.ppa_contracts = [
+                PPAContract(corona_client, technology='Solar', capacity_kw=500)]
+        mock_mpans.return_value = {'008450062012345678912', '008450062012345678910'}
+        mock_info.side_effect = set_all_info
+        all_ppas = AllPPAMPANs(
+            corona_client, datetime.date(2015, 1, 1), datetime.date(2015, 1, 31))
+        result = all_ppas.get_all_full_mpans_by_meter_type(
+            meter_type, max_workers=max_workers)
+        mock_mpans.assert_called_once_with(meter_type=meter_type)
+        assert sorted(result) == result_expected
+        if max_workers:
+            assert list(result) == result_expected
+        assert result['008450062012345678910'] == {
+            'technology': 'Solar', 'site_name': 'test_name',
+            'meter_type': 'export', 'kW': 500}
+
+    @pytest.mark.parametrize("max_workers", [None, 2])
+    @mock.patch('corona_analytics_client.access_ppa.MPAN.set_all_info', autospec=True)
+    @mock.patch('corona_analytics_client.access_ppa.AllPPAMPANs.get_all_ppa_mpans')
+    def test_get_all_full_mpans_by_meter_type_errors(
+            self, mock_mpans, mock_info, corona_client, max_workers):
+        error = ValueError('Corona returned a malformed response')
+        mock_mpans.return_value = {'008450062012345678910', '008450062012345678911'}
+        mock_info.side_effect = error
+        all_ppas = AllPPAMPANs(
+            corona_client, datetime.date(2015, 1, 1), datetime.date(2015, 1, 31))
+        result = all_ppas.get_all_full_mpans_by_meter_type(
+            max_workers=max_workers)
+        assert result == {}
+        assert all_ppas.errors == {'008450062012345678910': error,
+                                   '008450062012345678911': error}
+
+    @mock.patch('corona_analytics_client.access_ppa.MPAN.set_all_info', autospec=True)
+    @mock.patch('corona_analytics_client.access_ppa.AllPPAMPANs.get_all_ppa_mpans')
+    def test_retry_failed_mpans(self, mock_mpans, mock_info, corona_client):
+        failures = {'008450062012345678911': CircuitOpenError('open'),
+                    '008450062012345678912': KeyError('capacity_kw')}
+
+        def set_all_info(m, include=None, fields=None):
+            if m.full_mpan in failures:
+                raise failures[m.full_mpan]
+            m.site_name = 'test_name'
+            m.meter_type = 'export'
+            m.ppa_contracts = [
+                PPAContract(corona_client, technology='Solar', capacity_kw=500)]
+        mock_mpans.return_value = {'008450062012345678910',
+                                   '008450062012345678911',
+                                   '008450062012345678912'}
+        mock_info.side_effect = set_all_info
+        all_ppas = AllPPAMPANs(
+            corona_client, datetime.date(2015, 1, 1), datetime.date(2015, 1, 31))
+        result = all_ppas.get_all_full_mpans_by_meter_type()
+        assert list(result) == ['008450062012345678910']
+        assert all_ppas.get_error_report() == {
+            'failed': 2,
+            'mpans': {'008450062012345678911': 'CircuitOpenError: open',
+                      '008450062012345678912': "KeyError: 'capacity_kw'"},
+            'errors': {'CircuitOpenError': ['008450062012345678911'],
+                       'KeyError': ['008450062012345678912']}}
+
+        del failures['008450062012345678911']
+        mock_info.reset_mock()
+        result = all_ppas.retry_failed_mpans()
+        assert mock_info.call_count == 2
+        assert list(result) == ['008450062012345678911']
+        assert list(all_ppas.errors) == ['008450062012345678912']
+
 
 class TestPPAContract:
 
@@ -334,11 +484,11 @@ class TestPPAContract:
         (test_resp_2, test_url_products, 1000, test_values_2),
     ])
     @mock.patch('lj_clients.clients.CoronaClient._get_url')
-    @mock.patch('lj_clients.clients.base.BaseClient.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_set_quote_info(
             self, mock_get, mock_url, corona_client, resp, url, quote_id, values_expected):
         mock_url.return_value = url
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         contract = PPAContract(corona_client, quote_id=quote_id)
         mock_get.assert_called_once_with(
             url, params={
@@ -355,10 +505,10 @@ class TestPPAContract:
         (None, test_url_products, 1),
     ])
     @mock.patch('lj_clients.clients.CoronaClient._get_url')
-    @mock.patch('lj_clients.clients.base.BaseClient.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_set_quote_info_none(self, mock_get, mock_url, corona_client, resp, url, quote_id):
         mock_url.return_value = url
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         contract = PPAContract(corona_client, quote_id=quote_id)
         mock_get.assert_called_once_with(
             url, params={
@@ -368,6 +518,122 @@ class TestPPAContract:
         assert not contract.pass_throughs
         assert not contract.contract_types
 
+    test_resp_bulk = [
+        {
+            'quote_id': 1000, 'value': 50.0, 'price_type': 'power',
+            'pass_through_percent': 95.5, 'product_quote_type': 'Flexible'
+        },
+        {
+            'quote_id': 1000, 'value': 0.22, 'price_type': 'aahedc',
+            'pass_through_percent': 96, 'product_quote_type': 'Flexible'
+        },
+        {
+            'quote_id': 1001, 'value': 40.0, 'price_type': 'power',
+            'pass_through_percent': 100, 'product_quote_type': 'Fixed'
+        },
+    ]
+
+    @mock.patch('lj_clients.clients.CoronaClient._get_url')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_from_quotes(self, mock_get, mock_url, corona_client):
+        mock_url.return_value = self.test_url_products
+        mock_get.side_effect = lambda url, params: {
+            1: self.test_resp, 1000: self.test_resp_2}.get(params['quote_id'])
+        contracts = PPAContract.from_quotes(
+            corona_client, [{'quote_id': 1}, {'quote_id': 1000},
+                            {'quote_id': 1002}])
+        assert mock_get.call_count == 3
+        mock_get.assert_any_call(self.test_url_products, params={'quote_id': 1})
+        assert contracts[0].values == self.test_values['values']
+        assert contracts[1].values == self.test_values_2['values']
+        assert not contracts[2].values
+
+    @mock.patch('lj_clients.clients.CoronaClient._get_url')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_from_quotes_bulk(self, mock_get, mock_url, corona_client):
+        mock_url.return_value = self.test_url_products
+        mock_get.return_value = self.test_resp_bulk
+        contracts = PPAContract.from_quotes(
+            corona_client, [{'quote_id': 1000}, {'quote_id': 1001},
+                            {'quote_id': 1002}], bulk=True)
+        mock_get.assert_called_once_with(
+            self.test_url_products, params={'quote_id__in': '1000,1001,1002'})
+        assert contracts[0].values == self.test_values_2['values']
+        assert contracts[0].pass_throughs == self.test_values_2['pass_throughs']
+        assert contracts[1].values == {'power': 40.0}
+        assert contracts[1].contract_types == {'power': 'Fixed'}
+        assert not contracts[2].values
+
+    @pytest.mark.parametrize("bulk_resp", [
+        # Items without their quote id
+        test_resp + test_resp_2,
+        # Quote ids which weren't asked for, as if the filter was ignored
+        test_resp_bulk + [dict(test_resp_bulk[0], quote_id=2000)],
+    ])
+    @mock.patch('lj_clients.clients.CoronaClient._get_url')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_from_quotes_bulk_fallback(self, mock_get, mock_url, corona_client,
+                                       bulk_resp):
+        responses = {1000: self.test_resp_2, 1001: self.test_resp}
+
+        def get_json(url, params):
+            if 'quote_id__in' in params:
+                return bulk_resp
+            return responses[params['quote_id']]
+        mock_url.return_value = self.test_url_products
+        mock_get.side_effect = get_json
+        contracts = PPAContract.from_quotes(
+            corona_client, [{'quote_id': 1000}, {'quote_id': 1001}], bulk=True)
+        assert mock_get.call_count == 3
+        assert contracts[0].values == self.test_values_2['values']
+        assert contracts[1].values == self.test_values['values']
+
+    @mock.patch('lj_clients.clients.CoronaClient._get_url')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_get_product_quotes_url_template(self, mock_get, mock_url,
+                                             corona_client):
+        mock_url.return_value = self.test_url_products + '{}'
+        mock_get.return_value = []
+        PPAContract.get_product_quotes(corona_client, [1])
+        PPAContract.get_product_quotes(corona_client, [1000, 1001], bulk=True)
+        for call in mock_get.call_args_list:
+            assert call[0][0] == self.test_url_products
+
+    @mock.patch('lj_clients.clients.CoronaClient._get_url')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_from_quotes_single(self, mock_get, mock_url, corona_client):
+        mock_url.return_value = self.test_url_products
+        mock_get.return_value = self.test_resp
+        contracts = PPAContract.from_quotes(corona_client, [{'quote_id': 1}])
+        mock_get.assert_called_once_with(
+            self.test_url_products, params={'quote_id': 1})
+        assert contracts[0].values == self.test_values['values']
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_from_quotes_known_product_quotes(self, mock_get, corona_client):
+        contracts = PPAContract.from_quotes(
+            corona_client, [{'quote_id': 1000}, {'quote_id': 1001}],
+            product_quotes={1000: self.test_resp_2})
+        mock_get.assert_not_called()
+        assert contracts[0].values == self.test_values_2['values']
+        assert not contracts[1].values
+
+    def test_from_quotes_dates(self, corona_client):
+        quotes = [
+            {'quote_id': 1000, 'contract_start_date': '2016-01-01',
+             'contract_end_date': '2016-10-31', 'spill_period': 5},
+            {'quote_id': 1001, 'contract_start_date': '2016-1-1',
+             'contract_end_date': None},
+            {'quote_id': 1002},
+        ]
+        contracts = PPAContract.from_quotes(
+            corona_client, quotes, product_quotes={})
+        for quote, contract in zip(quotes, contracts):
+            expected = PPAContract(corona_client, product_quotes=[], **quote)
+            assert contract.details == expected.details
+        assert contracts[0].details['spill_end'] == datetime.date(2016, 1, 5)
+        assert quotes[0]['contract_start_date'] == '2016-01-01'
+
     @pytest.mark.parametrize("str_dates, result_expected", [
         (('2016-01-01', '2016-10-31'),
          (datetime.date(2016, 1, 1), datetime.date(2016, 10, 31)),),
@@ -499,16 +765,14 @@ class TestMPAN:
           'spill_end': None}),
     ])
     @mock.patch('lj_clients.clients.CoronaClient._get_url')
-    @mock.patch('lj_clients.clients.base.BaseClient.get')
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_set_ppa_contracts(
-            self, mock_url, mock_get, mock_get2, mpan, corona_client, url, resp,
+            self, mock_get, mock_url, mpan, corona_client, url, resp,
             test_contracts, contract_expected):
         mpan.ppa_contracts = []
         for contract_details in test_contracts:
             mock_url.return_value = url
-            mock_get.return_value = self.create_response(resp)
-            mock_get2.json.return_value = contract_details
+            mock_get.return_value = resp
             mpan.ppa_contracts.append(self.ppa_contract(corona_client, **contract_details))
         mpan.set_live_ppa_contract()
         assert mpan.live_ppa_contract.details == contract_expected
@@ -521,24 +785,24 @@ class TestMPAN:
     @pytest.mark.parametrize("resp, url, site_id", [
         (test_sites, test_url_sites, 12),
     ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_get_site_info(
             self, mock_get, corona_client, mpan, resp, url, site_id):
         mpan.live_ppa_contract = PPAContract(corona_client)
         mpan.live_ppa_contract.details['site'] = site_id
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         mpan.get_site_info()
         mock_get.assert_called_once_with(url + str(site_id))
 
     @pytest.mark.parametrize("resp, site_resp, site_id", [
         (test_billing_details, test_sites, 12),
     ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_set_billing_details(
             self, mock_get, corona_client, mpan, resp, site_resp, site_id):
         mpan.live_ppa_contract = PPAContract(corona_client)
         mpan.live_ppa_contract.details['site'] = site_id
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         mpan.set_billing_details(site_resp)
         mock_get.assert_called_once_with(
             'http://corona.limejump.dev:8202/api/billing-info/?company=' +
@@ -547,10 +811,10 @@ class TestMPAN:
     @pytest.mark.parametrize("resp, site_resp", [
         (None, None,),
     ])
-    @mock.patch('corona_analytics_client.access_ppa.requests.get')
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
     def test_set_billing_details_none(self, mock_get, mpan, resp, site_resp):
         mpan.live_ppa_contract = None
-        mock_get.return_value = self.create_response(resp)
+        mock_get.return_value = resp
         mpan.set_billing_details(site_resp)
         assert not mpan.billing_details
 
@@ -581,6 +845,338 @@ class TestMPAN:
         mpan.set_meter_type()
         assert mpan.meter_type == result_expected
 
+    @staticmethod
+    def create_contracts(date_ranges):
+        return [mock.Mock(details={'contract_start_date': datetime.date(*start),
+                                   'contract_end_date': datetime.date(*end)})
+                for start, end in date_ranges]
+
+    test_contract_ranges = [
+        ((2017, 9, 1), (2017, 12, 31)),
+        ((2017, 1, 1), (2017, 3, 31)),
+        ((2017, 5, 1), (2017, 8, 31)),
+        ((2017, 2, 1), (2017, 2, 28)),
+    ]
+
+    def test_get_start_live_end_live(self, mpan):
+        mpan.get_start_live_end_live(
+            self.create_contracts(self.test_contract_ranges))
+        assert mpan.start_live_date == datetime.date(2017, 1, 1)
+        assert mpan.end_live_date == datetime.date(2017, 3, 31)
+
+    @pytest.mark.parametrize("date_ranges", [
+        test_contract_ranges,
+        list(reversed(test_contract_ranges)),
+    ])
+    def test_get_continuous_start_end_live(self, mpan, date_ranges):
+        contracts = self.create_contracts(date_ranges)
+        mpan.live_ppa_contract = [
+            contract for contract in contracts
+            if contract.details['contract_start_date'] == datetime.date(2017, 9, 1)][0]
+        mpan.get_continuous_start_end_live(contracts)
+        assert mpan.start_live_date == datetime.date(2017, 5, 1)
+        assert mpan.end_live_date == datetime.date(2017, 12, 31)
+
+
+@pytest.mark.parametrize("include, fields, result_expected", [
+    (None, None, {'contracts', 'product_quotes', 'site', 'billing', 'assets',
+                  'registrations'}),
+    (None, ['site_name', 'meter_type'], {'contracts', 'site'}),
+    (['billing'], None, {'contracts', 'site', 'billing'}),
+    (['registrations'], ['live_ppa_contract'], {'contracts', 'registrations'}),
+    ([], None, set()),
+])
+def test_get_hydration_parts(include, fields, result_expected):
+    assert get_hydration_parts(include, fields) == result_expected
+
+
+@pytest.mark.parametrize("include, fields", [
+    (['sites'], None),
+    (None, ['site']),
+])
+def test_get_hydration_parts_unknown(include, fields):
+    with pytest.raises(ValueError):
+        get_hydration_parts(include, fields)
+
+
+class TestMPANSetAllInfo:
+
+    test_urls = {
+        'ppa/quotes': 'http://corona.limejump.dev:8202/api/ppa/quotes/',
+        'ppa/product-quotes': 'http://corona.limejump.dev:8202/api/ppa/product-quotes/',
+        'sites': 'http://corona.limejump.dev:8202/api/sites/',
+        'billing-info': 'http://corona.limejump.dev:8202/api/billing-info/',
+        'assets': 'http://corona.limejump.dev:8202/api/assets/',
+        'ppa/registrations': 'http://corona.limejump.dev:8202/api/ppa/registrations/',
+    }
+
+    test_quotes = [
+        {'mpan': {'long_value': '008450062012345678910', 'mpan_type': 'E'},
+         'quote_id': 100, 'site': {'id': 1, 'company': 12, 'name': 'site_1',
+                                   'assets': [{'asset_id': 7}]},
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31'},
+    ]
+
+    @pytest.fixture
+    def corona_client(self):
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='2.0', headers={})
+        corona_client._get_url.side_effect = self.test_urls.get
+        return corona_client
+
+    def get_json(self, url, params=None):
+        if url == self.test_urls['ppa/quotes']:
+            return self.test_quotes
+        if url == self.test_urls['ppa/product-quotes']:
+            return [{'value': 50.0, 'price_type': 'power',
+                     'pass_through_percent': 95.5, 'product_quote_type': 'Fixed'}]
+        if url.startswith(self.test_urls['billing-info']):
+            return [{'company': 12, 'billing_name': 'test'}]
+        if url == self.test_urls['assets']:
+            return [{'asset_id': params['asset_id']}]
+        if url.startswith(self.test_urls['ppa/registrations']):
+            return [{'new_install': False}]
+
+    @pytest.mark.parametrize("include, fields, endpoints_expected", [
+        (None, None, ['ppa/quotes', 'ppa/product-quotes', 'billing-info',
+                      'assets', 'ppa/registrations']),
+        (None, ['site_name', 'meter_type'], ['ppa/quotes']),
+        (['registrations'], None, ['ppa/registrations']),
+        (['assets', 'product_quotes'], None,
+         ['ppa/quotes', 'ppa/product-quotes', 'assets']),
+    ])
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_set_all_info(self, mock_get, corona_client, include, fields,
+                          endpoints_expected):
+        mock_get.side_effect = self.get_json
+        mpan = MPAN(corona_client, '008450062012345678910')
+        mpan.set_all_info(include=include, fields=fields)
+        endpoints = [
+            [endpoint for endpoint, url in self.test_urls.items()
+             if call[0][0].startswith(url)][0]
+            for call in mock_get.call_args_list]
+        assert endpoints == endpoints_expected
+        parts = get_hydration_parts(include, fields)
+        if 'site' in parts:
+            assert mpan.site_name == 'site_1'
+            assert mpan.meter_type == 'export'
+        else:
+            assert mpan.site_name is None
+        if 'contracts' in parts:
+            assert mpan.start_live_date == datetime.date(2017, 1, 1)
+            assert mpan.live_ppa_contract.values == (
+                {'power': 50.0} if 'product_quotes' in parts else {})
+        assert (mpan.billing_details is not None) == ('billing' in parts)
+        assert (mpan.registration_details is not None) == (
+            'registrations' in parts)
+
+    @pytest.mark.parametrize("kwargs, call_count_expected", [
+        ({}, 2),
+        ({'bulk': False}, 4),
+    ])
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_set_ppa_contracts_bulk(self, mock_get, corona_client, kwargs,
+                                    call_count_expected):
+        quotes = [dict(self.test_quotes[0], quote_id=quote_id,
+                       contract_start_date='{}-01-01'.format(year),
+                       contract_end_date='{}-12-31'.format(year))
+                  for quote_id, year in [(100, 2017), (101, 2018), (102, 2019)]]
+
+        def get_json(url, params=None):
+            if url == self.test_urls['ppa/quotes']:
+                return quotes
+            product_quote = {'value': 50.0, 'price_type': 'power',
+                             'pass_through_percent': 95.5,
+                             'product_quote_type': 'Fixed'}
+            if 'quote_id__in' in params:
+                return [dict(product_quote, quote_id=quote_id)
+                        for quote_id in (100, 101, 102)]
+            return [dict(product_quote, quote_id=params['quote_id'])]
+        mock_get.side_effect = get_json
+        mpan = MPAN(corona_client, '008450062012345678910')
+        mpan.set_ppa_contracts(**kwargs)
+        assert mock_get.call_count == call_count_expected
+        assert [contract.values for contract in mpan.ppa_contracts] == [
+            {'power': 50.0}] * 3
+
+
+class TestLazyMPAN:
+
+    test_urls = TestMPANSetAllInfo.test_urls
+
+    @pytest.fixture
+    def corona_client(self):
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='2.0', headers={})
+        corona_client._get_url.side_effect = self.test_urls.get
+        return corona_client
+
+    def get_endpoints(self, mock_get):
+        return [[endpoint for endpoint, url in self.test_urls.items()
+                 if call[0][0].startswith(url)][0]
+                for call in mock_get.call_args_list]
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_lazy_attributes(self, mock_get, corona_client):
+        mock_get.side_effect = TestMPANSetAllInfo().get_json
+        mpan = LazyMPAN(corona_client, '008450062012345678910',
+                        product_quotes=False)
+        mock_get.assert_not_called()
+        assert mpan.site_postcode is None
+        assert mpan.site_name == 'site_1'
+        assert self.get_endpoints(mock_get) == ['ppa/quotes']
+        assert mpan.billing_details == {'company': 12, 'billing_name': 'test'}
+        assert mpan.billing_details == {'company': 12, 'billing_name': 'test'}
+        assert mpan.meter_type == 'export'
+        assert mpan.live_ppa_contract.values == {}
+        assert self.get_endpoints(mock_get) == ['ppa/quotes', 'billing-info']
+        assert mpan.loaded_parts == {'contracts', 'site', 'billing'}
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_prefetch(self, mock_get, corona_client):
+        mock_get.side_effect = TestMPANSetAllInfo().get_json
+        mpan = LazyMPAN(corona_client, '008450062012345678910')
+        assert mpan.prefetch(include=['registrations', 'assets']) is mpan
+        assert self.get_endpoints(mock_get) == [
+            'ppa/quotes', 'ppa/product-quotes', 'assets', 'ppa/registrations']
+        assert mpan.assets == [{'asset_id': 7}]
+        assert mpan.registration_details == {'new_install': False}
+        mpan.prefetch()
+        assert mock_get.call_count == 5
+        mpan.set_all_info()
+        assert mock_get.call_count == 5
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_lazy_error(self, mock_get, corona_client):
+        mock_get.side_effect = [ValueError('Corona returned a malformed response'),
+                                TestMPANSetAllInfo.test_quotes]
+        mpan = LazyMPAN(corona_client, '008450062012345678910',
+                        product_quotes=False)
+        with pytest.raises(ValueError):
+            mpan.live_ppa_contract
+        assert not mpan.loaded_parts
+        assert mpan.live_ppa_contract.details['quote_id'] == 100
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_populate(self, mock_get, corona_client):
+        mpan = LazyMPAN(corona_client, '008450062012345678910')
+        mpan.populate([], site_resp={'name': 'site_1'})
+        assert mpan.site_name == 'site_1'
+        assert mpan.billing_details is None
+        mock_get.assert_not_called()
+
+
+class TestMPANBatch:
+
+    test_urls = {
+        'ppa/quotes': 'http://corona.limejump.dev:8202/api/ppa/quotes/',
+        'ppa/product-quotes': 'http://corona.limejump.dev:8202/api/ppa/product-quotes/',
+        'sites': 'http://corona.limejump.dev:8202/api/sites/',
+        'billing-info': 'http://corona.limejump.dev:8202/api/billing-info/',
+        'assets': 'http://corona.limejump.dev:8202/api/assets/',
+        'ppa/registrations': 'http://corona.limejump.dev:8202/api/ppa/registrations/',
+    }
+
+    test_quotes = [
+        {'mpan': '008450062012345678910', 'quote_id': 100, 'site': 1,
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31',
+         'mpan_type': 'E'},
+        {'mpan': '008450062012345678910', 'quote_id': 101, 'site': 1,
+         'contract_start_date': '2018-01-01', 'contract_end_date': '2018-12-31'},
+        {'mpan': '008450062012345678911', 'quote_id': 102, 'site': 2,
+         'contract_start_date': '2017-06-01', 'contract_end_date': '2018-05-31'},
+    ]
+
+    test_product_quotes = [
+        {'quote_id': 100, 'value': 40.0, 'price_type': 'power',
+         'pass_through_percent': 100, 'product_quote_type': 'Fixed'},
+        {'quote_id': 101, 'value': 50.0, 'price_type': 'power',
+         'pass_through_percent': 95.5, 'product_quote_type': 'Flexible'},
+    ]
+
+    test_sites = [
+        {'id': 1, 'company': 12, 'name': 'site_1', 'assets': [{'asset_id': 7}],
+         'addresses': [{'postcode': 'AB1 2CD'}]},
+        {'id': 2, 'company': 12, 'name': 'site_2', 'assets': []},
+    ]
+
+    test_billing = [{'company': 12, 'billing_name': 'test'}]
+
+    test_assets = [{'asset_id': 7, 'technology': 'Solar'}]
+
+    test_registrations = [
+        {'mpan': '008450062012345678911', 'new_install': True},
+    ]
+
+    @pytest.fixture
+    def corona_client(self):
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='1.0', headers={})
+        corona_client._get_url.side_effect = self.test_urls.get
+        return corona_client
+
+    def get_json(self, url, params=None):
+        responses = {
+            self.test_urls['ppa/quotes']: self.test_quotes,
+            self.test_urls['ppa/product-quotes']: self.test_product_quotes,
+            self.test_urls['sites']: self.test_sites,
+            self.test_urls['billing-info']: self.test_billing,
+            self.test_urls['assets']: self.test_assets,
+            self.test_urls['ppa/registrations']: self.test_registrations,
+        }
+        return responses[url]
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_set_all_info(self, mock_get, corona_client):
+        mock_get.side_effect = self.get_json
+        batch = MPANBatch(
+            corona_client, ['008450062012345678910', '008450062012345678911'],
+            datetime.date(2017, 1, 1), datetime.date(2018, 12, 31))
+        mpans = batch.set_all_info()
+
+        assert mock_get.call_count == 6
+        mock_get.assert_any_call(self.test_urls['ppa/quotes'], params={
+            'mpan__in': '008450062012345678910,008450062012345678911',
+            'contract_start_date_lte': datetime.date(2018, 12, 31),
+            'contract_end_date_gte': datetime.date(2017, 1, 1),
+            'contracted_ppa': 'true',
+            'remove_cancelled_contracts': 'true',
+        })
+        mock_get.assert_any_call(self.test_urls['ppa/product-quotes'],
+                                 params={'quote_id__in': '100,101,102'})
+
+        mpan = mpans['008450062012345678910']
+        assert mpan.live_ppa_contract.details['quote_id'] == 101
+        assert mpan.live_ppa_contract.values == {'power': 50.0}
+        assert mpan.ppa_contracts[0].pass_throughs == {'power': 1.0}
+        assert mpan.site_name == 'site_1'
+        assert mpan.company_id == 12
+        assert mpan.site_postcode == 'AB1 2CD'
+        assert mpan.billing_details == {'company': 12, 'billing_name': 'test'}
+        assert mpan.assets == [{'asset_id': 7, 'technology': 'Solar'}]
+        assert mpan.registration_details is None
+        assert mpan.start_live_date == datetime.date(2017, 1, 1)
+        assert mpan.end_live_date == datetime.date(2018, 12, 31)
+
+        mpan = mpans['008450062012345678911']
+        assert mpan.live_ppa_contract.details['quote_id'] == 102
+        assert not mpan.live_ppa_contract.values
+        assert mpan.site_name == 'site_2'
+        assert mpan.assets == []
+        assert mpan.registration_details == {
+            'mpan': '008450062012345678911', 'new_install': True}
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_set_all_info_chunks(self, mock_get, corona_client):
+        mock_get.return_value = []
+        full_mpans = ['0084500620123456789{}'.format(i) for i in range(10, 15)]
+        batch = MPANBatch(corona_client, full_mpans, chunk_size=2)
+        mpans = batch.set_all_info()
+        # quotes and registrations in three chunks each, nothing else to get
+        assert mock_get.call_count == 6
+        assert set(mpans) == set(full_mpans)
+        assert all(not mpan.ppa_contracts for mpan in mpans.values())
+
 
 if __name__ == "__main__":
     pytest.main(__file__)
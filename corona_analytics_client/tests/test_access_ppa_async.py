@@ -0,0 +1,242 @@
+import asyncio
+import datetime
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client.access_ppa_async import AsyncMPAN, AsyncAllPPAMPANs
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncMPAN:
+
+    test_urls = {
+        'ppa/quotes': 'http://corona.limejump.dev:8202/api/ppa/quotes/',
+        'ppa/product-quotes': 'http://corona.limejump.dev:8202/api/ppa/product-quotes/',
+        'sites': 'http://corona.limejump.dev:8202/api/sites/',
+        'billing-info': 'http://corona.limejump.dev:8202/api/billing-info/',
+        'assets': 'http://corona.limejump.dev:8202/api/assets/',
+        'ppa/registrations': 'http://corona.limejump.dev:8202/api/ppa/registrations/',
+    }
+
+    test_quotes = [
+        {'mpan': '008450062012345678910', 'quote_id': 100, 'site': 1,
+         'technology': 'Solar', 'capacity_kw': 500,
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31'},
+        {'mpan': '008450062012345678910', 'quote_id': 101, 'site': 1,
+         'technology': 'Solar', 'capacity_kw': 500,
+         'contract_start_date': '2018-01-01', 'contract_end_date': '2018-12-31'},
+    ]
+
+    test_product_quotes = [
+        {'value': 50.0, 'price_type': 'power',
+         'pass_through_percent': 95.5, 'product_quote_type': 'Flexible'},
+    ]
+
+    test_site = {'id': 1, 'company': 12, 'name': 'site_1',
+                 'assets': [{'asset_id': 7}, {'asset_id': 8}]}
+
+    @pytest.fixture
+    def corona_client(self):
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='1.0', headers={})
+        corona_client._get_url.side_effect = self.test_urls.get
+        return corona_client
+
+    async def get_json(self, url, params=None):
+        if url == self.test_urls['ppa/quotes']:
+            return self.test_quotes
+        if url == self.test_urls['ppa/product-quotes']:
+            return self.test_product_quotes
+        if url == self.test_urls['sites'] + '1':
+            return self.test_site
+        if url.startswith(self.test_urls['billing-info']):
+            return [{'company': 12, 'billing_name': 'test'}]
+        if url == self.test_urls['assets']:
+            return [{'asset_id': params['asset_id']}]
+        if url.startswith(self.test_urls['ppa/registrations']):
+            return [{'new_install': False}]
+
+    @mock.patch('corona_analytics_client.session.AsyncCoronaSession.get_json')
+    def test_set_all_info(self, mock_get, corona_client):
+        mock_get.side_effect = self.get_json
+        mpan = AsyncMPAN(corona_client, '008450062012345678910',
+                         datetime.date(2018, 1, 1), datetime.date(2018, 1, 31))
+        run(mpan.set_all_info())
+        assert mock_get.call_count == 8
+        mock_get.assert_any_call(self.test_urls['ppa/product-quotes'],
+                                 params={'quote_id': 100})
+        mock_get.assert_any_call(
+            self.test_urls['billing-info'] + '?company=12')
+        assert mpan.live_ppa_contract.details['quote_id'] == 101
+        assert mpan.live_ppa_contract.values == {'power': 50.0}
+        assert mpan.site_name == 'site_1'
+        assert mpan.company_id == 12
+        assert mpan.billing_details == {'company': 12, 'billing_name': 'test'}
+        assert mpan.assets == [{'asset_id': 7}, {'asset_id': 8}]
+        assert mpan.registration_details == {'new_install': False}
+        assert mpan.start_live_date == datetime.date(2017, 1, 1)
+        assert mpan.end_live_date == datetime.date(2018, 12, 31)
+
+    @mock.patch('corona_analytics_client.session.AsyncCoronaSession.get_json')
+    def test_set_all_info_include(self, mock_get, corona_client):
+        mock_get.side_effect = self.get_json
+        mpan = AsyncMPAN(corona_client, '008450062012345678910',
+                         datetime.date(2018, 1, 1), datetime.date(2018, 1, 31))
+        run(mpan.set_all_info(include=('contracts', 'site')))
+        assert mock_get.call_count == 2
+        assert mpan.live_ppa_contract.values == {}
+        assert mpan.site_name == 'site_1'
+        assert mpan.billing_details is None
+        assert mpan.registration_details is None
+
+
+class TestAsyncAllPPAMPANs:
+
+    test_url_quotes = 'http://corona.limejump.dev:8202/api/ppa/quotes/'
+
+    @pytest.fixture
+    def corona_client(self):
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='1.0', headers={})
+        corona_client._get_url.return_value = self.test_url_quotes
+        return corona_client
+
+    @mock.patch('corona_analytics_client.session.AsyncCoronaSession.get_json')
+    def test_get_all_ppa_mpans(self, mock_get, corona_client):
+        async def get_json(url, params=None, fields=None):
+            # Corona ignoring the quote_type filter
+            return [{'mpan': '008450062012345678910', 'quote_type': 'Fixed'},
+                    {'mpan': '008450062012345678911', 'quote_type': 'Flexible'}]
+        mock_get.side_effect = get_json
+        all_ppas = AsyncAllPPAMPANs(corona_client, datetime.date(2015, 1, 1),
+                                    datetime.date(2015, 1, 31))
+        result = run(all_ppas.get_all_ppa_mpans(quote_type='Fixed'))
+        mock_get.assert_called_once_with(self.test_url_quotes, params={
+            'contract_start_date_lte': datetime.date(2015, 1, 31),
+            'contract_end_date_gte': datetime.date(2015, 1, 1),
+            'contracted_ppa': 'true',
+            'remove_cancelled_contracts': 'true',
+            'quote_type': 'Fixed',
+        }, fields=('mpan', 'quote_type'))
+        assert result == {'008450062012345678910'}
+
+    @mock.patch('corona_analytics_client.session.AsyncCoronaSession.get_json')
+    def test_quote_methods(self, mock_get, corona_client):
+        quotes = [
+            {'mpan': '008450062012345678910', 'quote_id': 100,
+             'technology': 'Solar', 'meter_type': 'export', 'capacity_kw': 500,
+             'contract_start_date': '2015-01-01',
+             'contract_end_date': '2015-12-31'},
+        ]
+
+        async def get_json(url, params=None, fields=None):
+            if fields:
+                return [{field: quote[field] for field in fields}
+                        for quote in quotes]
+            return quotes
+        mock_get.side_effect = get_json
+        all_ppas = AsyncAllPPAMPANs(corona_client, datetime.date(2015, 1, 1),
+                                    datetime.date(2015, 1, 31))
+        created_time = datetime.datetime(2015, 1, 1)
+        assert run(all_ppas.get_all_ppa_mpans_created_after(created_time)) == {
+            '008450062012345678910'}
+        assert mock_get.call_args[1]['params']['created_time_gte'] == \
+            created_time
+        assert run(all_ppas.get_all_ppa_quote_ids_created_after(
+            created_time, page_size=10)) == {100}
+        assert run(all_ppas.get_all_ppa_mpans_with_no_params()) == {
+            '008450062012345678910'}
+        assert len(run(all_ppas.get_quote_table())) == 1
+        dates, timeline = run(all_ppas.get_daily_timeline())
+        assert len(dates) == 31
+        assert timeline[('Solar', 'export')]['mpans'].tolist() == [1] * 31
+
+    @mock.patch('corona_analytics_client.access_ppa_async.AsyncMPAN.set_all_info')
+    @mock.patch('corona_analytics_client.access_ppa_async.AsyncAllPPAMPANs.get_all_ppa_mpans')
+    def test_get_all_full_mpans_by_meter_type(
+            self, mock_mpans, mock_info, corona_client):
+        in_flight = []
+
+        async def get_all_ppa_mpans(meter_type=None):
+            return {'008450062012345678910', '008450062012345678911',
+                    '008450062012345678912'}
+
+        async def set_all_info(include=None):
+            in_flight.append(1)
+            assert len(in_flight) <= 2
+            await asyncio.sleep(0)
+            in_flight.pop()
+
+        mock_mpans.side_effect = get_all_ppa_mpans
+        mock_info.side_effect = set_all_info
+        all_ppas = AsyncAllPPAMPANs(corona_client, datetime.date(2015, 1, 1),
+                                    datetime.date(2015, 1, 31), concurrency=2)
+        with mock.patch.object(AsyncAllPPAMPANs, '_get_full_mpan_info',
+                               return_value={}):
+            result = run(all_ppas.get_all_full_mpans_by_meter_type())
+        assert mock_info.call_count == 3
+        mock_info.assert_called_with(include=('contracts', 'site'))
+        assert list(result) == ['008450062012345678910', '008450062012345678911',
+                                '008450062012345678912']
+
+    @mock.patch('corona_analytics_client.access_ppa_async.AsyncMPAN.set_all_info')
+    @mock.patch('corona_analytics_client.access_ppa_async.AsyncAllPPAMPANs.get_all_ppa_mpans')
+    def test_get_all_full_mpans_by_meter_type_errors(
+            self, mock_mpans, mock_info, corona_client):
+        error = ValueError('Corona returned a malformed response')
+        calls = []
+
+        async def get_all_ppa_mpans(meter_type=None):
+            return {'008450062012345678910', '008450062012345678911'}
+
+        async def set_all_info(include=None):
+            calls.append(1)
+            if len(calls) == 2:
+                raise error
+
+        mock_mpans.side_effect = get_all_ppa_mpans
+        mock_info.side_effect = set_all_info
+        all_ppas = AsyncAllPPAMPANs(corona_client, datetime.date(2015, 1, 1),
+                                    datetime.date(2015, 1, 31), concurrency=1)
+        with mock.patch.object(AsyncAllPPAMPANs, '_get_full_mpan_info',
+                               return_value={}):
+            result = run(all_ppas.get_all_full_mpans_by_meter_type())
+            assert list(result) == ['008450062012345678910']
+            assert all_ppas.errors == {'008450062012345678911': error}
+            result = run(all_ppas.retry_failed_mpans())
+        assert list(result) == ['008450062012345678911']
+        assert all_ppas.errors == {}
+
+    @mock.patch('corona_analytics_client.access_ppa_async.AsyncMPAN.set_all_info')
+    @mock.patch('corona_analytics_client.access_ppa_async.AsyncAllPPAMPANs.get_all_ppa_mpans')
+    def test_get_all_full_mpans_by_meter_type_info_error(
+            self, mock_mpans, mock_info, corona_client):
+        async def get_all_ppa_mpans(meter_type=None):
+            return {'008450062012345678910', '008450062012345678911'}
+
+        async def set_all_info(include=None):
+            pass
+
+        mock_mpans.side_effect = get_all_ppa_mpans
+        mock_info.side_effect = set_all_info
+        all_ppas = AsyncAllPPAMPANs(corona_client, datetime.date(2015, 1, 1),
+                                    datetime.date(2015, 1, 31))
+        # An MPAN with no contracts fails building its info, not the run
+        error = IndexError('list index out of range')
+        with mock.patch.object(AsyncAllPPAMPANs, '_get_full_mpan_info',
+                               side_effect=[{}, error]):
+            result = run(all_ppas.get_all_full_mpans_by_meter_type())
+        assert list(result) == ['008450062012345678910']
+        assert all_ppas.errors == {'008450062012345678911': error}
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,118 @@
+import asyncio
+import datetime
+import gzip
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client.access_ppa import AllPPAMPANs
+from corona_analytics_client.archive import (
+    RECORD, REPLAY, ArchiveMissError, ResponseArchive, archive_key)
+from corona_analytics_client.benchmarks.stub_server import StubCorona
+from corona_analytics_client.session import (
+    AsyncCoronaSession, CoronaSession, configure_session, get_session)
+
+
+@pytest.mark.parametrize("url, params, result_expected", [
+    ('http://corona.limejump.dev:8202/api/sites/12', None,
+     ('/api/sites/12', ())),
+    ('http://localhost:8000/api/billing-info/?company=1', {'b': True},
+     ('/api/billing-info', (('b', 'True'), ('company', '1')))),
+])
+def test_archive_key(url, params, result_expected):
+    assert archive_key(url, params) == result_expected
+
+
+class TestResponseArchive:
+
+    test_url = 'http://corona.limejump.dev:8202/api/sites/12'
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_record_replay(self, mock_get, tmpdir):
+        path = str(tmpdir.join('corona.jsonl.gz'))
+        mock_get.return_value = mock.Mock(
+            status_code=200, content=b'{"name": "site_1"}',
+            headers={'ETag': '"abc"', 'Server': 'test'})
+        session = CoronaSession(archive=ResponseArchive(path, RECORD))
+        assert session.get_json(self.test_url, params={'a': 1}) == {
+            'name': 'site_1'}
+        session.close()
+        assert session.archive.recorded == 1
+
+        archive = ResponseArchive(path, REPLAY)
+        session = CoronaSession(archive=archive)
+        resp = session.get('http://localhost:8000/api/sites/12/',
+                           params={'a': '1'})
+        assert resp.status_code == 200
+        assert resp.headers == {'ETag': '"abc"'}
+        assert resp.json() == {'name': 'site_1'}
+        assert archive.replayed == 1
+        assert mock_get.call_count == 1
+        with pytest.raises(ArchiveMissError):
+            session.get(self.test_url)
+
+    def test_replay_async(self, tmpdir):
+        path = str(tmpdir.join('corona.jsonl.gz'))
+        with ResponseArchive(path, RECORD) as archive:
+            archive.record(self.test_url, None, 200, b'{"name": "site_1"}')
+        session = AsyncCoronaSession(archive=ResponseArchive(path, REPLAY))
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(session.get_json(self.test_url))
+        finally:
+            loop.close()
+        assert result == {'name': 'site_1'}
+        assert session.session is None
+
+    def test_not_closed(self, tmpdir):
+        path = str(tmpdir.join('corona.jsonl.gz'))
+        archive = ResponseArchive(path, RECORD, flush_every=2)
+        for index in range(3):
+            archive.record('{}?page={}'.format(self.test_url, index), None,
+                           200, b'[]')
+        result = ResponseArchive(path, REPLAY).responses
+        assert sorted(result) == [('/api/sites/12', (('page', '0'),)),
+                                  ('/api/sites/12', (('page', '1'),))]
+        archive.close()
+        assert len(ResponseArchive(path, REPLAY).responses) == 3
+
+    def test_record_304(self, tmpdir):
+        path = str(tmpdir.join('corona.jsonl.gz'))
+        with ResponseArchive(path, RECORD) as archive:
+            archive.record(self.test_url, None, 304, b'')
+        with gzip.open(path, 'rt') as fp:
+            assert fp.read() == ''
+
+    def test_unknown_mode(self, tmpdir):
+        with pytest.raises(ValueError):
+            ResponseArchive(str(tmpdir.join('corona.jsonl.gz')), 'rewind')
+
+    def test_portfolio(self, tmpdir):
+        path = str(tmpdir.join('corona.jsonl.gz'))
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='2.0', headers={})
+        start_date, end_date = datetime.date(2016, 1, 1), datetime.date(2017, 12, 31)
+
+        with StubCorona(mpans=20, version='2.0') as corona:
+            corona_client._get_url.side_effect = lambda endpoint: (
+                corona.url + endpoint + '/')
+            configure_session(corona_client,
+                              archive=ResponseArchive(path, RECORD))
+            result_expected = AllPPAMPANs(
+                corona_client, start_date, end_date
+            ).get_all_full_mpans_by_meter_type(max_workers=4)
+            request_count = corona.request_count
+        get_session(corona_client).close()
+        configure_session(corona_client, archive=ResponseArchive(path, REPLAY))
+
+        result = AllPPAMPANs(
+            corona_client, start_date, end_date
+        ).get_all_full_mpans_by_meter_type(max_workers=4)
+        assert result == result_expected
+        assert len(result) == 20
+        archive = corona_client._corona_session.archive
+        assert archive.replayed == request_count
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,58 @@
+import requests
+import pytest
+
+from corona_analytics_client.benchmarks.stub_server import StubCorona, StubCoronaData
+
+
+class TestStubCoronaData:
+
+    @pytest.fixture
+    def data(self):
+        return StubCoronaData(mpans=20, contracts_per_mpan=2, sites_per_company=10)
+
+    def test_data(self, data):
+        assert len(data.quotes) == 40
+        assert len(data.product_quotes) == 120
+        assert len(data.sites) == 20
+        assert sorted(data.companies) == [1, 2]
+
+    @pytest.mark.parametrize("endpoint, object_id, params, result_expected", [
+        ('ppa/quotes', None, {'mpan': '008450062000000000001'}, [3, 4]),
+        ('ppa/quotes', None, {'mpan__in': '008450062000000000001,008450062000000000002',
+                              'quote_type': 'Flexible',
+                              'contract_start_date_lte': '2017-01-31'}, [4, 6]),
+        ('ppa/product-quotes', None, {'quote_id': '3'}, [3, 3, 3]),
+    ])
+    def test_get(self, data, endpoint, object_id, params, result_expected):
+        result = data.get(endpoint, object_id, params)
+        assert [item['quote_id'] for item in result] == result_expected
+
+    def test_get_objects(self, data):
+        assert data.get('sites', 2, {})['company'] == 1
+        assert data.get('companies', None, {'name': 'Company 2'}) == [
+            {'id': 2, 'name': 'Company 2'}]
+        assert data.get('sites', 100, {}) is None
+        assert data.get('unknown', None, {}) is None
+
+    def test_get_version_2(self):
+        data = StubCoronaData(mpans=1, contracts_per_mpan=1, version='2.0')
+        quote = data.get('ppa/quotes', None, {'mpan': '008450062000000000000'})[0]
+        assert quote['mpan'] == {'long_value': '008450062000000000000',
+                                 'mpan_type': 'E'}
+        assert quote['site']['address'] == {'postcode': 'AB0 1CD'}
+
+
+class TestStubCorona:
+
+    def test_server(self):
+        with StubCorona(mpans=5) as corona:
+            index = requests.get(corona.url).json()
+            assert index['sites'] == corona.url + 'sites/'
+            resp = requests.get(index['billing-info'], params={'company': 1})
+            assert resp.json()[0]['company'] == 1
+            assert requests.get(index['sites'] + '99').status_code == 404
+            assert corona.request_count == 3
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
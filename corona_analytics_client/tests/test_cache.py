@@ -0,0 +1,143 @@
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client.cache import (
+    DiskCache, ResponseCache, get_endpoint, request_key)
+
+
+@pytest.mark.parametrize("url, endpoint_expected", [
+    ('http://corona.limejump.dev:8202/api/ppa/quotes/', 'ppa/quotes'),
+    ('http://corona.limejump.dev:8202/api/sites/12', 'sites'),
+    ('http://corona.limejump.dev:8202/api/billing-info/?company=12', 'billing-info'),
+    ('http://corona.limejump.dev:8202/api/companies/4/', 'companies'),
+])
+def test_get_endpoint(url, endpoint_expected):
+    assert get_endpoint(url) == endpoint_expected
+
+
+@pytest.mark.parametrize("url_1, params_1, url_2, params_2", [
+    ('http://corona/api/billing-info/?company=12', None,
+     'http://corona/api/billing-info/', {'company': 12}),
+    ('http://corona/api/ppa/quotes/', {'mpan': '1', 'contracted_ppa': 'true'},
+     'http://corona/api/ppa/quotes', {'contracted_ppa': 'true', 'mpan': '1'}),
+])
+def test_request_key(url_1, params_1, url_2, params_2):
+    assert request_key(url_1, params_1) == request_key(url_2, params_2)
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def cache(self):
+        return ResponseCache(ttls={'sites': 10, 'ppa/quotes': 0}, max_bytes=100)
+
+    def test_get_set(self, cache):
+        assert cache.get('key', 'sites') == (False, None)
+        cache.set('key', {'name': 'test_name'}, 'sites', 10)
+        assert cache.get('key', 'sites') == (True, {'name': 'test_name'})
+        assert cache.stats() == {
+            'hits': 1, 'misses': 1, 'entries': 1, 'size_bytes': 10,
+            'endpoints': {'sites': {'hits': 1, 'misses': 1}}}
+
+    def test_get_set_copied(self, cache):
+        value = [{'id': 1, 'assets': [{'asset_id': 7}]}]
+        cache.set('key', value, 'sites', 10)
+        value[0]['assets'].append({'asset_id': 8})
+        hit, cached = cache.get('key', 'sites')
+        assert cached == [{'id': 1, 'assets': [{'asset_id': 7}]}]
+        cached[0]['name'] = 'site_1'
+        cached[0]['assets'].clear()
+        assert cache.get('key', 'sites') == (
+            True, [{'id': 1, 'assets': [{'asset_id': 7}]}])
+
+    def test_ttl_zero_not_cached(self, cache):
+        cache.set('key', [], 'ppa/quotes', 10)
+        assert cache.get('key', 'ppa/quotes') == (False, None)
+
+    @mock.patch('corona_analytics_client.cache.time.monotonic')
+    def test_expiry(self, mock_time, cache):
+        mock_time.return_value = 1000
+        cache.set('key', [], 'sites', 10)
+        mock_time.return_value = 1011
+        assert cache.get('key', 'sites') == (False, None)
+        assert cache.size_bytes == 0
+
+    def test_lru_eviction(self, cache):
+        cache.set('key_1', 1, 'sites', 40)
+        cache.set('key_2', 2, 'sites', 40)
+        cache.get('key_1', 'sites')
+        cache.set('key_3', 3, 'sites', 40)
+        assert cache.get('key_2', 'sites') == (False, None)
+        assert cache.get('key_1', 'sites') == (True, 1)
+        assert cache.get('key_3', 'sites') == (True, 3)
+        assert cache.size_bytes == 80
+
+    def test_too_big_not_cached(self, cache):
+        cache.set('key', 1, 'sites', 101)
+        assert cache.get('key', 'sites') == (False, None)
+
+    @pytest.mark.parametrize("endpoint, key, keys_expected", [
+        (None, None, set()),
+        ('sites', None, {'key_2'}),
+        (None, 'key_2', {'key_1'}),
+    ])
+    def test_invalidate(self, cache, endpoint, key, keys_expected):
+        cache.set('key_1', 1, 'sites', 10)
+        cache.set('key_2', 2, 'assets', 10)
+        cache.invalidate(endpoint=endpoint, key=key)
+        assert {key for key in ('key_1', 'key_2')
+                if cache.get(key)[0]} == keys_expected
+
+
+class TestDiskCache:
+
+    test_key = request_key('http://corona/api/ppa/quotes/', {'mpan': '1'})
+
+    @pytest.fixture
+    def disk_cache(self, tmpdir):
+        return DiskCache(str(tmpdir.join('corona.sqlite')),
+                         ttls={'ppa/quotes': 60}, stale_window=30)
+
+    def test_get_set(self, disk_cache):
+        assert disk_cache.get(self.test_key) is None
+        disk_cache.set(self.test_key, b'[]', 'ppa/quotes', '"abc"', None)
+        entry = disk_cache.get(self.test_key)
+        assert entry['body'] == b'[]'
+        assert entry['endpoint'] == 'ppa/quotes'
+        assert disk_cache.get_conditional_headers(entry) == {
+            'If-None-Match': '"abc"'}
+
+    def test_persists(self, disk_cache):
+        disk_cache.set(self.test_key, b'[]', 'ppa/quotes')
+        disk_cache.close()
+        disk_cache = DiskCache(disk_cache.path)
+        assert disk_cache.get(self.test_key)['body'] == b'[]'
+
+    @pytest.mark.parametrize("age, fresh_expected, servable_expected", [
+        (10, True, True),
+        (70, False, True),
+        (100, False, False),
+    ])
+    @mock.patch('corona_analytics_client.cache.time.time')
+    def test_freshness(self, mock_time, disk_cache, age, fresh_expected,
+                       servable_expected):
+        mock_time.return_value = 1000
+        disk_cache.set(self.test_key, b'[]', 'ppa/quotes')
+        mock_time.return_value = 1000 + age
+        entry = disk_cache.get(self.test_key)
+        assert disk_cache.is_fresh(entry) == fresh_expected
+        assert disk_cache.is_servable(entry) == servable_expected
+        disk_cache.touch(self.test_key)
+        assert disk_cache.is_fresh(disk_cache.get(self.test_key))
+
+    def test_invalidate(self, disk_cache):
+        disk_cache.set(self.test_key, b'[]', 'ppa/quotes')
+        disk_cache.set(('http://corona/api/sites/1', ()), b'{}', 'sites')
+        disk_cache.invalidate(endpoint='ppa/quotes')
+        assert disk_cache.get(self.test_key) is None
+        assert disk_cache.get(('http://corona/api/sites/1', ()))
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
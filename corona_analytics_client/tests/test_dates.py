@@ -0,0 +1,61 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from corona_analytics_client.dates import (
+    parse_date_columns, parse_iso_date, to_datetime64)
+
+
+@pytest.mark.parametrize("value", [
+    '2016-01-01', '2016-12-31', '2016-1-1', '2016-02-29',
+])
+def test_parse_iso_date(value):
+    assert parse_iso_date(value) == datetime.datetime.strptime(
+        value, '%Y-%m-%d').date()
+
+
+@pytest.mark.parametrize("value", [
+    '2017-02-29', '2016-13-01', '01/01/2016', '2016-01-01T10:00',
+])
+def test_parse_iso_date_invalid(value):
+    with pytest.raises(ValueError):
+        parse_iso_date(value)
+
+
+@pytest.mark.parametrize("values, unit, result_expected", [
+    (['2016-01-01', '2016-1-31', None], 'D',
+     ['2016-01-01', '2016-01-31', 'NaT']),
+    (['2017-10-01T10:00:00Z', '2017-10-01T10:00:00+01:00'], 's',
+     ['2017-10-01T10:00:00', '2017-10-01T09:00:00']),
+])
+def test_to_datetime64(values, unit, result_expected):
+    result = to_datetime64(values, unit)
+    assert result.dtype == np.dtype('datetime64[{}]'.format(unit))
+    np.testing.assert_array_equal(
+        result, np.array(result_expected, dtype=result.dtype))
+
+
+def test_to_datetime64_rejects_datetimes_as_dates():
+    with pytest.raises(ValueError):
+        to_datetime64(['2016-01-01', '2016-01-01T10:00'], 'D')
+
+
+def test_parse_date_columns():
+    items = [
+        {'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31'},
+        {'contract_start_date': datetime.date(2018, 1, 1),
+         'contract_end_date': None},
+        {'contract_start_date': '2019-1-1'},
+    ]
+    result = parse_date_columns(items, ('contract_start_date', 'contract_end_date'))
+    assert result == [
+        {'contract_start_date': datetime.date(2017, 1, 1),
+         'contract_end_date': datetime.date(2017, 12, 31)},
+        {},
+        {'contract_start_date': datetime.date(2019, 1, 1)},
+    ]
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,63 @@
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client import decoders
+from corona_analytics_client.decoders import (
+    decode_fields, get_available_decoders, get_decoder)
+
+test_body = (b'[{"mpan": "008450062012345678910", "quote_id": 1001,'
+             b' "quote_type": "Fixed", "site": {"id": 1}},'
+             b' {"mpan": "008450062012345678911", "quote_id": 1009}]')
+
+
+def test_get_available_decoders():
+    available = get_available_decoders()
+    assert available[-1] == 'json'
+    assert available == [name for name in decoders.DECODER_PREFERENCE
+                         if name in available]
+
+
+@pytest.mark.parametrize("decoder", get_available_decoders())
+def test_get_decoder(decoder):
+    result = get_decoder(decoder)(test_body)
+    assert result[0]['site'] == {'id': 1}
+    assert result[1]['quote_id'] == 1009
+
+
+def test_get_decoder_default():
+    assert get_decoder() is decoders.DECODERS[get_available_decoders()[0]]
+
+
+def test_get_decoder_function():
+    decoder = mock.Mock()
+    assert get_decoder(decoder) is decoder
+
+
+def test_get_decoder_unknown():
+    with pytest.raises(ValueError):
+        get_decoder('yaml')
+
+
+@mock.patch('corona_analytics_client.decoders.orjson', None)
+def test_get_decoder_not_installed():
+    assert 'orjson' not in get_available_decoders()
+    with pytest.raises(ImportError):
+        get_decoder('orjson')
+
+
+@pytest.mark.parametrize("decoder", [None] + get_available_decoders())
+@pytest.mark.parametrize("body, fields, result_expected", [
+    (test_body, ('mpan', 'quote_type'),
+     [{'mpan': '008450062012345678910', 'quote_type': 'Fixed'},
+      {'mpan': '008450062012345678911'}]),
+    (test_body, ('site',), [{'site': {'id': 1}}, {}]),
+    (b'[1, {"mpan": "1"}]', ('mpan',), [1, {'mpan': '1'}]),
+    (b'{"mpan": "1", "quote_id": 1}', ('mpan',), {'mpan': '1', 'quote_id': 1}),
+])
+def test_decode_fields(decoder, body, fields, result_expected):
+    assert decode_fields(body, fields, decoder) == result_expected
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from corona_analytics_client.intervals import (
+    get_period_containing, merge_intervals, merge_intervals_by_key)
+
+
+def d(year, month, day):
+    return datetime.date(year, month, day)
+
+
+@pytest.mark.parametrize("intervals, result_expected", [
+    ([], []),
+    ([(d(2017, 9, 1), d(2017, 12, 31)), (d(2017, 1, 1), d(2017, 3, 31)),
+      (d(2017, 5, 1), d(2017, 8, 31))],
+     [(d(2017, 1, 1), d(2017, 3, 31)), (d(2017, 5, 1), d(2017, 12, 31))]),
+    ([(d(2017, 1, 1), d(2017, 12, 31)), (d(2017, 3, 1), d(2017, 3, 31)),
+      (d(2018, 1, 1), d(2018, 6, 30))],
+     [(d(2017, 1, 1), d(2018, 6, 30))]),
+])
+def test_merge_intervals(intervals, result_expected):
+    assert merge_intervals(intervals) == result_expected
+
+
+@pytest.mark.parametrize("date, result_expected", [
+    (d(2017, 6, 1), (d(2017, 5, 1), d(2017, 12, 31))),
+    (d(2017, 4, 1), (None, None)),
+])
+def test_get_period_containing(date, result_expected):
+    intervals = [(d(2017, 9, 1), d(2017, 12, 31)),
+                 (d(2017, 1, 1), d(2017, 3, 31)),
+                 (d(2017, 5, 1), d(2017, 8, 31))]
+    assert get_period_containing(intervals, date) == result_expected
+
+
+def test_merge_intervals_by_key():
+    keys = ['b', 'a', 'a', 'b', 'a', 'c']
+    starts = np.array(['2017-01-01', '2017-09-01', '2017-01-01',
+                       '2017-04-01', '2017-05-01', 'NaT'], dtype='datetime64[D]')
+    ends = np.array(['2017-03-31', '2017-12-31', '2017-03-31',
+                     '2017-06-30', '2017-08-31', '2017-12-31'], dtype='datetime64[D]')
+    result_keys, result_starts, result_ends = merge_intervals_by_key(
+        keys, starts, ends)
+    assert result_keys.tolist() == ['a', 'a', 'b']
+    assert result_starts.tolist() == [d(2017, 1, 1), d(2017, 5, 1), d(2017, 1, 1)]
+    assert result_ends.tolist() == [d(2017, 3, 31), d(2017, 12, 31), d(2017, 6, 30)]
+
+
+def test_merge_intervals_by_key_matches_merge_intervals():
+    random = np.random.RandomState(0)
+    keys = random.randint(0, 20, 500)
+    starts = (np.datetime64('2015-01-01') +
+              random.randint(0, 1000, 500).astype('timedelta64[D]'))
+    ends = starts + random.randint(0, 120, 500).astype('timedelta64[D]')
+    result = list(zip(*[array.tolist() for array in
+                        merge_intervals_by_key(keys, starts, ends)]))
+    result_expected = []
+    for key in sorted(set(keys.tolist())):
+        result_expected.extend(
+            (key, start, end) for start, end in merge_intervals(
+                zip(starts[keys == key].tolist(), ends[keys == key].tolist())))
+    assert result == result_expected
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+from corona_analytics_client.limiter import AdaptiveLimiter, is_overload
+from corona_analytics_client.session import CoronaSession
+
+
+@pytest.mark.parametrize("status, result_expected", [
+    (200, False),
+    (404, False),
+    (429, True),
+    (502, True),
+    (None, True),
+])
+def test_is_overload(status, result_expected):
+    assert is_overload(status) == result_expected
+
+
+class TestAdaptiveLimiter:
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            AdaptiveLimiter(initial_limit=10, max_limit=5)
+
+    def test_increase(self):
+        limiter = AdaptiveLimiter(initial_limit=2, max_limit=3)
+        for _ in range(2):
+            limiter.release('sites', limiter.acquire('sites'), 200)
+        assert limiter.limit == pytest.approx(2.9)
+        for _ in range(3):
+            limiter.release('sites', limiter.acquire('sites'), 200)
+        assert limiter.limit == 3
+
+    def test_decrease(self):
+        limiter = AdaptiveLimiter(initial_limit=8, min_limit=2)
+        started = [limiter.acquire('sites') for _ in range(3)]
+        limiter.release('sites', started[0], 503)
+        # Requests sent before the decrease don't decrease it again
+        limiter.release('sites', started[1], 429)
+        assert limiter.limit == 4
+        limiter.release('sites', limiter.acquire('sites'), None)
+        limiter.release('sites', limiter.acquire('sites'), 500)
+        assert limiter.limit == 2
+        assert limiter.snapshot() == {'limit': 2, 'in_flight': 1,
+                                      'endpoints': {'sites': 1},
+                                      'decreases': 3}
+        limiter.release('sites', started[2], 200)
+
+    @mock.patch('corona_analytics_client.limiter.time.perf_counter')
+    def test_latency_target(self, mock_time):
+        limiter = AdaptiveLimiter(initial_limit=4, latency_target=1.0)
+        mock_time.return_value = 10.0
+        started = limiter.acquire('sites')
+        mock_time.return_value = 11.5
+        limiter.release('sites', started, 200)
+        assert limiter.limit == 2
+
+    def test_limits(self):
+        limiter = AdaptiveLimiter(initial_limit=2,
+                                  endpoint_limits={'ppa/product-quotes': 1})
+        started = limiter.acquire('ppa/product-quotes')
+        acquired = threading.Event()
+
+        def acquire():
+            limiter.acquire('ppa/product-quotes')
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        # The endpoint is at its limit, other endpoints aren't
+        assert not acquired.wait(0.05)
+        limiter.acquire('sites')
+        limiter.release('ppa/product-quotes', started, 200)
+        assert acquired.wait(1)
+        thread.join()
+
+    def test_acquire_async(self):
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        in_flight = []
+
+        async def request():
+            started = await limiter.acquire_async('sites')
+            in_flight.append(1)
+            assert len(in_flight) == 1
+            await asyncio.sleep(0.001)
+            in_flight.pop()
+            limiter.release('sites', started, 200)
+
+        async def request_all():
+            await asyncio.gather(*[request() for _ in range(5)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(request_all())
+        finally:
+            loop.close()
+        assert limiter.in_flight == 0
+
+
+class TestCoronaSessionLimiter:
+
+    test_url = 'http://corona.limejump.dev:8202/api/sites'
+
+    def test_default(self):
+        session = CoronaSession(pool_maxsize=4)
+        assert session.limiter.limit == 4
+        assert session.limiter.max_limit == 4
+        assert CoronaSession(limiter=None).limiter is None
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_release_on_error(self, mock_get):
+        mock_get.side_effect = requests.ConnectionError()
+        session = CoronaSession(limiter=AdaptiveLimiter(initial_limit=4),
+                                retry=None)
+        with pytest.raises(requests.ConnectionError):
+            session.get(self.test_url)
+        assert session.limiter.snapshot()['in_flight'] == 0
+        assert session.limiter.limit == 2
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,70 @@
+import pytest
+
+from corona_analytics_client.metrics import RequestMetrics, get_quantile
+
+
+@pytest.mark.parametrize("values, quantile, result_expected", [
+    ([], 0.5, None),
+    ([1], 0.99, 1),
+    (list(range(101)), 0.5, 50),
+    (list(range(101)), 0.95, 95),
+    (list(range(101)), 0.99, 99),
+])
+def test_get_quantile(values, quantile, result_expected):
+    assert get_quantile(values, quantile) == result_expected
+
+
+class TestRequestMetrics:
+
+    @pytest.fixture
+    def metrics(self):
+        metrics = RequestMetrics(sample_size=100)
+        for index in range(1, 201):
+            metrics.record_request('ppa/product-quotes', index / 1000.0,
+                                   size=10, status=200)
+        metrics.record_request('assets', 0.5, size=100, status=503)
+        metrics.record_decode('assets', 0.25)
+        metrics.record_retry('assets')
+        return metrics
+
+    def test_snapshot(self, metrics):
+        snapshot = metrics.snapshot()
+        product_quotes = snapshot['ppa/product-quotes']
+        assert product_quotes['requests'] == 200
+        assert product_quotes['bytes'] == 2000
+        assert product_quotes['errors'] == 0
+        # Quantiles are over the last sample_size requests only
+        assert product_quotes['latency']['p50'] == 0.151
+        assert product_quotes['latency']['p99'] == 0.199
+        assert product_quotes['latency']['max'] == 0.2
+        assert product_quotes['latency']['mean'] == pytest.approx(0.1005)
+        assert snapshot['assets'] == {
+            'requests': 1, 'errors': 1, 'retries': 1, 'bytes': 100,
+            'decodes': 1,
+            'decode_seconds': 0.25, 'latency_seconds': 0.5,
+            'latency': {'p50': 0.5, 'p95': 0.5, 'p99': 0.5, 'mean': 0.5,
+                        'max': 0.5}}
+
+    def test_reset(self, metrics):
+        metrics.reset()
+        assert metrics.snapshot() == {}
+
+    def test_to_prometheus(self, metrics):
+        lines = metrics.to_prometheus().splitlines()
+        assert '# TYPE corona_requests_total counter' in lines
+        assert 'corona_requests_total{endpoint="assets"} 1' in lines
+        assert 'corona_request_errors_total{endpoint="assets"} 1' in lines
+        assert 'corona_response_bytes_total{endpoint="ppa/product-quotes"} 2000' in lines
+        assert 'corona_json_decode_seconds_total{endpoint="assets"} 0.25' in lines
+        assert 'corona_request_retries_total{endpoint="assets"} 1' in lines
+        assert ('corona_request_duration_seconds{endpoint="assets",quantile="0.95"} 0.5'
+                in lines)
+        assert 'corona_request_duration_seconds_count{endpoint="ppa/product-quotes"} 200' in lines
+
+    def test_to_prometheus_empty(self):
+        assert RequestMetrics().to_prometheus(prefix='test').splitlines()[1] == \
+            '# TYPE test_requests_total counter'
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from corona_analytics_client.quote_table import QuoteTable, get_quote_meter_type
+
+
+@pytest.mark.parametrize("quote, result_expected", [
+    ({'meter_type': 'Export'}, 'export'),
+    ({'meter_type': 'E'}, 'export'),
+    ({'meter_type': 'i'}, 'import'),
+    ({'mpan': {'long_value': '008450062012345678911', 'mpan_type': 'I'}},
+     'import'),
+    ({'mpan': '008450062012345678911'}, ''),
+])
+def test_get_quote_meter_type(quote, result_expected):
+    assert get_quote_meter_type(quote) == result_expected
+
+
+class TestQuoteTable:
+
+    test_quotes = [
+        {'mpan': '008450062012345678910', 'quote_id': 100, 'quote_type': 'Fixed',
+         'technology': 'Solar', 'meter_type': 'export', 'capacity_kw': 500,
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31',
+         'created_time': '2016-12-01T10:00:00Z'},
+        {'mpan': '008450062012345678910', 'quote_id': 101, 'quote_type': 'Flexible',
+         'technology': 'Solar', 'meter_type': 'export', 'capacity_kw': 500,
+         'contract_start_date': '2018-01-01', 'contract_end_date': '2018-12-31',
+         'created_time': '2017-12-01T10:00:00Z'},
+        {'mpan': {'long_value': '008450062012345678911', 'mpan_type': 'E'},
+         'quote_id': 102, 'quote_type': 'Fixed', 'technology': 'Wind',
+         'capacity_kw': 250.5, 'contract_start_date': '2017-11-15',
+         'contract_end_date': '2018-11-14'},
+        {'mpan': '008450062012345678912', 'quote_id': 103, 'quote_type': 'Fixed',
+         'technology': 'Solar', 'meter_type': 'Import', 'capacity_kw': None,
+         'contract_start_date': '2017-06-01', 'contract_end_date': '2017-10-31'},
+    ]
+
+    @pytest.fixture
+    def table(self):
+        return QuoteTable.from_quotes(self.test_quotes)
+
+    def test_from_quotes(self, table):
+        assert len(table) == 4
+        assert table['mpan'].tolist() == [
+            '008450062012345678910', '008450062012345678910',
+            '008450062012345678911', '008450062012345678912']
+        assert table['meter_type'].tolist() == ['export', 'export', 'export', 'import']
+        assert table['quote_id'].dtype == np.int64
+        assert np.isnan(table['capacity_kw'][3])
+        assert table['contract_start_date'][2] == np.datetime64('2017-11-15')
+        assert np.isnat(table['created_time'][2])
+
+    def test_from_quotes_empty(self):
+        table = QuoteTable.from_quotes([])
+        assert len(table) == 0
+        assert table.get_mpans() == set()
+        assert table.group_by('technology') == {}
+
+    def test_where(self, table):
+        result = table.where(meter_type='export', quote_type=['Fixed', 'Other'])
+        assert result['quote_id'].tolist() == [100, 102]
+
+    def test_live_between(self, table):
+        mask = table.live_between(datetime.date(2017, 11, 1),
+                                  datetime.date(2017, 11, 30))
+        assert table.filter(mask)['quote_id'].tolist() == [100, 102]
+
+    @pytest.mark.parametrize("quote_type, result_expected", [
+        (None, {'008450062012345678910', '008450062012345678911',
+                '008450062012345678912'}),
+        ('Flexible', {'008450062012345678910'}),
+    ])
+    def test_get_mpans(self, table, quote_type, result_expected):
+        assert table.get_mpans(quote_type) == result_expected
+
+    def test_get_live_periods(self, table):
+        mpans, start_dates, end_dates = table.get_live_periods()
+        assert mpans.tolist() == ['008450062012345678910', '008450062012345678911',
+                                  '008450062012345678912']
+        assert start_dates.tolist() == [datetime.date(2017, 1, 1),
+                                        datetime.date(2017, 11, 15),
+                                        datetime.date(2017, 6, 1)]
+        assert end_dates.tolist() == [datetime.date(2018, 12, 31),
+                                      datetime.date(2018, 11, 14),
+                                      datetime.date(2017, 10, 31)]
+
+    @pytest.mark.parametrize("keys, value, result_expected", [
+        ('technology', None, {'Solar': 3, 'Wind': 1}),
+        (('technology', 'meter_type'), 'capacity_kw',
+         {('Solar', 'export'): 1000.0, ('Solar', 'import'): 0.0,
+          ('Wind', 'export'): 250.5}),
+    ])
+    def test_group_by(self, table, keys, value, result_expected):
+        assert table.group_by(keys, value) == result_expected
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,111 @@
+import datetime
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client.access_ppa import MPAN, PPAContract
+from corona_analytics_client.records import (
+    ContractRecord, MPANRecord, get_deep_size, measure_memory_saving, to_records)
+
+
+class TestRecords:
+
+    test_quotes = [
+        {'mpan': '008450062012345678910', 'quote_id': 100, 'site': 1,
+         'quote_type': 'Fixed', 'technology': 'Solar', 'capacity_kw': 500,
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31',
+         'spill_period': 10, 'notes': 'first contract'},
+        {'mpan': '008450062012345678910', 'quote_id': 101,
+         'site': {'id': 1, 'name': 'site_1'}, 'quote_type': 'Fixed',
+         'technology': 'Solar', 'capacity_kw': 500,
+         'contract_start_date': '2018-01-01', 'contract_end_date': '2018-12-31',
+         'notes': 'renewal'},
+    ]
+
+    test_product_quotes = [
+        {'price_type': 'power', 'value': 50.0, 'pass_through_percent': 95.5,
+         'product_quote_type': 'Flexible'},
+    ]
+
+    @pytest.fixture
+    def corona_client(self):
+        return mock.Mock(spec=['_get_url', '_version', 'headers'],
+                         _version='1.0', headers={})
+
+    @pytest.fixture
+    def mpan(self, corona_client):
+        mpan = MPAN(corona_client, '008450062012345678910')
+        contracts = [PPAContract(corona_client,
+                                 product_quotes=self.test_product_quotes, **quote)
+                     for quote in self.test_quotes]
+        mpan.populate(contracts,
+                      site_resp={'id': 1, 'company': 12, 'name': 'site_1',
+                                 'addresses': [{'postcode': 'AB1 2CD'}]},
+                      billing_resp=[{'company': 12, 'billing_name': 'test'}],
+                      registration_resp=[{'new_install': False}])
+        return mpan
+
+    def test_contract_record(self, mpan):
+        contract = mpan.ppa_contracts[0]
+        record = ContractRecord.from_contract(contract)
+        assert not hasattr(record, '__dict__')
+        assert record.raw is None
+        assert record.site == 1
+        assert record.spill_end == datetime.date(2017, 1, 10)
+        assert record.values == contract.values
+        assert record.pass_throughs == contract.pass_throughs
+        assert record.contract_types == contract.contract_types
+        assert 'notes' not in record.details
+        assert record.details['contract_start_date'] == datetime.date(2017, 1, 1)
+        assert ContractRecord.from_contract(mpan.ppa_contracts[1]).site == 1
+
+    def test_contract_record_keep_raw(self, mpan):
+        record = ContractRecord.from_contract(mpan.ppa_contracts[0],
+                                              keep_raw=True)
+        assert record.details == mpan.ppa_contracts[0].details
+
+    @pytest.mark.parametrize("keep_raw", [False, True])
+    def test_mpan_record(self, mpan, keep_raw):
+        record = MPANRecord.from_mpan(mpan, keep_raw=keep_raw)
+        assert not hasattr(record, '__dict__')
+        assert record.mpan == mpan.mpan
+        assert record.site_name == 'site_1'
+        assert record.company_id == 12
+        assert record.site_postcode == 'AB1 2CD'
+        assert record.live_ppa_contract.quote_id == 101
+        assert record.live_ppa_contract is record.contracts[1]
+        assert (record.start_live_date, record.end_live_date) == (
+            mpan.start_live_date, mpan.end_live_date)
+        if keep_raw:
+            assert record.raw['billing_details'] == mpan.billing_details
+        else:
+            assert record.raw is None
+
+    def test_records_with_mpan_methods(self, mpan):
+        record = MPANRecord.from_mpan(mpan)
+        mpan.start_live_date = mpan.end_live_date = None
+        mpan.live_ppa_contract = record.live_ppa_contract
+        mpan.get_continuous_start_end_live(record.ppa_contracts)
+        assert mpan.start_live_date == datetime.date(2017, 1, 1)
+        assert mpan.end_live_date == datetime.date(2018, 12, 31)
+
+    def test_to_records(self, mpan):
+        records = to_records({mpan.full_mpan: mpan})
+        assert list(records) == [mpan.full_mpan]
+        assert isinstance(records[mpan.full_mpan], MPANRecord)
+
+    def test_measure_memory_saving(self, mpan):
+        saving = measure_memory_saving({mpan.full_mpan: mpan})
+        assert saving['records_bytes'] < saving['mpans_bytes']
+        assert saving['saving_bytes'] == (saving['mpans_bytes'] -
+                                          saving['records_bytes'])
+
+
+def test_get_deep_size():
+    shared = 'x' * 1000
+    assert get_deep_size([shared, shared]) < 2 * get_deep_size(shared)
+    assert get_deep_size({'a': shared}, exclude=[shared]) < get_deep_size(shared)
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,231 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+import requests
+
+from corona_analytics_client.retry import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy)
+from corona_analytics_client.session import AsyncCoronaSession, CoronaSession
+
+
+class TestRetryPolicy:
+
+    @pytest.mark.parametrize("attempt, retry_after, max_expected", [
+        (0, None, 0.5),
+        (2, None, 2.0),
+        (10, None, 30.0),
+        (0, 'Wed, 21 Oct 2015 07:28:00 GMT', 0.5),
+    ])
+    def test_get_delay(self, attempt, retry_after, max_expected):
+        policy = RetryPolicy()
+        with mock.patch('corona_analytics_client.retry.random.uniform',
+                        side_effect=lambda low, high: high):
+            assert policy.get_delay(attempt, retry_after) == max_expected
+        for _ in range(20):
+            assert 0 <= policy.get_delay(attempt, retry_after) <= max_expected
+
+    @pytest.mark.parametrize("retry_after, delay_expected", [
+        ('5', 5.0),
+        ('120', 30.0),
+    ])
+    def test_get_delay_retry_after(self, retry_after, delay_expected):
+        assert RetryPolicy().get_delay(0, retry_after) == delay_expected
+
+    @pytest.mark.parametrize("status, result_expected", [
+        (200, False),
+        (500, False),
+        (429, True),
+        (502, True),
+        (504, True),
+    ])
+    def test_is_retryable_status(self, status, result_expected):
+        assert RetryPolicy().is_retryable_status(status) == result_expected
+
+    def test_is_retryable_error(self):
+        policy = RetryPolicy()
+        assert policy.is_retryable_error(requests.ConnectionError())
+        assert policy.is_retryable_error(requests.ReadTimeout())
+        assert not policy.is_retryable_error(KeyError('mpan'))
+
+    def test_can_retry(self):
+        policy = RetryPolicy(retries=2)
+        assert policy.can_retry(1)
+        assert not policy.can_retry(2)
+        with pytest.raises(ValueError):
+            RetryPolicy(retries=-1)
+
+
+class TestCircuitBreaker:
+
+    @mock.patch('corona_analytics_client.retry.time.monotonic')
+    def test_open_and_reset(self, mock_time):
+        mock_time.return_value = 100.0
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.before_request('sites')
+        breaker.record('sites', 502)
+        assert breaker.get_state('sites') == CLOSED
+        breaker.before_request('sites')
+        breaker.record('sites', None)
+        assert breaker.get_state('sites') == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request('sites')
+        # Other endpoints aren't affected
+        breaker.before_request('assets')
+
+        mock_time.return_value = 111.0
+        breaker.before_request('sites')
+        assert breaker.get_state('sites') == HALF_OPEN
+        # Only one trial request at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request('sites')
+        breaker.record('sites', 200)
+        assert breaker.get_state('sites') == CLOSED
+        assert breaker.snapshot()['sites'] == {
+            'state': CLOSED, 'failures': 0, 'opens': 1}
+
+    @mock.patch('corona_analytics_client.retry.time.monotonic')
+    def test_failed_trial(self, mock_time):
+        mock_time.return_value = 100.0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.before_request('sites')
+        breaker.record('sites', 503)
+        mock_time.return_value = 111.0
+        breaker.before_request('sites')
+        breaker.record('sites', 503)
+        assert breaker.get_state('sites') == OPEN
+        assert breaker.snapshot()['sites']['opens'] == 2
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request('sites')
+        breaker.reset('sites')
+        breaker.before_request('sites')
+
+    def test_successes_reset_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        for status in (503, 200, 503, 404):
+            breaker.before_request('sites')
+            breaker.record('sites', status)
+        assert breaker.get_state('sites') == CLOSED
+
+
+@mock.patch('corona_analytics_client.session.time.sleep')
+@mock.patch('corona_analytics_client.session.requests.Session.get')
+class TestCoronaSessionRetry:
+
+    test_url = 'http://corona.limejump.dev:8202/api/sites/12'
+
+    @staticmethod
+    def create_response(data, status=200, headers=None):
+        content = data if isinstance(data, bytes) else json.dumps(data).encode()
+        return mock.Mock(status_code=status, content=content,
+                         headers=headers or {})
+
+    def test_retry_status(self, mock_get, mock_sleep):
+        mock_get.side_effect = [
+            self.create_response({}, 503, {'Retry-After': '2'}),
+            self.create_response({'id': 12})]
+        session = CoronaSession()
+        assert session.get_json(self.test_url) == {'id': 12}
+        assert mock_get.call_count == 2
+        mock_sleep.assert_called_once_with(2.0)
+        assert session.metrics.snapshot()['sites']['retries'] == 1
+
+    def test_retry_error(self, mock_get, mock_sleep):
+        mock_get.side_effect = requests.ConnectionError()
+        session = CoronaSession(retry=RetryPolicy(retries=2),
+                                circuit_breaker=None)
+        with pytest.raises(requests.ConnectionError):
+            session.get_json(self.test_url)
+        assert mock_get.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    @pytest.mark.parametrize("retry", [RetryPolicy(), None])
+    def test_not_retried(self, mock_get, mock_sleep, retry):
+        mock_get.return_value = self.create_response({}, 500)
+        session = CoronaSession(retry=retry)
+        assert session.get_json(self.test_url) == {}
+        assert mock_get.call_count == 1
+        mock_sleep.assert_not_called()
+
+    def test_retry_decode_error(self, mock_get, mock_sleep):
+        mock_get.side_effect = [self.create_response(b'[{"id": 1'),
+                                self.create_response([{'id': 1}])]
+        session = CoronaSession()
+        assert session.get_json(self.test_url) == [{'id': 1}]
+        assert mock_get.call_count == 2
+
+    def test_decode_error_replayed(self, mock_get, mock_sleep):
+        archive = mock.Mock(replaying=True)
+        archive.replay.return_value = self.create_response(b'[{"id": 1')
+        session = CoronaSession(archive=archive)
+        with pytest.raises(ValueError):
+            session.get_json(self.test_url)
+        assert archive.replay.call_count == 1
+        mock_get.assert_not_called()
+
+    def test_circuit_open(self, mock_get, mock_sleep):
+        mock_get.return_value = self.create_response({}, 502)
+        breaker = CircuitBreaker(failure_threshold=2)
+        session = CoronaSession(retry=RetryPolicy(retries=2),
+                                circuit_breaker=breaker)
+        # A request failing after its retries is a single failure
+        assert session.get_json(self.test_url) == {}
+        assert mock_get.call_count == 3
+        assert breaker.snapshot()['sites'] == {
+            'state': CLOSED, 'failures': 1, 'opens': 0}
+        session.get_json(self.test_url)
+        assert breaker.get_state('sites') == OPEN
+        # Fails fast without sending a request
+        with pytest.raises(CircuitOpenError):
+            session.get_json('http://corona.limejump.dev:8202/api/sites/13')
+        assert mock_get.call_count == 6
+
+    @pytest.mark.parametrize("status", [404, 500])
+    def test_error_page_not_retried(self, mock_get, mock_sleep, status):
+        mock_get.return_value = self.create_response(
+            b'<html><body>Server Error</body></html>', status)
+        breaker = CircuitBreaker()
+        session = CoronaSession(circuit_breaker=breaker)
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                session.get_json(self.test_url)
+        assert mock_get.call_count == 2
+        mock_sleep.assert_not_called()
+        assert breaker.snapshot()['sites'] == {
+            'state': CLOSED, 'failures': 2 if status == 500 else 0,
+            'opens': 0}
+
+
+class TestAsyncCoronaSessionRetry:
+
+    test_url = 'http://corona.limejump.dev:8202/api/sites/12'
+
+    @mock.patch('corona_analytics_client.session.asyncio.sleep')
+    @mock.patch('corona_analytics_client.session.AsyncCoronaSession._send_once')
+    def test_retry(self, mock_send, mock_sleep):
+        async def sleep(delay):
+            pass
+
+        async def send(url, params, endpoint):
+            return responses.pop(0)
+
+        responses = [(b'', 504, {}), (b'[1', 200, {}), (b'[1]', 200, {})]
+        mock_send.side_effect = send
+        mock_sleep.side_effect = sleep
+        breaker = CircuitBreaker()
+        session = AsyncCoronaSession(retry=RetryPolicy(),
+                                     circuit_breaker=breaker)
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(session.get_json(self.test_url))
+        finally:
+            loop.close()
+        assert result == [1]
+        assert mock_send.call_count == 3
+        assert mock_sleep.call_count == 2
+        assert breaker.snapshot()['sites']['state'] == CLOSED
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
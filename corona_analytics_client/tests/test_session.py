@@ -0,0 +1,361 @@
+import asyncio
+import datetime
+import json
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client.benchmarks.stub_server import StubCorona
+from corona_analytics_client.cache import DiskCache, request_key
+from corona_analytics_client.session import (
+    DEFAULT_LATENCY_TARGET, AsyncCoronaSession, CoronaSession, SingleFlight,
+    configure_session, get_async_session, get_session, iter_json_array)
+
+
+class TestCoronaSession:
+
+    test_headers = {'Authorization': 'token'}
+
+    test_url = 'http://corona.limejump.dev:8202/api/sites/12'
+
+    @pytest.fixture
+    def corona_client(self):
+        return mock.Mock(spec=['headers', '_get_url'], headers=self.test_headers)
+
+    @staticmethod
+    def create_response(data, status=200):
+        return mock.Mock(status_code=status,
+                         content=json.dumps(data).encode('utf-8'))
+
+    @pytest.mark.parametrize("pool_connections, pool_maxsize", [
+        (1, 1),
+        (10, 50),
+    ])
+    def test_pool_size(self, pool_connections, pool_maxsize):
+        session = CoronaSession(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize)
+        adapter = session.session.get_adapter('http://corona.limejump.dev')
+        assert adapter._pool_connections == pool_connections
+        assert adapter._pool_maxsize == pool_maxsize
+
+    def test_default_limiter(self):
+        limiter = CoronaSession(pool_maxsize=4).limiter
+        assert limiter.limit == 4
+        assert limiter.max_limit == 4
+        assert limiter.latency_target == DEFAULT_LATENCY_TARGET
+
+    @pytest.mark.parametrize("keep_alive, connection_expected", [
+        (True, 'keep-alive'),
+        (False, 'close'),
+    ])
+    def test_keep_alive(self, keep_alive, connection_expected):
+        session = CoronaSession(keep_alive=keep_alive)
+        assert session.session.headers['Connection'] == connection_expected
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json(self, mock_get):
+        mock_get.return_value = self.create_response({'name': 'test_name'})
+        session = CoronaSession(headers=self.test_headers, timeout=5)
+        result = session.get_json(self.test_url, params={'a': 1})
+        mock_get.assert_called_once_with(
+            self.test_url, params={'a': 1}, timeout=5)
+        assert result == {'name': 'test_name'}
+        assert session.session.headers['Authorization'] == 'token'
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_cached(self, mock_get):
+        mock_get.return_value = self.create_response({'name': 'test_name'})
+        session = CoronaSession()
+        # Modifying a response, as MPAN may, doesn't change the cached one
+        session.get_json(self.test_url)['name'] = 'changed'
+        result = session.get_json(self.test_url + '/')
+        assert mock_get.call_count == 1
+        assert result == {'name': 'test_name'}
+        assert session.cache.stats()['endpoints']['sites'] == {
+            'hits': 1, 'misses': 1}
+
+    @pytest.mark.parametrize("status", [404, 503])
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_error_not_cached(self, mock_get, status):
+        mock_get.side_effect = [
+            self.create_response({'detail': 'Service unavailable'}, status),
+            self.create_response({'name': 'test_name'})]
+        session = CoronaSession(retry=None)
+        assert session.get_json(self.test_url) == {
+            'detail': 'Service unavailable'}
+        assert session.get_json(self.test_url) == {'name': 'test_name'}
+        assert mock_get.call_count == 2
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_fields(self, mock_get):
+        mock_get.return_value = self.create_response(
+            [{'mpan': '1', 'quote_type': 'Fixed', 'site': {'id': 1}}])
+        session = CoronaSession(decoder='json')
+        result = session.get_json(self.test_url, fields=('mpan',))
+        assert result == [{'mpan': '1'}]
+        # Decoded fields are cached apart from the whole response
+        result = session.get_json(self.test_url)
+        assert result == [{'mpan': '1', 'quote_type': 'Fixed',
+                           'site': {'id': 1}}]
+        assert mock_get.call_count == 2
+        assert session.get_json(self.test_url, fields=['mpan']) == [
+            {'mpan': '1'}]
+        assert mock_get.call_count == 2
+
+    def test_decoder(self):
+        decoder = mock.Mock(return_value={'name': 'test_name'})
+        session = CoronaSession(decoder=decoder)
+        assert session.decode(b'{}') == {'name': 'test_name'}
+        decoder.assert_called_once_with(b'{}')
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_no_cache(self, mock_get):
+        mock_get.return_value = self.create_response({'name': 'test_name'})
+        session = CoronaSession(cache=None)
+        session.get_json(self.test_url)
+        session.get_json(self.test_url)
+        assert mock_get.call_count == 2
+
+    @mock.patch('corona_analytics_client.cache.time.time')
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_disk_cache(self, mock_get, mock_time, tmpdir):
+        resp = mock.Mock(status_code=200, content=b'{"name": "test_name"}',
+                         headers={'ETag': '"abc"'})
+        mock_get.return_value = resp
+        mock_time.return_value = 1000
+        disk_cache = DiskCache(str(tmpdir.join('corona.sqlite')),
+                               default_ttl=60)
+        session = CoronaSession(cache=None, disk_cache=disk_cache)
+        assert session.get_json(self.test_url) == {'name': 'test_name'}
+        mock_time.return_value = 1030
+        assert session.get_json(self.test_url) == {'name': 'test_name'}
+        assert mock_get.call_count == 1
+
+        mock_get.return_value = mock.Mock(status_code=304, content=b'')
+        mock_time.return_value = 1100
+        assert session.get_json(self.test_url) == {'name': 'test_name'}
+        mock_get.assert_called_with(
+            self.test_url, params=None, headers={'If-None-Match': '"abc"'},
+            timeout=None)
+        assert disk_cache.get(request_key(self.test_url))['fetched_at'] == 1100
+
+    @staticmethod
+    def create_stream_response(text, chunk_size=5):
+        resp = mock.Mock(encoding='utf-8', status_code=200)
+        resp.iter_content.return_value = iter(
+            [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)])
+        return resp
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_iter_items(self, mock_get):
+        mock_get.return_value = self.create_stream_response(
+            '[{"quote_id": 1}, {"quote_id": 2}]')
+        session = CoronaSession()
+        items = session.iter_items(self.test_url, params={'page_size': 2})
+        assert next(items) == {'quote_id': 1}
+        assert list(items) == [{'quote_id': 2}]
+        mock_get.assert_called_once_with(
+            self.test_url, params={'page_size': 2}, stream=True, timeout=None)
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_iter_items_paginated(self, mock_get):
+        responses = [
+            self.create_stream_response(
+                '{"next": "http://next", "results": [{"quote_id": 1}]}'),
+            self.create_stream_response(
+                '{"next": null, "results": [{"quote_id": 2}]}'),
+        ]
+        mock_get.side_effect = list(responses)
+        session = CoronaSession()
+        items = list(session.iter_items(self.test_url, params={'page_size': 1}))
+        assert items == [{'quote_id': 1}, {'quote_id': 2}]
+        mock_get.assert_called_with(
+            'http://next', params=None, stream=True, timeout=None)
+        for resp in responses:
+            resp.close.assert_called_once_with()
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_iter_items_stopped_early(self, mock_get):
+        resp = self.create_stream_response(
+            '[{"quote_id": 1}, {"quote_id": 2}, {"quote_id": 3}]')
+        mock_get.return_value = resp
+        session = CoronaSession()
+        items = session.iter_items(self.test_url)
+        assert next(items) == {'quote_id': 1}
+        resp.close.assert_not_called()
+        # As on break or garbage collection of the generator
+        items.close()
+        resp.close.assert_called_once_with()
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_metrics(self, mock_get):
+        mock_get.side_effect = [self.create_response({'name': 'test_name'}),
+                                self.create_response({}, status=500)]
+        session = CoronaSession(cache=None)
+        session.get_json(self.test_url)
+        session.get_json(self.test_url + '/other')
+        snapshot = session.metrics.snapshot()
+        assert list(snapshot) == ['sites', 'sites/other']
+        assert snapshot['sites']['requests'] == 1
+        assert snapshot['sites']['bytes'] == 21
+        assert snapshot['sites']['decodes'] == 1
+        assert snapshot['sites']['latency']['p99'] is not None
+        assert snapshot['sites/other']['errors'] == 1
+
+    @mock.patch('corona_analytics_client.session.requests.Session.get')
+    def test_get_json_no_metrics(self, mock_get):
+        mock_get.return_value = self.create_response({'name': 'test_name'})
+        session = CoronaSession(metrics=None)
+        assert session.get_json(self.test_url) == {'name': 'test_name'}
+
+    def test_get_session_is_shared(self, corona_client):
+        session = get_session(corona_client)
+        assert get_session(corona_client) is session
+        assert session.headers == self.test_headers
+
+    def test_configure_session(self, corona_client):
+        old_session = get_session(corona_client)
+        session = configure_session(corona_client, pool_maxsize=50)
+        assert session is not old_session
+        assert get_session(corona_client) is session
+        assert session.pool_maxsize == 50
+        assert session.headers == self.test_headers
+
+    def test_configure_session_async(self, corona_client):
+        old_async_session = get_async_session(corona_client)
+        archive = mock.Mock()
+        session = configure_session(corona_client, archive=archive)
+        async_session = get_async_session(corona_client)
+        assert async_session is not old_async_session
+        assert async_session.cache is session.cache
+        assert async_session.archive is archive
+
+
+@pytest.mark.parametrize("text, chunk_size", [
+    ('[{"a": 1, "b": [1, 2]}, {"a": 2}, 12345, -1.5e3, "x", null]', 1),
+    ('[{"a": 1, "b": [1, 2]}, {"a": 2}, 12345, -1.5e3, "x", null]', 4),
+    ('\n[\n  {"a": 1, "b": [1, 2]},\n  {"a": 2},\n  12345,\n  -1.5e3,\n  "x",\n  null\n]', 1000),
+])
+def test_iter_json_array(text, chunk_size):
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    assert list(iter_json_array(chunks)) == [
+        {'a': 1, 'b': [1, 2]}, {'a': 2}, 12345, -1500.0, 'x', None]
+
+
+@pytest.mark.parametrize("chunks", [
+    ['{"a": 1}'],
+    ['[{"a": 1}'],
+    ['[1 2]'],
+])
+def test_iter_json_array_invalid(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks))
+
+
+class TestSingleFlight:
+
+    def test_do_shared(self):
+        single_flight = SingleFlight()
+        calls = []
+        results = []
+
+        def function(value):
+            calls.append(value)
+            time.sleep(0.05)
+            return value
+
+        def worker():
+            results.append(single_flight.do('key', function, 'value'))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert calls == ['value']
+        assert results == ['value'] * 5
+        assert single_flight.shared == 4
+        assert single_flight.do('key', function, 'again') == 'again'
+
+    def test_do_error(self):
+        single_flight = SingleFlight()
+        with pytest.raises(ValueError):
+            single_flight.do('key', int, 'not a number')
+        assert single_flight.do('key', int, '1') == 1
+
+
+class TestAsyncCoronaSession:
+
+    test_url = 'http://corona.limejump.dev:8202/api/billing-info/?company=12'
+
+    @mock.patch('corona_analytics_client.session.AsyncCoronaSession._load_json')
+    def test_get_json_coalesced(self, mock_load):
+        async def load_json(url, params, key, endpoint, fields):
+            await asyncio.sleep(0.01)
+            return [{'company': 12}]
+        mock_load.side_effect = load_json
+        session = AsyncCoronaSession()
+
+        async def get_all():
+            return await asyncio.gather(
+                *[session.get_json(self.test_url) for _ in range(3)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(get_all())
+        finally:
+            loop.close()
+        assert mock_load.call_count == 1
+        assert results == [[{'company': 12}]] * 3
+        assert session.shared == 2
+        assert not session._in_flight
+
+    @pytest.mark.parametrize("params, params_expected", [
+        (None, None),
+        ({'contract_start_date_gte': datetime.date(2017, 1, 1),
+          'mpan': '008450062012345678910', 'page_size': 100,
+          'contracted_ppa': True},
+         {'contract_start_date_gte': '2017-01-01',
+          'mpan': '008450062012345678910', 'page_size': 100,
+          'contracted_ppa': 'True'}),
+    ])
+    def test_encode_params(self, params, params_expected):
+        assert AsyncCoronaSession._encode_params(params) == params_expected
+
+    def test_new_event_loop(self):
+        session = AsyncCoronaSession(cache=None)
+        with StubCorona(mpans=2) as corona:
+            url = corona.url + 'ppa/registrations/'
+            results = []
+            # As if by two asyncio.run calls
+            for _ in range(2):
+                loop = asyncio.new_event_loop()
+                try:
+                    results.append(
+                        loop.run_until_complete(session.get_json(url)))
+                finally:
+                    loop.close()
+            assert corona.request_count == 2
+        assert len(results[0]) == 2
+        assert results[1] == results[0]
+
+    def test_async_with(self):
+        async def get_json(url):
+            async with AsyncCoronaSession() as session:
+                await session.get_json(url)
+            return session
+
+        with StubCorona(mpans=2) as corona:
+            loop = asyncio.new_event_loop()
+            try:
+                session = loop.run_until_complete(
+                    get_json(corona.url + 'ppa/registrations/'))
+            finally:
+                loop.close()
+        assert session.session.closed
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,161 @@
+import datetime
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from corona_analytics_client import snapshot as snapshot_module
+from corona_analytics_client.access_ppa import MPAN, PPAContract
+from corona_analytics_client.snapshot import (
+    EncodedStrings, PortfolioSnapshot, load_snapshot, save_snapshot)
+
+formats = ['npy']
+if snapshot_module.pyarrow is not None:
+    formats += ['arrow', 'parquet']
+
+
+class TestPortfolioSnapshot:
+
+    test_quotes = [
+        {'mpan': {'long_value': '008450062012345678910', 'mpan_type': 'E'},
+         'quote_id': 100, 'site': {'id': 1, 'name': 'site_1'},
+         'quote_type': 'Fixed', 'technology': 'Solar', 'capacity_kw': 500,
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-12-31',
+         'created_time': '2016-12-01T10:00:00Z', 'spill_period': 10},
+        {'mpan': {'long_value': '008450062012345678910', 'mpan_type': 'E'},
+         'quote_id': 101, 'site': {'id': 1, 'name': 'site_1'},
+         'quote_type': 'Flexible', 'technology': 'Solar', 'capacity_kw': 500,
+         'contract_start_date': '2018-01-01', 'contract_end_date': '2018-12-31',
+         'notes': 'renewal é'},
+    ]
+
+    test_product_quotes = [
+        {'price_type': 'power', 'value': 50.0, 'pass_through_percent': 95.5,
+         'product_quote_type': 'Flexible'},
+        {'price_type': 'roc', 'value': None, 'pass_through_percent': 90.0,
+         'product_quote_type': 'Fixed'},
+    ]
+
+    @pytest.fixture
+    def corona_client(self):
+        return mock.Mock(spec=['_get_url', '_version', 'headers'],
+                         _version='2.0', headers={})
+
+    @pytest.fixture
+    def mpans(self, corona_client):
+        mpan = MPAN(corona_client, '008450062012345678910',
+                    datetime.date(2017, 1, 1), datetime.date(2018, 12, 31))
+        contracts = [PPAContract(corona_client,
+                                 product_quotes=self.test_product_quotes,
+                                 **quote)
+                     for quote in self.test_quotes]
+        mpan.populate(contracts,
+                      site_resp={'id': 1, 'company': 12, 'name': 'site_1',
+                                 'address': {'postcode': 'AB1 2CD'}},
+                      billing_resp=[{'company': 12, 'billing_name': 'test'}],
+                      registration_resp=[{'new_install': False}])
+        mpan.assets = [{'asset_id': 7, 'technology': 'Solar'}]
+        empty = MPAN(corona_client, '008450062012345678911')
+        empty.ppa_contracts = []
+        return {mpan.full_mpan: mpan, empty.full_mpan: empty}
+
+    def test_from_mpans(self, mpans):
+        snapshot = PortfolioSnapshot.from_mpans(mpans)
+        assert len(snapshot) == 2
+        contracts = snapshot.columns['contracts']
+        assert contracts['mpan'].tolist() == ['008450062012345678910'] * 2
+        assert contracts['meter_type'].tolist() == ['export', 'export']
+        assert contracts['contract_start_date'].tolist() == [
+            datetime.date(2017, 1, 1), datetime.date(2018, 1, 1)]
+        assert snapshot.columns['mpans']['live_contract'].tolist() == [1, -1]
+        assert snapshot.columns['prices']['contract'].tolist() == [0, 0, 1, 1]
+        assert np.isnan(snapshot.columns['prices']['value'][1])
+
+    @pytest.mark.parametrize("file_format", formats)
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_save_load(self, mpans, corona_client, tmpdir, file_format, mmap):
+        path = str(tmpdir.join('portfolio'))
+        save_snapshot(mpans, path, file_format=file_format)
+        snapshot = load_snapshot(path, mmap=mmap)
+        if file_format == 'npy':
+            assert isinstance(snapshot.columns['mpans']['company_id'],
+                              np.memmap) == mmap
+
+        result = snapshot.to_mpans(corona_client)
+        assert sorted(result) == sorted(mpans)
+        for full_mpan, mpan in mpans.items():
+            loaded = result[full_mpan]
+            for field in ('start_date', 'end_date', 'site_name', 'company_id',
+                          'meter_type', 'site_postcode', 'start_live_date',
+                          'end_live_date', 'site_info', 'billing_details',
+                          'registration_details', 'assets'):
+                assert getattr(loaded, field) == getattr(mpan, field), field
+            assert len(loaded.ppa_contracts) == len(mpan.ppa_contracts)
+            for contract, loaded_contract in zip(mpan.ppa_contracts,
+                                                 loaded.ppa_contracts):
+                assert loaded_contract.details == contract.details
+                assert loaded_contract.values == contract.values
+                assert loaded_contract.pass_throughs == contract.pass_throughs
+                assert loaded_contract.contract_types == contract.contract_types
+        assert (result['008450062012345678910'].live_ppa_contract.details[
+            'quote_id'] == 101)
+
+        table = snapshot.get_quote_table()
+        assert table.get_mpans(quote_type='Fixed') == {'008450062012345678910'}
+        assert table['created_time'][0] == np.datetime64(
+            '2016-12-01T10:00:00', 'us')
+
+    @pytest.mark.parametrize("file_format", formats)
+    @pytest.mark.parametrize("start_date, end_date", [
+        (datetime.datetime(2017, 1, 1), datetime.datetime(2018, 12, 31, 12)),
+        (datetime.date(2017, 1, 1), datetime.date(2018, 12, 31)),
+        (None, None),
+    ])
+    def test_save_load_query_dates(self, corona_client, tmpdir, file_format,
+                                   start_date, end_date):
+        mpan = MPAN(corona_client, '008450062012345678910', start_date,
+                    end_date)
+        mpan.ppa_contracts = [PPAContract(corona_client, product_quotes=[],
+                                          **self.test_quotes[0])]
+        path = str(tmpdir.join('portfolio'))
+        save_snapshot({mpan.full_mpan: mpan}, path, file_format=file_format)
+        loaded = load_snapshot(path).to_mpans(corona_client)[mpan.full_mpan]
+        assert type(loaded.start_date) is type(start_date)
+        assert loaded.start_date == start_date
+        assert loaded.end_date == end_date
+        if isinstance(start_date, datetime.datetime):
+            assert MPAN.get_continuous_dates(
+                loaded.ppa_contracts[0], loaded.start_date,
+                loaded.end_date) == (datetime.date(2017, 1, 1),
+                                     datetime.date(2017, 12, 31))
+
+    def test_save_replaces(self, mpans, tmpdir):
+        path = str(tmpdir.join('portfolio'))
+        save_snapshot(mpans, path, file_format='npy')
+        save_snapshot({}, path, file_format='npy')
+        assert len(load_snapshot(path)) == 0
+        assert not os.path.exists(path + '.tmp')
+
+    def test_save_unknown_format(self, mpans, tmpdir):
+        with pytest.raises(ValueError):
+            save_snapshot(mpans, str(tmpdir.join('portfolio')),
+                          file_format='csv')
+
+    @mock.patch('corona_analytics_client.snapshot.pyarrow', None)
+    def test_save_arrow_not_installed(self, mpans, tmpdir):
+        with pytest.raises(ImportError):
+            save_snapshot(mpans, str(tmpdir.join('portfolio')),
+                          file_format='arrow')
+
+
+def test_encoded_strings():
+    strings = ['{"a": 1}', '', '"é"']
+    column = EncodedStrings.from_strings(strings)
+    assert len(column) == 3
+    assert list(column) == strings
+    assert column[2] == '"é"'
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
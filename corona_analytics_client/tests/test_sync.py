@@ -0,0 +1,79 @@
+from unittest import mock
+
+import pytest
+
+from corona_analytics_client.sync import QuoteSync
+
+
+class TestQuoteSync:
+
+    test_url_quotes = 'http://corona.limejump.dev:8202/api/ppa/quotes/'
+
+    test_quotes = [
+        {'quote_id': 1, 'mpan': '008450062012345678910',
+         'created_time': '2018-01-01T10:00:00Z'},
+        {'quote_id': 2, 'mpan': '008450062012345678911',
+         'created_time': '2018-01-02T10:00:00Z'},
+    ]
+
+    test_new_quotes = [
+        {'quote_id': 2, 'mpan': '008450062012345678911',
+         'created_time': '2018-01-02T10:00:00Z'},
+        {'quote_id': 3, 'mpan': '008450062012345678912',
+         'created_time': '2018-01-03T10:00:00Z'},
+    ]
+
+    @pytest.fixture
+    def corona_client(self):
+        corona_client = mock.Mock(spec=['_get_url', '_version', 'headers'],
+                                  _version='1.0', headers={})
+        corona_client._get_url.return_value = self.test_url_quotes
+        return corona_client
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_sync(self, mock_get, corona_client, tmpdir):
+        path = str(tmpdir.join('quotes.json'))
+        mock_get.return_value = self.test_quotes
+        quote_sync = QuoteSync(corona_client, path=path,
+                               params={'meter_type': 'export'})
+        result = quote_sync.sync()
+        mock_get.assert_called_once_with(
+            self.test_url_quotes, params={'meter_type': 'export'},
+            fields=None)
+        assert result == {'fetched': 2, 'added': 2, 'updated': 0,
+                          'watermark': '2018-01-02T10:00:00Z'}
+
+        mock_get.return_value = self.test_new_quotes
+        quote_sync = QuoteSync(corona_client, path=path,
+                               params={'meter_type': 'export'})
+        result = quote_sync.sync()
+        mock_get.assert_called_with(
+            self.test_url_quotes, params={
+                'meter_type': 'export',
+                'created_time_gte': '2018-01-02T10:00:00Z'}, fields=None)
+        assert result == {'fetched': 2, 'added': 1, 'updated': 0,
+                          'watermark': '2018-01-03T10:00:00Z'}
+        assert sorted(quote_sync.quotes) == [1, 2, 3]
+
+    @mock.patch('corona_analytics_client.session.CoronaSession.get_json')
+    def test_sync_updated(self, mock_get, corona_client):
+        mock_get.return_value = self.test_quotes
+        quote_sync = QuoteSync(corona_client, watermark_field='modified_time')
+        quote_sync.sync()
+        assert quote_sync.watermark is None
+        mock_get.return_value = [dict(self.test_quotes[0], mpan='changed',
+                                      modified_time='2018-02-01T10:00:00Z')]
+        result = quote_sync.sync()
+        assert result == {'fetched': 1, 'added': 0, 'updated': 1,
+                          'watermark': '2018-02-01T10:00:00Z'}
+        assert quote_sync.quotes[1]['mpan'] == 'changed'
+
+    def test_load_other_watermark_field(self, corona_client, tmpdir):
+        path = str(tmpdir.join('quotes.json'))
+        QuoteSync(corona_client, path=path).save()
+        with pytest.raises(ValueError):
+            QuoteSync(corona_client, path=path, watermark_field='modified_time')
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,88 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from corona_analytics_client.quote_table import QuoteTable
+from corona_analytics_client.timeline import get_daily_timeline
+
+
+class TestGetDailyTimeline:
+
+    test_quotes = [
+        {'mpan': '008450062012345678910', 'quote_id': 100, 'technology': 'Solar',
+         'meter_type': 'export', 'capacity_kw': 500,
+         'contract_start_date': '2017-01-01', 'contract_end_date': '2017-01-05'},
+        # Renewal overlapping the previous contract by a day
+        {'mpan': '008450062012345678910', 'quote_id': 101, 'technology': 'Solar',
+         'meter_type': 'export', 'capacity_kw': 600,
+         'contract_start_date': '2017-01-05', 'contract_end_date': '2017-01-31'},
+        {'mpan': '008450062012345678911', 'quote_id': 102, 'technology': 'Solar',
+         'meter_type': 'export', 'capacity_kw': 250,
+         'contract_start_date': '2017-01-03', 'contract_end_date': '2017-01-03'},
+        {'mpan': '008450062012345678912', 'quote_id': 103, 'technology': 'Wind',
+         'meter_type': 'export', 'capacity_kw': None,
+         'contract_start_date': '2016-12-01', 'contract_end_date': '2017-01-02'},
+    ]
+
+    def test_get_daily_timeline(self):
+        dates, timeline = get_daily_timeline(
+            self.test_quotes, '2017-01-01', '2017-01-06')
+        assert dates[0] == np.datetime64('2017-01-01')
+        assert len(dates) == 6
+        solar = timeline[('Solar', 'export')]
+        assert solar['mpans'].tolist() == [1, 1, 2, 1, 1, 1]
+        assert solar['capacity_kw'].tolist() == [500, 500, 750, 500, 600, 600]
+        wind = timeline[('Wind', 'export')]
+        assert wind['mpans'].tolist() == [1, 1, 0, 0, 0, 0]
+        assert wind['capacity_kw'].tolist() == [0] * 6
+
+    def test_get_daily_timeline_totals(self):
+        dates, timeline = get_daily_timeline(
+            QuoteTable.from_quotes(self.test_quotes), by=())
+        assert dates[0] == np.datetime64('2016-12-01')
+        assert dates[-1] == np.datetime64('2017-01-31')
+        assert timeline[()]['mpans'].sum() == 31 + 33 + 1
+
+    def test_get_daily_timeline_single_key(self):
+        dates, timeline = get_daily_timeline(
+            self.test_quotes, '2017-01-03', '2017-01-03', by='technology')
+        assert timeline['Solar']['mpans'].tolist() == [2]
+        assert timeline['Wind']['mpans'].tolist() == [0]
+
+    @pytest.mark.parametrize("start_date, end_date", [
+        (None, None),
+        ('2017-01-01', '2017-12-31'),
+    ])
+    def test_get_daily_timeline_nested(self, start_date, end_date):
+        quotes = [
+            {'mpan': '008450062012345678910', 'quote_id': 100,
+             'capacity_kw': 500, 'contract_start_date': '2017-01-01',
+             'contract_end_date': '2017-12-31'},
+            {'mpan': '008450062012345678910', 'quote_id': 101,
+             'capacity_kw': 600, 'contract_start_date': '2017-03-01',
+             'contract_end_date': '2017-04-30'},
+            # Nested in the nested contract, ending with it
+            {'mpan': '008450062012345678910', 'quote_id': 102,
+             'capacity_kw': 700, 'contract_start_date': '2017-04-01',
+             'contract_end_date': '2017-04-30'},
+        ]
+        dates, timeline = get_daily_timeline(quotes, start_date, end_date,
+                                             by=())
+        assert dates[-1] == np.datetime64('2017-12-31')
+        mpans = timeline[()]['mpans']
+        capacity = dict(zip(dates.tolist(), timeline[()]['capacity_kw']))
+        assert mpans.min() == 1 and mpans.max() == 1
+        assert capacity[datetime.date(2017, 2, 28)] == 500
+        assert capacity[datetime.date(2017, 3, 1)] == 600
+        assert capacity[datetime.date(2017, 4, 15)] == 700
+        assert capacity[datetime.date(2017, 6, 1)] == 500
+
+    def test_get_daily_timeline_empty(self):
+        dates, timeline = get_daily_timeline([])
+        assert len(dates) == 0
+        assert timeline == {}
+
+
+if __name__ == "__main__":
+    pytest.main(__file__)
@@ -0,0 +1,132 @@
+import numpy as np
+
+from corona_analytics_client.quote_table import QuoteTable
+
+
+def _get_live_ranges(table):
+    """
+    Contract date ranges of table with overlaps within an MPAN removed: where
+    contracts of an MPAN overlap, the contract starting later takes over from
+    its start date until its end date, after which an earlier contract still
+    running resumes, so each MPAN is counted at most once a day.
+    :return: (rows, start_dates, end_dates) with rows the rows of table the
+        ranges are for; a contract interrupted by another has several ranges
+    """
+    starts = table['contract_start_date']
+    ends = table['contract_end_date']
+    order = np.flatnonzero(~(np.isnat(starts) | np.isnat(ends)))
+    order = order[np.lexsort((starts[order], table['mpan'][order]))]
+    mpans = table['mpan'][order]
+    start_days = starts[order].astype('datetime64[D]').astype(np.int64)
+    end_days = ends[order].astype('datetime64[D]').astype(np.int64)
+
+    ranges = []
+    # Contracts of the current MPAN still running, latest start on top
+    running = []
+    day = None
+    for index in range(len(order)):
+        if index and mpans[index] != mpans[index - 1]:
+            day = _add_running_ranges(ranges, running, day)
+            running = []
+        day = _add_running_ranges(ranges, running, day,
+                                  start_days[index] - 1)
+        running.append((order[index], end_days[index]))
+        day = start_days[index]
+    _add_running_ranges(ranges, running, day)
+
+    if not ranges:
+        empty = np.array([], dtype='datetime64[D]')
+        return np.array([], dtype=np.int64), empty, empty.copy()
+    rows, range_starts, range_ends = (np.array(column) for column in zip(*ranges))
+    return (rows.astype(np.int64), range_starts.astype('datetime64[D]'),
+            range_ends.astype('datetime64[D]'))
+
+
+def _add_running_ranges(ranges, running, day, last_day=None):
+    """
+    Add to ranges the days from day to last_day (or until no contract is
+    left running) of the latest started running contracts, removing those
+    which end.
+    :return: first day not added
+    """
+    while running and (last_day is None or day <= last_day):
+        row, end_day = running[-1]
+        if end_day < day:
+            running.pop()
+            continue
+        range_end = end_day if last_day is None else min(end_day, last_day)
+        ranges.append((row, day, range_end))
+        day = range_end + 1
+    return day
+
+
+def get_daily_timeline(quotes, start_date=None, end_date=None,
+                       by=('technology', 'meter_type')):
+    """
+    Number of live MPANs and their live capacity_kw on every day between
+    start_date and end_date, for each combination of the by fields, from a
+    single ppa/quotes pull rather than hydrating an MPAN per meter and month:
+
+    dates, timeline = get_daily_timeline(all_ppas.get_quote_table())
+    timeline[('Solar', 'export')]['capacity_kw']
+
+    Each contract adds one MPAN and its capacity_kw at its start date and
+    removes them the day after its end date in a difference array per group,
+    and a cumulative sum over the days turns the differences into daily
+    totals. Contracts missing a capacity_kw count as 0 kW.
+
+    :param quotes: QuoteTable, or iterable of ppa/quotes response items
+    :param Date start_date: first day of the timeline, defaults to the
+        earliest contract start date
+    :param Date end_date: last day of the timeline, defaults to the latest
+        contract end date
+    :param by: field or tuple of fields to break the timeline down by, or
+        () for portfolio totals only
+    :return: (dates, timeline) where dates is a datetime64 array of the
+        days and timeline a dict of {'mpans': int array, 'capacity_kw':
+        float array} by key value, or tuple of key values
+    """
+    table = quotes if isinstance(quotes, QuoteTable) else QuoteTable.from_quotes(quotes)
+    rows, starts, ends = _get_live_ranges(table)
+    if start_date is None:
+        start_date = starts.min() if len(starts) else None
+    if end_date is None:
+        end_date = ends.max() if len(ends) else None
+    if start_date is None or end_date is None:
+        return np.array([], dtype='datetime64[D]'), {}
+    start_date = np.datetime64(start_date, 'D')
+    end_date = np.datetime64(end_date, 'D')
+    dates = np.arange(start_date, end_date + np.timedelta64(1, 'D'))
+
+    single_key = isinstance(by, str)
+    if by:
+        codes, group_keys = table.get_group_codes(by)
+        codes = codes[rows]
+    else:
+        codes, group_keys = np.zeros(len(rows), dtype=np.int64), [()]
+
+    in_range = (starts <= end_date) & (ends >= start_date)
+    codes = codes[in_range]
+    first_days = (np.maximum(starts[in_range], start_date) -
+                  start_date).astype(np.int64)
+    last_days = (np.minimum(ends[in_range], end_date) -
+                 start_date).astype(np.int64) + 1
+    capacity_kw = np.nan_to_num(table['capacity_kw'][rows][in_range])
+
+    shape = (len(group_keys), len(dates) + 1)
+    mpans = np.zeros(shape, dtype=np.int64)
+    np.add.at(mpans, (codes, first_days), 1)
+    np.add.at(mpans, (codes, last_days), -1)
+    capacity = np.zeros(shape, dtype=np.float64)
+    np.add.at(capacity, (codes, first_days), capacity_kw)
+    np.add.at(capacity, (codes, last_days), -capacity_kw)
+    mpans = np.cumsum(mpans, axis=1)[:, :-1]
+    capacity = np.cumsum(capacity, axis=1)[:, :-1]
+
+    timeline = {}
+    for index, group_key in enumerate(group_keys):
+        if single_key:
+            group_key = group_key[0]
+        timeline[group_key] = {'mpans': mpans[index],
+                               'capacity_kw': capacity[index]}
+    return dates, timeline
@@ -27,7 +27,10 @@ setup(
     name='corona_analytics_client',
     version=__version__,
     description='corona_analytics_client.',
-    install_requires=['lj_clients==1.0.3', 'requests==2.4.3', 'geopy==1.11.0'],
+    install_requires=['lj_clients==1.0.3', 'requests==2.4.3', 'geopy==1.11.0',
+                      'numpy>=1.15'],
+    extras_require={'async': ['aiohttp>=3.5'], 'json': ['orjson>=2.0'],
+                    'arrow': ['pyarrow>=0.17']},
     author='Limejump',
     author_email='tech@limejump.com',
     packages=find_packages(),